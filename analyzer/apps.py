@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class AnalyzerConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "analyzer"
+
+    def ready(self):
+        from .changes import install_change_log
+        from .db import configure_connection
+        from .metrics import install_query_recorder
+        from .search import repair_search_index
+
+        connection_created.connect(configure_connection, dispatch_uid='analyzer.configure_connection')
+        connection_created.connect(install_query_recorder, dispatch_uid='analyzer.install_query_recorder')
+        post_migrate.connect(repair_search_index, sender=self, dispatch_uid='analyzer.repair_search_index')
+        post_migrate.connect(install_change_log, sender=self, dispatch_uid='analyzer.install_change_log')
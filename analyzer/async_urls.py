@@ -0,0 +1,13 @@
+from django.urls import path, re_path, include
+
+from . import async_views
+
+# The async views take over the routes they implement; everything else
+# (bulk, stats, stream, export, by-hash, similar, jobs) falls through to the DRF router in analyzer.urls.
+urlpatterns = [
+    path('strings', async_views.strings),
+    path('strings/filter-by-natural-language', async_views.natural_language_filter),
+    # Same lookup pattern as the router's detail route, minus its own actions.
+    re_path(r'^strings/(?!(?:bulk|stats|stream|export)$)(?P<value>[^/.]+)$', async_views.string_detail),
+    path('', include('analyzer.urls')),
+]
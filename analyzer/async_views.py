@@ -0,0 +1,263 @@
+"""Async versions of the create, retrieve, list and natural language endpoints.
+
+DRF views are synchronous, so under ASGI each request would hold a thread
+for its whole duration. These views use Django's async ORM and cache APIs
+and hand CPU-bound analysis of large strings to an executor, which lets one
+worker process serve many concurrent connections. They return the same
+payloads as StringAnalyzerViewSet and are routed by ``analyzer.async_urls``
+when ANALYZER_ASYNC_VIEWS is enabled; the remaining routes are still served
+by the viewset.
+
+Each view first runs the viewset's own ``initial()`` for the matching action
+(see ``viewset_checks``), so content negotiation, authentication,
+permissions and throttling follow the same REST_FRAMEWORK settings and
+viewset attributes on both routes. Request bodies go through the viewset's
+parsers.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods
+from rest_framework.exceptions import APIException
+from rest_framework.utils.encoders import JSONEncoder
+
+from .cache import acache_analysis, acached_query_result, aget_cached_analysis
+from .engine import adescribe
+from .filters import AnalyzedStringFilter, applied_filters
+from .jobs import RETRY_AFTER_SECONDS, QueueFull, accepted_body, enqueue, wants_async
+from .metrics import timed
+from .models import AnalysisJob, AnalyzedString
+from .pagination import KeysetPagination
+from .query_planner import QueryPlan, plan_query
+from .replica import ReplicaUnavailable, replica_page
+from .serializers import StringRowSerializer, StringSerializer, parse_projection
+from .services import create_analyzed_string, delete_strings
+from .streaming import STREAM_FORMATS, astream_queryset
+from .utils import hash_string
+from .views import StringAnalyzerViewSet
+
+pagination = KeysetPagination()
+
+
+def _json(data, status=200, headers=None):
+    # Same encoding as DRF's JSONRenderer.
+    with timed('serialization'):
+        return JsonResponse(
+            data, status=status, headers=headers, safe=False, encoder=JSONEncoder,
+            json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+        )
+
+
+def _api_error(exc):
+    detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return _json(detail, status=exc.status_code)
+
+
+def _initial(request, action, kwargs):
+    """Run StringAnalyzerViewSet's checks for ``action`` on ``request``.
+
+    Returns the DRF request the viewset would have handled, and the rendered
+    error response it would have sent instead (or None).
+    """
+    view = StringAnalyzerViewSet(action_map={request.method.lower(): action})
+    view.args, view.kwargs = (), kwargs
+    view.request = view.initialize_request(request, **kwargs)
+    view.headers = view.default_response_headers
+    try:
+        view.initial(view.request, **kwargs)
+    except Exception as exc:
+        response = view.finalize_response(view.request, view.handle_exception(exc), **kwargs)
+        return view.request, response.render()
+    return view.request, None
+
+
+def viewset_checks(**actions):
+    """Run the checks the viewset makes before the action ``actions`` names for each method.
+
+    The view then gets the DRF request, so ``request.data`` uses the
+    viewset's parsers and ``request.user`` its authentication.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            # Authentication and throttles read the session and the cache synchronously.
+            request, error = await sync_to_async(_initial)(request, actions[request.method.lower()], kwargs)
+            if error is not None:
+                return error
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+@viewset_checks(get='list', post='create')
+async def strings(request):
+    if request.method == 'POST':
+        return await create_string(request)
+    return await list_strings(request)
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'DELETE'])
+@viewset_checks(get='retrieve', delete='destroy')
+async def string_detail(request, value):
+    if request.method == 'DELETE':
+        return await delete_string(request, value)
+    data = await _cached_representation(hash_string(value.lower()), value)
+    if data is None:
+        return _json({'error': 'String does not exist in the system'}, status=404)
+    return _json(data)
+
+
+async def create_string(request):
+    try:
+        with timed('parse'):
+            data = await sync_to_async(getattr)(request, 'data')
+    except APIException as e:
+        return _api_error(e)
+
+    serializer = StringSerializer(data=data)
+    with timed('parse'):
+        valid = serializer.is_valid()
+    if not valid:
+        if 'value' in serializer.errors:
+            return _json({"value": ["'value' (must be string) "]}, status=422)
+        return _json(serializer.errors, status=400)
+
+    value = serializer.validated_data['value']
+    if wants_async(request.GET):
+        try:
+            job = await sync_to_async(enqueue)(AnalysisJob.CREATE, {"value": value})
+        except QueueFull:
+            return _json(
+                {"error": "Too many analysis jobs are queued; retry later"},
+                status=503, headers={'Retry-After': str(RETRY_AFTER_SECONDS)},
+            )
+        body = accepted_body(job)
+        return _json(body, status=202, headers={'Location': body['status_url']})
+
+    analysis = await adescribe(value)
+    # Transactions are not available from async code, so the insert and its
+    # bookkeeping run together in a worker thread.
+    try:
+        instance = await sync_to_async(create_analyzed_string)(value, analysis)
+    except IntegrityError:
+        return _json({"data-conflict": ["the provided string already exists"]}, status=409)
+    return _json(StringSerializer(instance).data, status=201)
+
+
+async def delete_string(request, value):
+    instance = await AnalyzedString.objects.filter(pk=hash_string(value.lower())).afirst()
+    if instance is None or instance.value != value:
+        return _json({"error": f"String '{value}' not found."}, status=404)
+    await sync_to_async(delete_strings)([instance.pk])
+    return HttpResponse(status=204)
+
+
+async def _cached_representation(sha256, value=None):
+    data = await aget_cached_analysis(sha256)
+    if data is None:
+        instance = await AnalyzedString.objects.filter(pk=sha256).afirst()
+        if instance is None:
+            return None
+        data = StringSerializer(instance).data
+        await acache_analysis(instance, data)
+    if value is not None and data['value'] != value:
+        return None
+    return data
+
+
+async def list_strings(request):
+    filterset = AnalyzedStringFilter(request.GET, queryset=AnalyzedString.objects.all())
+    if not filterset.is_valid():
+        return _json({
+            name: [error['message'] for error in errors]
+            for name, errors in filterset.errors.get_json_data().items()
+        }, status=400)
+    queryset = filterset.qs
+
+    try:
+        projection = parse_projection(request.GET)
+    except APIException as e:
+        return _api_error(e)
+    filters_applied = applied_filters(request.GET)
+    row_serializer = StringRowSerializer(projection)
+
+    stream_format = request.GET.get('stream')
+    if stream_format:
+        if stream_format not in STREAM_FORMATS:
+            return _json(
+                {"error": f"'stream' must be one of: {', '.join(STREAM_FORMATS)}"}, status=400
+            )
+        return astream_queryset(
+            row_serializer.rows(queryset.order_by(*pagination.ordering)),
+            row_serializer.to_representation,
+            stream_format,
+        )
+
+    async def compute():
+        try:
+            rows, next_cursor, count = await sync_to_async(replica_page)(
+                filters_applied, request, pagination, row_serializer
+            )
+        except ReplicaUnavailable:
+            rows, next_cursor = await pagination.apaginate_queryset(
+                row_serializer.rows(queryset), request, position=row_serializer.position
+            )
+            count = await queryset.acount()
+        return {
+            "data": [row_serializer.to_representation(row) for row in rows],
+            "count": count,
+            "next": next_cursor,
+            "filters_applied": filters_applied,
+        }
+
+    try:
+        response_data = await acached_query_result('list', {
+            "filters": filters_applied,
+            "cursor": request.GET.get(pagination.cursor_query_param),
+            "page_size": pagination.get_page_size(request),
+            "fields": sorted(projection),
+        }, compute)
+    except APIException as e:
+        return _api_error(e)
+    return _json(response_data)
+
+
+@csrf_exempt
+@require_http_methods(['GET'])
+@viewset_checks(get='natural_language_filter')
+async def natural_language_filter(request):
+    query = request.GET.get('query', '').lower()
+    if not query:
+        return _json({"error": "Query parameter 'query' is required"}, status=400)
+
+    try:
+        filters = plan_query(query).as_filters()
+        projection = parse_projection(request.GET)
+    except ValueError as e:
+        return _json({"error": str(e)}, status=400)
+    except APIException as e:
+        return _api_error(e)
+    row_serializer = StringRowSerializer(projection)
+
+    async def compute():
+        queryset = QueryPlan.from_filters(filters).apply(AnalyzedString.objects.all())
+        return [row_serializer.to_representation(row) async for row in row_serializer.rows(queryset)]
+
+    data = await acached_query_result('natural-language', {
+        "filters": filters,
+        "fields": sorted(projection),
+    }, compute)
+    return _json({
+        "data": data,
+        "count": len(data),
+        "interpreted_query": {
+            "original": request.GET.get('query'),
+            "parsed_filters": filters
+        }
+    })
@@ -0,0 +1,734 @@
+import asyncio
+import os
+import platform
+import random
+import statistics
+import string
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import quote
+
+import django
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, transaction
+from django.test import AsyncClient, Client, RequestFactory, override_settings
+from django.test.utils import setup_databases, teardown_databases
+
+from . import engine, query_planner, utils
+from .cache import analysis_cache, query_cache
+from .filters import filter_palindromes
+from .search import filter_contains_characters, filter_substring, filter_words
+from .models import AnalyzedString
+from .pagination import KeysetPagination
+from .services import (
+    build_analyzed_string, create_analyzed_string, delete_strings, index_characters, statistics_summary,
+    strings_created,
+)
+from .utils import StringAnalyzer, describe_string
+
+
+@contextmanager
+def benchmark_database():
+    """Point the default connection at a throwaway, freshly migrated database.
+
+    Scenarios commit synthetic rows, switch SQLite's journal mode and fill
+    the caches and the filter replica, so none of them touch the configured
+    database or its shared files: SQLite gets a temporary file (not the
+    in-memory test database, so WAL and several connections behave as in
+    production), other backends their ``test_`` database, and the filter
+    replica lives in the same temporary directory.
+    """
+    with tempfile.TemporaryDirectory(prefix='analyzer-benchmark-') as directory:
+        directory = Path(directory)
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = str(directory / 'benchmark.sqlite3')
+        with override_settings(ANALYZER_FILTER_REPLICA_PATH=directory / 'filter_replica'):
+            old_config = setup_databases(verbosity=0, interactive=False, aliases={DEFAULT_DB_ALIAS},
+                                         serialized_aliases=set())
+            try:
+                yield
+            finally:
+                teardown_databases(old_config, verbosity=0)
+
+
+class Rollback(Exception):
+    """Raised to discard the synthetic rows seeded by a benchmark."""
+
+
+def time_call(fn, repeat=5):
+    """Run ``fn`` ``repeat`` times and return its timings in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'min_ms': round(min(timings), 3),
+        'median_ms': round(statistics.median(timings), 3),
+    }
+
+
+def synthetic_value(index, rng):
+    """Build a unique synthetic string; roughly one in twenty is a palindrome."""
+    if index % 20 == 0:
+        half = f"{index}{''.join(rng.choices(string.ascii_lowercase, k=rng.randint(0, 8)))}"
+        return half + half[::-1]
+    words = [
+        ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(1, 10)))
+        for _ in range(rng.randint(1, 12))
+    ]
+    if index % 50 == 0:
+        words.append('straße')
+    words.append(str(index))
+    return ' '.join(words)
+
+
+def seed_strings(rows, batch_size=5000, seed=0, start=0):
+    """Insert synthetic AnalyzedString rows ``start`` to ``rows`` in batches."""
+    rng = random.Random(seed + start)
+    batch = []
+    for index in range(start, rows):
+        value = synthetic_value(index, rng)
+        batch.append(build_analyzed_string(value, describe_string(value)))
+        if len(batch) >= batch_size:
+            AnalyzedString.objects.bulk_create(batch, ignore_conflicts=True)
+            index_characters(batch)
+            batch = []
+    if batch:
+        AnalyzedString.objects.bulk_create(batch, ignore_conflicts=True)
+        index_characters(batch)
+
+
+def drop_indexes(model):
+    """Drop the declared indexes of ``model`` on the current connection."""
+    with connection.cursor() as cursor:
+        for index in model._meta.indexes:
+            cursor.execute(f"DROP INDEX {connection.ops.quote_name(index.name)}")
+
+
+FILTER_QUERIES = {
+    'palindromes_min_length': lambda qs: filter_palindromes(qs, True).filter(length__gte=6),
+    'word_count_length_range': lambda qs: qs.filter(word_count=3, length__gte=10, length__lte=40),
+    'length_range': lambda qs: qs.filter(length__gte=50, length__lte=60),
+    'first_page_by_created': lambda qs: qs.order_by('created_at', 'id'),
+    'common_character_scan': lambda qs: qs.filter(value__icontains='q'),
+    'common_character_postings': lambda qs: filter_contains_characters(qs, 'q'),
+    'rare_character_scan': lambda qs: qs.filter(value__icontains='ß'),
+    'rare_character_postings': lambda qs: filter_contains_characters(qs, 'ß'),
+    'rare_characters_postings': lambda qs: filter_contains_characters(qs, 'ßq'),
+    'substring_scan': lambda qs: qs.filter(value__icontains='aße'),
+    'substring_search': lambda qs: filter_substring(qs, 'aße'),
+    'word_scan': lambda qs: qs.filter(value__iregex=r'(^|\W)straße(\W|$)'),
+    'word_search': lambda qs: filter_words(qs, 'straße'),
+}
+
+
+def explain(queryset, tag):
+    """Return the query plan of ``queryset``.
+
+    The SQL is tagged with a comment so that the driver prepares it afresh;
+    SQLite otherwise reuses a cached statement whose plan predates any
+    schema change made since.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql} /* {tag} */", params)
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def _measure_filter_queries(repeat, tag):
+    results = []
+    for name, build in FILTER_QUERIES.items():
+        queryset = build(AnalyzedString.objects.all())
+        page = queryset.order_by('created_at', 'id')[:100]
+        results.append({
+            'query': name,
+            'plan': explain(page, tag),
+            'count': time_call(queryset.count, repeat),
+            'first_page': time_call(lambda: list(page.all()), repeat),
+        })
+    return results
+
+
+def bench_filters(rows=100_000, repeat=5, **options):
+    """Filter query plans and latency with and without the filter indexes.
+
+    The synthetic rows and the dropped indexes live inside one transaction
+    that is rolled back at the end, so the database is left untouched.
+    """
+    results = {}
+    try:
+        with transaction.atomic():
+            seed_strings(rows)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            results['with_indexes'] = _measure_filter_queries(repeat, 'with_indexes')
+            drop_indexes(AnalyzedString)
+            results['without_indexes'] = _measure_filter_queries(repeat, 'without_indexes')
+            raise Rollback
+    except Rollback:
+        pass
+    return results
+
+
+def bench_analysis(rows=1000, repeat=5, value_size=10_000, **options):
+    """Throughput of batch analysis on the request thread and in the process pool."""
+    rng = random.Random(0)
+    alphabet = string.ascii_lowercase + ' '
+    values = [''.join(rng.choices(alphabet, k=value_size)) for _ in range(rows)]
+    total_mb = rows * value_size / 1_000_000
+
+    results = {'rows': rows, 'value_size': value_size, 'workers': engine.pool_workers()}
+    inline = time_call(lambda: [describe_string(value) for value in values], repeat)
+    results['inline'] = {**inline, 'mb_per_s': round(total_mb / inline['median_ms'] * 1000, 2)}
+    if engine.pool_workers():
+        list(engine.get_executor().map(describe_string, values[:engine.pool_workers()]))  # start the workers
+        pooled = time_call(lambda: engine.describe_many(values), repeat)
+        results['pool'] = {**pooled, 'mb_per_s': round(total_mb / pooled['median_ms'] * 1000, 2)}
+    return results
+
+
+KERNEL_ALPHABETS = {
+    'ascii': string.ascii_letters + string.digits + ' ',
+    'non_ascii': 'aeiouáéíóúßçñ中文字😀 ',
+}
+
+
+def bench_kernels(repeat=5, sizes=(10_000, 1_000_000, 8_000_000), **options):
+    """Per-MB cost of the pure-Python and NumPy analysis kernels."""
+    rng = random.Random(0)
+    results = []
+    for alphabet_name, alphabet in KERNEL_ALPHABETS.items():
+        for size in sizes:
+            value = ''.join(rng.choices(alphabet, k=size)).lower()
+            megabytes = len(value.encode('utf-8')) / 1_000_000
+            codes = utils.code_points(value)
+            kernels = {
+                'python_frequency': lambda: dict(Counter(value)),
+                'python_palindrome': lambda: value == value[::-1],
+                'numpy_encode': lambda: utils.code_points(value),
+                'numpy_frequency': lambda: utils.vectorized_character_frequency(codes),
+                'numpy_palindrome': lambda: utils.vectorized_is_palindrome(codes),
+                'describe_string': lambda: describe_string(value),
+            }
+            for kernel, fn in kernels.items():
+                timing = time_call(fn, repeat)
+                results.append({
+                    'alphabet': alphabet_name,
+                    'characters': size,
+                    'kernel': kernel,
+                    **timing,
+                    'ms_per_mb': round(timing['median_ms'] / megabytes, 3),
+                })
+    return results
+
+
+MICRO_ALPHABETS = {
+    **KERNEL_ALPHABETS,
+    'palindrome': 'ab',
+}
+
+
+def _micro_input(alphabet_name, size, rng):
+    if alphabet_name == 'palindrome':
+        # Worst case for the palindrome checks: they must compare every character.
+        half = ''.join(rng.choices(MICRO_ALPHABETS['palindrome'], k=size // 2))
+        return half + 'x' * (size % 2) + half[::-1]
+    return ''.join(rng.choices(MICRO_ALPHABETS[alphabet_name], k=size))
+
+
+def _per_call(fn, arg, repeat, budget=100_000):
+    """Time ``fn(arg)``, looping short inputs so each timing covers ``budget`` characters."""
+    number = max(1, budget // max(len(arg), 1))
+
+    def run():
+        for _ in range(number):
+            fn(arg)
+
+    timing = time_call(run, repeat)
+    per_call_ms = timing['median_ms'] / number
+    return {
+        'calls_per_timing': number,
+        'median_us': round(per_call_ms * 1000, 3),
+        'calls_per_s': round(1000 / per_call_ms, 1) if per_call_ms else None,
+    }
+
+
+def bench_micro(repeat=5, sizes=(10, 1_000, 100_000, 1_000_000), **options):
+    """Per-call cost of the analysis functions and the query parser.
+
+    The analysis functions run across ``sizes`` and MICRO_ALPHABETS; the
+    parser runs, uncached, on queries of one to four phrases.
+    """
+    rng = random.Random(0)
+    functions = {
+        'describe_string': describe_string,
+        'StringAnalyzer.analyze_string': StringAnalyzer.analyze_string,
+    }
+    analysis = []
+    for alphabet_name in MICRO_ALPHABETS:
+        for size in sizes:
+            value = _micro_input(alphabet_name, size, rng)
+            megabytes = len(value.encode('utf-8')) / 1_000_000
+            for name, fn in functions.items():
+                timing = _per_call(fn, value, repeat)
+                analysis.append({
+                    'function': name,
+                    'alphabet': alphabet_name,
+                    'characters': size,
+                    **timing,
+                    'ms_per_mb': round(timing['median_us'] / 1000 / megabytes, 3),
+                })
+
+    parse = query_planner._plan.__wrapped__
+    parser = []
+    for phrases in range(1, 5):
+        queries = [' '.join(rng.sample(QUERY_PHRASES, phrases)) for _ in range(200)]
+
+        def parse_all():
+            for query in queries:
+                try:
+                    parse(query_planner.normalize(query))
+                except ValueError:
+                    pass
+
+        timing = time_call(parse_all, repeat)
+        parser.append({
+            'function': 'plan_query (uncached)',
+            'phrases': phrases,
+            'median_us': round(timing['median_ms'] * 1000 / len(queries), 3),
+            'calls_per_s': round(len(queries) / timing['median_ms'] * 1000, 1),
+        })
+    return {'analysis': analysis, 'parser': parser}
+
+
+QUERY_PHRASES = [
+    'all', 'single word', 'one word', 'palindromic', 'palindrome', 'strings',
+    '2 words', 'longer than 5', 'longer than 12 characters', 'at least 3 characters',
+    'minimum length 7', 'shorter than 20', 'at most 9 characters', 'maximum of 4',
+    'containing the letter z', 'contains q', 'the first vowel', 'with letter m',
+]
+
+
+def query_corpus(size, distinct=300, seed=0):
+    """``size`` queries drawn from ``distinct`` random phrasings."""
+    rng = random.Random(seed)
+    phrasings = [
+        ' '.join(rng.sample(QUERY_PHRASES, rng.randint(1, 4))) for _ in range(distinct)
+    ]
+    return [rng.choice(phrasings) for _ in range(size)]
+
+
+def bench_parser(rows=10_000, repeat=5, **options):
+    """Natural language parse throughput with and without the plan cache."""
+    corpus = query_corpus(rows)
+
+    def parse_all(parse):
+        for query in corpus:
+            try:
+                parse(query)
+            except ValueError:
+                pass
+
+    uncached = time_call(lambda: parse_all(
+        lambda query: query_planner._plan.__wrapped__(query_planner.normalize(query))
+    ), repeat)
+    query_planner.clear_plan_cache()
+    cached = time_call(lambda: parse_all(query_planner.plan_query), repeat)
+    info = query_planner.plan_cache_info()
+    return {
+        'queries': len(corpus),
+        'distinct_queries': len(set(corpus)),
+        'uncached': {**uncached, 'parses_per_s': round(len(corpus) / uncached['median_ms'] * 1000)},
+        'cached': {**cached, 'parses_per_s': round(len(corpus) / cached['median_ms'] * 1000)},
+        'cache': {'hits': info.hits, 'misses': info.misses, 'size': info.currsize},
+    }
+
+
+ORM_NATURAL_LANGUAGE_QUERIES = (
+    'single word palindromic strings',
+    'strings longer than 20 characters containing the letter z',
+)
+
+
+def _orm_sizes(rows):
+    """Powers of ten from 10^4 up to ``rows``, plus ``rows`` itself."""
+    sizes = []
+    size = 10_000
+    while size < rows:
+        sizes.append(size)
+        size *= 10
+    return sizes + [rows]
+
+
+def _measure_orm(repeat):
+    queryset = AnalyzedString.objects.all()
+    pagination = KeysetPagination()
+    factory = RequestFactory()
+    total = queryset.count()
+    middle = queryset.order_by(*pagination.ordering).values_list('created_at', 'id')[total // 2]
+    deep_request = factory.get('/strings', {'cursor': pagination.encode_cursor(*middle)})
+    pk = middle[1]
+
+    results = {
+        'count_all': time_call(queryset.count, repeat),
+        'get_by_pk': time_call(lambda: queryset.get(pk=pk), repeat),
+        'first_page': time_call(lambda: pagination.paginate_queryset(queryset, factory.get('/strings')), repeat),
+        'middle_page': time_call(lambda: pagination.paginate_queryset(queryset, deep_request), repeat),
+        'stats': time_call(statistics_summary, repeat),
+    }
+    for name, build in FILTER_QUERIES.items():
+        results[f'filter_{name}_count'] = time_call(build(queryset).count, repeat)
+    for query in ORM_NATURAL_LANGUAGE_QUERIES:
+        plan = query_planner.plan_query(query)
+        results[f'natural_language: {query}'] = time_call(lambda: list(plan.apply(queryset)), repeat)
+    return results
+
+
+def bench_orm(rows=100_000, repeat=5, **options):
+    """Query latency as the table grows from 10^4 rows to ``rows``.
+
+    The table is grown in place between measurements inside one transaction
+    that is rolled back at the end, so the database is left untouched.
+    """
+    results = []
+    try:
+        with transaction.atomic():
+            seeded = 0
+            for size in _orm_sizes(rows):
+                seed_strings(size, start=seeded)
+                seeded = size
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+                results.append({'rows': size, 'queries': _measure_orm(repeat)})
+            raise Rollback
+    except Rollback:
+        pass
+    return results
+
+
+SERVER_URLCONFS = {
+    'sync': 'analyzer.urls',
+    'asgi': 'analyzer.async_urls',
+}
+# Seven retrievals, two filtered list pages and one large create per ten requests.
+SERVER_WORKLOAD = ('retrieve',) * 7 + ('list',) * 2 + ('create',)
+SERVER_CREATE_SIZE = 20_000
+
+
+def _seed_committed(rows, chunk_size=500):
+    """Insert synthetic rows for real and return ``(values, inserted pks)``.
+
+    The async views reach the database from a separate thread and therefore
+    a separate connection, so these rows cannot live in a rolled-back
+    transaction; only rows that did not exist yet are reported for cleanup.
+    """
+    rng = random.Random(0)
+    values = [synthetic_value(index, rng) for index in range(rows)]
+    strings = [build_analyzed_string(value, describe_string(value)) for value in values]
+    existing = set()
+    for start in range(0, len(strings), chunk_size):
+        pks = [string.pk for string in strings[start:start + chunk_size]]
+        existing.update(AnalyzedString.objects.filter(pk__in=pks).values_list('pk', flat=True))
+    new_strings = [string for string in strings if string.pk not in existing]
+    with transaction.atomic():
+        AnalyzedString.objects.bulk_create(new_strings, batch_size=5000)
+        strings_created(new_strings)
+    return values, [string.pk for string in new_strings]
+
+
+def _delete_rows(pks, chunk_size=500):
+    for start in range(0, len(pks), chunk_size):
+        delete_strings(pks[start:start + chunk_size])
+
+
+def _server_request(kind, values, tag, number, index):
+    if kind == 'create':
+        value = f"{tag} {number} {index} " + 'ab' * (SERVER_CREATE_SIZE // 2)
+        return 'post', '/strings', {'value': value}
+    if kind == 'list':
+        return 'get', '/strings?is_palindrome=true&page_size=20', None
+    return 'get', '/strings/' + quote(values[(number * 31 + index) % len(values)]), None
+
+
+async def _drive(send, clients, requests_per_client, values, tag):
+    latencies, created = [], []
+    errors = 0
+
+    async def client(number):
+        nonlocal errors
+        for index in range(requests_per_client):
+            kind = SERVER_WORKLOAD[(number + index) % len(SERVER_WORKLOAD)]
+            method, path, data = _server_request(kind, values, tag, number, index)
+            start = time.perf_counter()
+            try:
+                response = await send(method, path, data)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 500:
+                errors += 1
+            elif response.status_code == 201:
+                created.append(response.json()['id'])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(number) for number in range(clients)))
+    seconds = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'clients': clients,
+        'requests': clients * requests_per_client,
+        'errors': errors,
+        'seconds': round(seconds, 3),
+        'requests_per_s': round(clients * requests_per_client / seconds, 1),
+        'p50_ms': round(latencies[len(latencies) // 2], 3) if latencies else None,
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)], 3) if latencies else None,
+    }, created
+
+
+def _sync_request(method, path, data):
+    client = Client()
+    if method == 'post':
+        return client.post(path, data, content_type='application/json')
+    return client.get(path)
+
+
+async def _run_server(mode, clients, requests_per_client, values, sync_workers):
+    if mode == 'asgi':
+        client = AsyncClient()
+
+        async def send(method, path, data):
+            if method == 'post':
+                return await client.post(path, data, content_type='application/json')
+            return await client.get(path)
+        return await _drive(send, clients, requests_per_client, values, f'asgi {clients}')
+
+    # A sync server handles one request per worker at a time; the thread
+    # pool stands in for its worker slots and requests queue for a free one.
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=sync_workers) as pool:
+        async def send(method, path, data):
+            return await loop.run_in_executor(pool, _sync_request, method, path, data)
+        return await _drive(send, clients, requests_per_client, values, f'sync {clients}')
+
+
+def bench_servers(rows=10_000, concurrency=(100, 250, 500, 1000), requests_per_client=5,
+                  sync_workers=4, **options):
+    """Throughput of the sync DRF views against the async views under load.
+
+    Each level starts ``concurrency`` clients at once, each sending
+    ``requests_per_client`` requests of the SERVER_WORKLOAD mix in-process
+    through the test clients, so no network or server process is involved.
+    Rows seeded and created here are deleted at the end.
+    """
+    values, seeded = _seed_committed(rows)
+    created = []
+    results = {'rows': rows, 'sync_workers': sync_workers, 'runs': []}
+    no_throttle = {'DEFAULT_THROTTLE_CLASSES': [], 'DEFAULT_THROTTLE_RATES': {}}
+    try:
+        for clients in concurrency:
+            for mode, urlconf in SERVER_URLCONFS.items():
+                analysis_cache().clear()
+                query_cache().clear()
+                with override_settings(ROOT_URLCONF=urlconf, REST_FRAMEWORK=no_throttle):
+                    run, run_created = asyncio.run(
+                        _run_server(mode, clients, requests_per_client, values, sync_workers)
+                    )
+                created += run_created
+                results['runs'].append({'mode': mode, **run})
+    finally:
+        _delete_rows(seeded + created)
+    return results
+
+
+def _endpoint_requests(values, requests):
+    """The requests timed per endpoint, as ``(name, method, path, data, cache)``.
+
+    ``cache`` is ``'cold'`` when the caches are cleared before each request
+    and ``'warm'`` when they are left to serve repeats.
+    """
+    lookups = [quote(values[index * 7919 % len(values)]) for index in range(requests)]
+    yield 'create', 'post', [('/strings', {'value': f'endpoints {index} ' + values[index % len(values)]})
+                             for index in range(requests)], 'cold'
+    yield 'bulk_100', 'post', [('/strings/bulk', [f'endpoints bulk {index} {item}' for item in range(100)])
+                               for index in range(max(1, requests // 10))], 'cold'
+    for cache in ('cold', 'warm'):
+        yield 'retrieve', 'get', [(f'/strings/{lookup}', None) for lookup in lookups], cache
+        yield 'list', 'get', [('/strings?page_size=20', None)] * requests, cache
+        yield 'list_filtered', 'get', [('/strings?is_palindrome=true&min_length=6&page_size=20', None)] * requests, cache
+        yield 'natural_language', 'get', [
+            ('/strings/filter-by-natural-language?query=single%20word%20palindromic%20strings', None)
+        ] * requests, cache
+        yield 'stats', 'get', [('/strings/stats', None)] * requests, cache
+
+
+def bench_endpoints(rows=10_000, requests=200, **options):
+    """Sequential request throughput of each endpoint of the DRF viewset.
+
+    Requests go through Django's test client against ``rows`` seeded
+    strings, with throttling off. Seeded and created rows are deleted at the
+    end; the delete endpoint is timed on the rows the create run inserted.
+    """
+    client = Client()
+    values, seeded = _seed_committed(rows)
+    created = []
+    results = {'rows': rows, 'endpoints': []}
+    no_throttle = {'DEFAULT_THROTTLE_CLASSES': [], 'DEFAULT_THROTTLE_RATES': {}}
+
+    def run(name, method, calls, cache):
+        latencies, errors = [], 0
+        for path, data in calls:
+            if cache == 'cold':
+                analysis_cache().clear()
+                query_cache().clear()
+            start = time.perf_counter()
+            if method == 'post':
+                response = client.post(path, data, content_type='application/json')
+            elif method == 'delete':
+                response = client.delete(path)
+            else:
+                response = client.get(path)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+            elif response.status_code == 201:
+                created.append(response.json()['id'])
+            elif name.startswith('bulk'):
+                created.extend(result['id'] for result in response.json()['results']
+                               if result.get('status') == 'created')
+        latencies.sort()
+        results['endpoints'].append({
+            'endpoint': name,
+            'method': method.upper(),
+            'cache': cache,
+            'requests': len(latencies),
+            'errors': errors,
+            'requests_per_s': round(len(latencies) / sum(latencies) * 1000, 1),
+            'p50_ms': round(latencies[len(latencies) // 2], 3),
+            'p95_ms': round(latencies[int(len(latencies) * 0.95)], 3),
+        })
+
+    try:
+        with override_settings(ROOT_URLCONF='analyzer.urls', REST_FRAMEWORK=no_throttle):
+            for name, method, calls, cache in _endpoint_requests(values, requests):
+                run(name, method, calls, cache)
+            deletions = AnalyzedString.objects.filter(pk__in=created[:requests]).values_list('value', flat=True)
+            run('delete', 'delete', [(f'/strings/{quote(value)}', None) for value in deletions], 'cold')
+    finally:
+        _delete_rows(seeded + created)
+    return results
+
+
+# SQLite's own defaults (as Django leaves them) against SQLITE_PRAGMAS.
+SQLITE_PROFILES = {
+    'rollback_journal': {'busy_timeout': 5000, 'journal_mode': 'delete', 'synchronous': 'full', 'mmap_size': 0},
+    'configured': None,
+}
+
+
+def _write_strings(values, created, errors):
+    try:
+        for value in values:
+            try:
+                created.append(create_analyzed_string(value, describe_string(value)).pk)
+            except OperationalError:
+                errors.append(value)
+    finally:
+        connection.close()
+
+
+def bench_writers(rows=2000, writers=(1, 4, 16), **options):
+    """Single-row insert throughput and lock errors with concurrent writers.
+
+    Each writer thread opens its own connection and inserts its share of
+    ``rows`` strings one transaction at a time, like concurrent POST
+    /strings requests, once per SQLite profile. Inserted rows are deleted
+    afterwards.
+    """
+    if connection.vendor != 'sqlite':
+        return {'vendor': connection.vendor, 'runs': []}
+    transaction_mode = connection.settings_dict['OPTIONS'].get('transaction_mode', 'DEFERRED')
+    results = {'rows': rows, 'transaction_mode': transaction_mode, 'runs': []}
+    created = []
+    try:
+        for profile, pragmas in SQLITE_PROFILES.items():
+            pragmas = pragmas or settings.SQLITE_PRAGMAS
+            for count in writers:
+                values = [f"writers {profile} {count} {index}" for index in range(rows)]
+                errors = []
+                with override_settings(SQLITE_PRAGMAS=pragmas):
+                    # The journal mode can only change while no other
+                    # connection is open, so switch it before the writers start.
+                    connection.close()
+                    connection.ensure_connection()
+                    connection.close()
+                    threads = [
+                        threading.Thread(target=_write_strings, args=(values[offset::count], created, errors))
+                        for offset in range(count)
+                    ]
+                    start = time.perf_counter()
+                    for thread in threads:
+                        thread.start()
+                    for thread in threads:
+                        thread.join()
+                    seconds = time.perf_counter() - start
+                results['runs'].append({
+                    'profile': profile,
+                    'writers': count,
+                    'inserted': rows - len(errors),
+                    'locked_errors': len(errors),
+                    'seconds': round(seconds, 3),
+                    'inserts_per_s': round((rows - len(errors)) / seconds, 1),
+                })
+    finally:
+        _delete_rows(created)
+        # Leave the database file in the configured journal mode.
+        connection.close()
+        connection.ensure_connection()
+    return results
+
+
+def run_metadata(options):
+    """Describe the environment of a benchmark run, so saved results can be compared."""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'numpy': utils.np.__version__ if utils.np is not None else None,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'database': {
+            'vendor': connection.vendor,
+            'version': '.'.join(map(str, connection.get_database_version())),
+        },
+        'options': options,
+    }
+
+
+SCENARIOS = {
+    'filters': bench_filters,
+    'analysis': bench_analysis,
+    'kernels': bench_kernels,
+    'parser': bench_parser,
+    'servers': bench_servers,
+    'writers': bench_writers,
+    'micro': bench_micro,
+    'orm': bench_orm,
+    'endpoints': bench_endpoints,
+}
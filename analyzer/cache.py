@@ -0,0 +1,182 @@
+import hashlib
+import json
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from .changes import acurrent_version, current_version
+from .models import AnalyzedString
+
+ANALYSIS_CACHE_ALIAS = 'analyses'
+QUERY_CACHE_ALIAS = 'queries'
+
+# Per-name byte accounting, shared like LocMemCache's own storage.
+_sizes = {}
+_totals = {}
+
+
+class BoundedLRUCache(LocMemCache):
+    """Local-memory cache bounded by entry count and by total pickled size.
+
+    LocMemCache already keeps entries in least-recently-used order but culls
+    a fraction of them at once and has no notion of size. This backend
+    evicts the least recently used entries one at a time until both
+    ``MAX_ENTRIES`` and ``MAX_BYTES`` are satisfied.
+    """
+
+    def __init__(self, name, params):
+        super().__init__(name, params)
+        options = params.get('OPTIONS', {})
+        self._max_bytes = int(options.get('MAX_BYTES', 64 * 1024 * 1024))
+        self._sizes = _sizes.setdefault(name, {})
+        self._name = name
+        _totals.setdefault(name, 0)
+
+    @property
+    def total_bytes(self):
+        return _totals[self._name]
+
+    def _set(self, key, value, timeout):
+        self._delete(key)
+        if len(value) > self._max_bytes:
+            return
+        while self._cache and (
+            len(self._cache) >= self._max_entries
+            or _totals[self._name] + len(value) > self._max_bytes
+        ):
+            self._cull()
+        self._cache[key] = value
+        self._cache.move_to_end(key, last=False)
+        self._expire_info[key] = self.get_backend_timeout(timeout)
+        self._sizes[key] = len(value)
+        _totals[self._name] += len(value)
+
+    def _cull(self):
+        # Every eviction goes through _delete, so the byte count follows it.
+        self._delete(next(reversed(self._cache)))
+
+    def _delete(self, key):
+        deleted = super()._delete(key)
+        if deleted:
+            _totals[self._name] -= self._sizes.pop(key, 0)
+        return deleted
+
+    def incr(self, key, delta=1, version=None):
+        value = super().incr(key, delta, version)
+        key = self.make_and_validate_key(key, version=version)
+        with self._lock:
+            if key in self._cache:
+                size = len(self._cache[key])
+                _totals[self._name] += size - self._sizes.get(key, 0)
+                self._sizes[key] = size
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self._expire_info.clear()
+            self._sizes.clear()
+            _totals[self._name] = 0
+
+
+def analysis_cache():
+    return caches[ANALYSIS_CACHE_ALIAS]
+
+
+def _analysis_key(sha256):
+    return f'analysis:{sha256}'
+
+
+def get_cached_analysis(sha256):
+    """Return the cached StringSerializer output for ``sha256``, if the row is still stored.
+
+    Each worker has its own cache, and a delete drops only the entry of the
+    worker that made it. So a hit is served only once a primary-key lookup
+    finds the row with the ``created_at`` it was cached with, which also
+    rules out a string deleted and created again since.
+    """
+    key = _analysis_key(sha256)
+    entry = analysis_cache().get(key)
+    if entry is None:
+        return None
+    created_at, data = entry
+    if not AnalyzedString.objects.filter(pk=sha256, created_at=created_at).exists():
+        analysis_cache().delete(key)
+        return None
+    return data
+
+
+def cache_analysis(instance, data):
+    analysis_cache().set(_analysis_key(instance.pk), (instance.created_at, dict(data)))
+
+
+async def aget_cached_analysis(sha256):
+    key = _analysis_key(sha256)
+    entry = await analysis_cache().aget(key)
+    if entry is None:
+        return None
+    created_at, data = entry
+    if not await AnalyzedString.objects.filter(pk=sha256, created_at=created_at).aexists():
+        await analysis_cache().adelete(key)
+        return None
+    return data
+
+
+async def acache_analysis(instance, data):
+    await analysis_cache().aset(_analysis_key(instance.pk), (instance.created_at, dict(data)))
+
+
+def invalidate_analyses(sha256s):
+    analysis_cache().delete_many([_analysis_key(sha256) for sha256 in sha256s])
+
+
+def query_cache():
+    return caches[QUERY_CACHE_ALIAS]
+
+
+def data_version():
+    """Token identifying the current state of the stored strings.
+
+    Read from the database (see analyzer.changes) on every call, so a write
+    committed by any process, or behind the API's back, changes it for all.
+    """
+    epoch, changes = current_version()
+    return f'{epoch}:{changes}'
+
+
+async def adata_version():
+    epoch, changes = await acurrent_version()
+    return f'{epoch}:{changes}'
+
+
+def _query_key(kind, version, params):
+    canonical = json.dumps(params, sort_keys=True, default=str)
+    digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    return f'{kind}:{version}:{digest}'
+
+
+def cached_query_result(kind, params, compute):
+    """Return ``compute()``, cached under the data version and ``params``.
+
+    ``params`` is the canonical description of the query (parsed filters,
+    page, projection); it is hashed with sorted keys so equal filter sets
+    share an entry however they were spelled.
+    """
+    key = _query_key(kind, data_version(), params)
+    cache = query_cache()
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result)
+    return result
+
+
+async def acached_query_result(kind, params, compute):
+    """Async version of ``cached_query_result``; ``compute`` is awaited."""
+    key = _query_key(kind, await adata_version(), params)
+    cache = query_cache()
+    result = await cache.aget(key)
+    if result is None:
+        result = await compute()
+        await cache.aset(key, result)
+    return result
@@ -0,0 +1,160 @@
+"""A database-maintained count and log of writes to AnalyzedString.
+
+Triggers on ``analyzer_analyzedstring`` add one to ``DataVersion.changes``
+for every row inserted, deleted or updated, and record the row's primary key
+in ``StringChange`` under the new count. Because the triggers run inside the
+writing transaction, the count changes for every write, whether it comes
+from the API, the admin, ``QuerySet.delete()``, a shell or raw SQL. Readers
+see it change when the write commits, in every process.
+
+``data_version()`` (analyzer.cache) is the epoch and the count. Consumers
+that keep their own copy of the table (the similarity index, the filter
+replica) remember the count they are current with and replay the log from
+there. The log keeps the last CHANGE_LOG_RETENTION changes; a consumer that
+falls further behind rebuilds from the table instead.
+
+Writers update the counter row, so they take its lock in turn and the log
+numbers changes in commit order without gaps, on PostgreSQL as on SQLite.
+
+As with the search triggers, SQLite drops these when a migration rebuilds
+the table; ``install_change_log`` runs after every ``migrate`` to put them
+back.
+"""
+from uuid import uuid4
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from .models import DataVersion, StringChange
+
+# Changes kept in the log.
+CHANGE_LOG_RETENTION = 100_000
+
+STRING_TABLE = 'analyzer_analyzedstring'
+VERSION_TABLE = DataVersion._meta.db_table
+LOG_TABLE = StringChange._meta.db_table
+
+# Columns whose update changes what the API reports for a string. Rewriting
+# the frequency map encoding (compact_frequency_maps) does not.
+TRACKED_COLUMNS = ('id', 'value', 'created_at', 'length', 'word_count', 'unique_characters', 'is_palindrome')
+
+
+def _sqlite_log(key):
+    return f"""
+            UPDATE {VERSION_TABLE} SET changes = changes + 1 WHERE id = 1;
+            INSERT OR REPLACE INTO {LOG_TABLE} (seq, string_id)
+                SELECT changes, {key} FROM {VERSION_TABLE} WHERE id = 1;
+            DELETE FROM {LOG_TABLE}
+                WHERE seq <= (SELECT changes FROM {VERSION_TABLE} WHERE id = 1) - {CHANGE_LOG_RETENTION};"""
+
+
+_SQLITE_TRIGGERS = {
+    'analyzer_change_insert': f"""
+        CREATE TRIGGER analyzer_change_insert AFTER INSERT ON {STRING_TABLE} BEGIN{_sqlite_log('new.id')}
+        END""",
+    'analyzer_change_delete': f"""
+        CREATE TRIGGER analyzer_change_delete AFTER DELETE ON {STRING_TABLE} BEGIN{_sqlite_log('old.id')}
+        END""",
+    'analyzer_change_update': f"""
+        CREATE TRIGGER analyzer_change_update AFTER UPDATE OF {', '.join(TRACKED_COLUMNS)}
+        ON {STRING_TABLE} BEGIN{_sqlite_log('new.id')}
+        END""",
+    # A changed primary key also changes the row that had the old one.
+    'analyzer_change_rekey': f"""
+        CREATE TRIGGER analyzer_change_rekey AFTER UPDATE OF id ON {STRING_TABLE}
+        WHEN old.id != new.id BEGIN{_sqlite_log('old.id')}
+        END""",
+}
+
+_POSTGRESQL_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION analyzer_log_string_change() RETURNS trigger AS $$
+    DECLARE
+        change_number bigint;
+        string_key varchar(64);
+    BEGIN
+        FOREACH string_key IN ARRAY CASE
+            WHEN TG_OP = 'INSERT' THEN ARRAY[NEW.id]
+            WHEN TG_OP = 'DELETE' THEN ARRAY[OLD.id]
+            WHEN OLD.id <> NEW.id THEN ARRAY[NEW.id, OLD.id]
+            ELSE ARRAY[NEW.id]
+        END LOOP
+            UPDATE {VERSION_TABLE} SET changes = changes + 1 WHERE id = 1 RETURNING changes INTO change_number;
+            CONTINUE WHEN change_number IS NULL;
+            INSERT INTO {LOG_TABLE} (seq, string_id) VALUES (change_number, string_key)
+                ON CONFLICT (seq) DO UPDATE SET string_id = excluded.string_id;
+            DELETE FROM {LOG_TABLE} WHERE seq <= change_number - {CHANGE_LOG_RETENTION};
+        END LOOP;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql"""
+
+_POSTGRESQL_TRIGGER = f"""
+    CREATE TRIGGER analyzer_change_log
+    AFTER INSERT OR DELETE OR UPDATE OF {', '.join(TRACKED_COLUMNS)} ON {STRING_TABLE}
+    FOR EACH ROW EXECUTE FUNCTION analyzer_log_string_change()"""
+
+
+def install_change_triggers(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name, sql in _SQLITE_TRIGGERS.items():
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+                cursor.execute(sql)
+        elif connection.vendor == 'postgresql':
+            cursor.execute(_POSTGRESQL_FUNCTION)
+            cursor.execute(f"DROP TRIGGER IF EXISTS analyzer_change_log ON {STRING_TABLE}")
+            cursor.execute(_POSTGRESQL_TRIGGER)
+
+
+def drop_change_triggers(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in _SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f"DROP TRIGGER IF EXISTS analyzer_change_log ON {STRING_TABLE}")
+            cursor.execute("DROP FUNCTION IF EXISTS analyzer_log_string_change()")
+
+
+def install_change_log(sender=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Create the counter row if it is missing and (re)install the triggers.
+
+    Connected to ``post_migrate``, which also follows ``flush``. A new
+    counter row starts a new epoch and an empty log.
+    """
+    connection = connections[using]
+    if VERSION_TABLE not in connection.introspection.table_names():
+        return
+    if not DataVersion.objects.using(using).filter(pk=1).exists():
+        StringChange.objects.using(using).all().delete()
+        DataVersion.objects.using(using).create(pk=1, epoch=uuid4().hex)
+    install_change_triggers(connection)
+
+
+def current_version(using=DEFAULT_DB_ALIAS):
+    """``(epoch, changes)`` as last committed, or as written by this transaction."""
+    return DataVersion.objects.using(using).filter(pk=1).values_list('epoch', 'changes').first() or ('', 0)
+
+
+async def acurrent_version(using=DEFAULT_DB_ALIAS):
+    return await DataVersion.objects.using(using).filter(pk=1).values_list('epoch', 'changes').afirst() or ('', 0)
+
+
+def changed_strings(after, until, using=DEFAULT_DB_ALIAS):
+    """Primary keys of the rows written by changes ``after`` (exclusive) to ``until``.
+
+    Returns None when the log no longer reaches back to ``after``, in which
+    case the caller has to start over from the table.
+    """
+    if until <= after:
+        return set()
+    if until - after > CHANGE_LOG_RETENTION:
+        return None
+    rows = StringChange.objects.using(using).filter(seq__gt=after, seq__lte=until).values_list('seq', 'string_id')
+    seqs, pks = set(), set()
+    for seq, pk in rows.iterator(chunk_size=5000):
+        seqs.add(seq)
+        pks.add(pk)
+    # Changes are numbered without gaps, so a trimmed log shows as missing ones.
+    if len(seqs) != until - after:
+        return None
+    return pks
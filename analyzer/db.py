@@ -0,0 +1,46 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+
+def configure_connection(sender, connection, **kwargs):
+    """Apply SQLITE_PRAGMAS to every new SQLite connection.
+
+    Connected to ``connection_created``, so the pragmas that only last for a
+    connection (synchronous, mmap_size, busy_timeout) are in force for every
+    one of them, whichever worker or thread opened it.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@contextmanager
+def read_only_transaction(using=DEFAULT_DB_ALIAS):
+    """Run the block's queries against one snapshot of the database, read-only.
+
+    ``transaction.atomic()`` begins IMMEDIATE on SQLite (see
+    ``transaction_mode``), holding the write lock for the whole block. A
+    deferred BEGIN only pins a read snapshot, which under WAL does not block
+    writers. PostgreSQL gets a REPEATABLE READ, READ ONLY transaction.
+    """
+    connection = connections[using]
+    if connection.in_atomic_block:
+        yield
+    elif connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute('BEGIN DEFERRED')
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute('ROLLBACK')
+    else:
+        with transaction.atomic(using=using):
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+            yield
@@ -0,0 +1,86 @@
+import asyncio
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from .metrics import timed
+from .utils import NUMPY_MIN_LENGTH, describe_string
+
+# Async callers analyse strings up to this size on the event loop; handing
+# them to a thread costs more than the analysis itself.
+ASYNC_INLINE_MAX_CHARS = 4096
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _pool_settings():
+    return getattr(settings, 'ANALYZER_PROCESS_POOL', {})
+
+
+def pool_workers() -> int:
+    """Number of analysis worker processes; 0 keeps all work in-process."""
+    return _pool_settings().get('WORKERS', 0)
+
+
+def get_executor():
+    """Return the shared analysis process pool, creating it on first use.
+
+    Workers are spawned rather than forked so that the pool can be started
+    safely from threaded servers.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=pool_workers(),
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+                atexit.register(_executor.shutdown, wait=False, cancel_futures=True)
+    return _executor
+
+
+def _use_pool(size: int) -> bool:
+    # Below NUMPY_MIN_LENGTH the analysis is cheaper than pickling it to a
+    # worker and back, whatever MIN_CHARS says.
+    return pool_workers() > 0 and size >= max(_pool_settings().get('MIN_CHARS', 1_000_000), NUMPY_MIN_LENGTH)
+
+
+def describe(value: str) -> dict:
+    """Analyse one string, in a worker process when it is large enough.
+
+    The caller waits for the result either way, so the pool only pays off
+    for strings long enough that the analysis should not hold the GIL
+    against the server's other threads.
+    """
+    with timed('analysis'):
+        if not _use_pool(len(value)):
+            return describe_string(value)
+        return get_executor().submit(describe_string, value).result()
+
+
+async def adescribe(value: str) -> dict:
+    """Analyse one string without blocking the event loop.
+
+    Large strings go to the process pool when it is enabled and to the
+    event loop's default thread pool otherwise.
+    """
+    with timed('analysis'):
+        if len(value) <= ASYNC_INLINE_MAX_CHARS:
+            return describe_string(value)
+        executor = get_executor() if _use_pool(len(value)) else None
+        return await asyncio.get_running_loop().run_in_executor(executor, describe_string, value)
+
+
+def describe_many(values) -> list:
+    """Analyse a batch of strings, spreading large batches across the pool."""
+    values = list(values)
+    with timed('analysis'):
+        if not _use_pool(sum(map(len, values))):
+            return [describe_string(value) for value in values]
+        chunksize = max(1, len(values) // (pool_workers() * 4))
+        return list(get_executor().map(describe_string, values, chunksize=chunksize))
@@ -1,6 +1,42 @@
 # your_app/filters.py
 import django_filters
+from django.db.models import Value
+
 from .models import AnalyzedString
+from .search import filter_contains_characters, filter_substring, filter_words
+
+
+def applied_filters(query_params):
+    """The list filters in effect, normalized to their parsed values."""
+    filters_applied = {}
+
+    is_palindrome = query_params.get('is_palindrome', '').lower()
+    if is_palindrome in ('true', '1'):
+        filters_applied["is_palindrome"] = True
+    elif is_palindrome in ('false', '0'):
+        filters_applied["is_palindrome"] = False
+
+    for name in ('min_length', 'max_length', 'word_count'):
+        value = query_params.get(name)
+        if value:
+            filters_applied[name] = int(value)
+
+    for name in ('contains_character', 'contains_characters', 'contains_substring', 'contains_word'):
+        value = query_params.get(name)
+        if value:
+            filters_applied[name] = value
+
+    return filters_applied
+
+
+def filter_palindromes(queryset, value):
+    """Rows whose ``is_palindrome`` is ``value``.
+
+    ``filter(is_palindrome=True)`` compiles to a bare ``WHERE is_palindrome``
+    (``NOT is_palindrome`` for False), which SQLite cannot look up in an
+    index. Comparing with a bound value keeps the predicate an equality.
+    """
+    return queryset.filter(is_palindrome=Value(value))
 
 
 class AnalyzedStringFilter(django_filters.FilterSet):
@@ -10,14 +46,37 @@ class AnalyzedStringFilter(django_filters.FilterSet):
 
     # Example 2: Range filter for 'word_count' (e.g., ?word_count__gte=5)
     word_count = django_filters.NumberFilter(field_name='word_count', lookup_expr='exact')
-    contains_character = django_filters.CharFilter(field_name='value', lookup_expr='icontains')
+    contains_character = django_filters.CharFilter(method='filter_contains_character')
+    contains_characters = django_filters.CharFilter(method='filter_all_characters')
+    # Substring and whole-word search, served by the search indexes (see search.py).
+    contains_substring = django_filters.CharFilter(method='filter_contains_substring')
+    contains_word = django_filters.CharFilter(method='filter_contains_word')
 
     # Example 3: Boolean filter for 'is_palindrome' (e.g., ?is_palindrome=true)
-    is_palindrome = django_filters.BooleanFilter(field_name='is_palindrome')
+    is_palindrome = django_filters.BooleanFilter(method='filter_is_palindrome')
 
     class Meta:
         model = AnalyzedString
         # You can also list fields for simple exact lookups
-        fields = ['is_palindrome', "min_length", "max_length", "word_count", "contains_character"]
+        fields = ['is_palindrome', "min_length", "max_length", "word_count", "contains_character", "contains_characters",
+                  "contains_substring", "contains_word"]
+
+    def filter_is_palindrome(self, queryset, name, value):
+        return filter_palindromes(queryset, value)
+
+    def filter_contains_character(self, queryset, name, value):
+        # Longer values keep their substring meaning.
+        if len(value) != 1:
+            return filter_substring(queryset, value)
+        return filter_contains_characters(queryset, value)
+
+    def filter_all_characters(self, queryset, name, value):
+        return filter_contains_characters(queryset, value)
+
+    def filter_contains_substring(self, queryset, name, value):
+        return filter_substring(queryset, value)
+
+    def filter_contains_word(self, queryset, name, value):
+        return filter_words(queryset, value)
 
         
\ No newline at end of file
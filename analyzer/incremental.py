@@ -0,0 +1,139 @@
+"""Incremental analysis of strings that arrive in chunks.
+
+StreamingAnalysis produces the same result as ``describe_string`` without
+holding the whole string in memory: the hash, length, word count and
+character frequencies are updated chunk by chunk, and the lowercased text
+is spooled to a temporary file that is memory-mapped to check for a
+palindrome one block at a time.
+"""
+import codecs
+import hashlib
+import mmap
+import tempfile
+from collections import Counter
+
+from .utils import generate_character_freq_map
+
+# Bytes read from the request per chunk.
+CHUNK_SIZE = 1 << 18
+
+# Characters compared per step of the palindrome check.
+PALINDROME_BLOCK = 1 << 16
+
+# Characters split into words at a time.
+WORD_BLOCK = 1 << 14
+
+
+class StreamingAnalysis:
+    """Analyse UTF-8 text fed as a sequence of byte chunks.
+
+    Use as a context manager so that the spool files are closed, ``feed``
+    every chunk, then call ``finish`` for the analysis and ``value`` for the
+    decoded text.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._sha256 = hashlib.sha256()
+        self._frequencies = Counter()
+        self._word_count = 0
+        self._in_word = False
+        self._pending = ''
+        self._after_cased = False
+        self.length = 0
+        self.size = 0
+        # The lowercased text as UTF-32, so that character i sits at byte 4*i,
+        # and the raw body for storing the value.
+        self._lowered = tempfile.TemporaryFile()
+        self._original = tempfile.TemporaryFile()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._lowered.close()
+        self._original.close()
+
+    def feed(self, data: bytes, final=False):
+        """Add a chunk of the body; raises UnicodeDecodeError on invalid UTF-8."""
+        text = self._decoder.decode(data, final)
+        self.size += len(data)
+        self._original.write(data)
+        if text:
+            self._count(text)
+        if text or final:
+            lowered = self._lower(text, final)
+            self._sha256.update(lowered.encode('utf-8'))
+            self._frequencies.update(generate_character_freq_map(lowered))
+            self._lowered.write(lowered.encode('utf-32-le'))
+
+    def _count(self, text):
+        self.length += len(text)
+        # Split a block at a time to bound the list of words; a word split
+        # across blocks or chunks is counted in both, so drop one.
+        for start in range(0, len(text), WORD_BLOCK):
+            block = text[start:start + WORD_BLOCK]
+            words = len(block.split())
+            if self._in_word and not block[0].isspace():
+                words -= 1
+            self._word_count += words
+            self._in_word = not block[-1].isspace()
+
+    def _lower(self, text, final):
+        """Lowercase the next piece of text as ``str.lower()`` would the whole.
+
+        The only context-dependent mapping is the final sigma, which depends
+        on the letters around a capital sigma, so text from the last capital
+        sigma on is held back until what follows it has arrived, and a
+        one-letter prefix stands in for what preceded it.
+        """
+        text = self._pending + text
+        cut = len(text) if final else text.rfind('Σ')
+        if cut < 0:
+            cut = len(text)
+        prefix = 'a' if self._after_cased else ' '
+        lowered = (prefix + text).lower()[1:]
+        self._pending = text[cut:]
+        if self._pending:
+            lowered = lowered[:len(lowered) - len(self._pending.lower())]
+        if cut:
+            self._after_cased = (prefix + text[:cut] + 'Σ').lower().endswith('ς')
+        return lowered
+
+    def finish(self) -> dict:
+        """Return the ``describe_string`` result for everything fed so far."""
+        self.feed(b'', final=True)
+        return {
+            "length": self.length,
+            "is_palindrome": self._is_palindrome(),
+            "unique_characters": len(self._frequencies),
+            "word_count": self._word_count,
+            "sha256_hash": self._sha256.hexdigest(),
+            "character_frequency_map": dict(self._frequencies),
+        }
+
+    def _is_palindrome(self) -> bool:
+        self._lowered.flush()
+        size = self._lowered.tell()
+        if not size:
+            return True
+        characters = size // 4
+        half = characters // 2
+        with mmap.mmap(self._lowered.fileno(), size, access=mmap.ACCESS_READ) as spool:
+            for start in range(0, half, PALINDROME_BLOCK):
+                stop = min(start + PALINDROME_BLOCK, half)
+                head = spool[start * 4:stop * 4].decode('utf-32-le')
+                tail = spool[(characters - stop) * 4:(characters - start) * 4].decode('utf-32-le')
+                if head != tail[::-1]:
+                    return False
+        return True
+
+    def value(self) -> str:
+        """The complete decoded text, read back from the spool.
+
+        This holds the whole body in memory (twice, briefly, as bytes and as
+        text); callers bound ``size`` before asking for it.
+        """
+        self._original.flush()
+        self._original.seek(0)
+        return self._original.read().decode('utf-8')
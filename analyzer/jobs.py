@@ -0,0 +1,189 @@
+"""Background analysis of requests accepted with ``?async=true``.
+
+POST /strings and POST /strings/bulk validate the input, store it as a
+queued AnalysisJob and answer 202 with the job's id; GET /jobs/{id} reports
+its progress. The job table is the queue, so no broker is needed: worker
+threads started in each web process claim the oldest queued job with a
+conditional UPDATE, which exactly one claimant wins on any backend, and
+``manage.py run_analysis_jobs`` runs the same loop as a dedicated process.
+
+Once MAX_QUEUED jobs are waiting, new ones are refused (503) instead of
+letting the backlog grow without bound. Jobs left running by a process that
+died are queued again after STALE_SECONDS, up to MAX_ATTEMPTS times.
+"""
+import logging
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from .engine import describe
+from .models import AnalysisJob
+from .serializers import StringSerializer
+from .services import create_analyzed_string, ingest_batch
+
+logger = logging.getLogger(__name__)
+
+# Seconds a refused client is asked to wait before retrying.
+RETRY_AFTER_SECONDS = 5
+
+
+class QueueFull(Exception):
+    """Raised by ``enqueue`` when MAX_QUEUED jobs are already waiting."""
+
+
+def _job_settings():
+    return getattr(settings, 'ANALYZER_JOBS', {})
+
+
+def wants_async(params):
+    """Whether the query string asks for ``?async=true``."""
+    return params.get('async', '').lower() in ('true', '1')
+
+
+def enqueue(kind, payload):
+    """Store a queued job and wake the local workers once it is committed."""
+    with transaction.atomic():
+        if AnalysisJob.objects.filter(status=AnalysisJob.QUEUED).count() >= _job_settings().get('MAX_QUEUED', 100):
+            raise QueueFull
+        job = AnalysisJob.objects.create(kind=kind, payload=payload)
+        transaction.on_commit(worker_pool.notify)
+    return job
+
+
+def accepted_body(job):
+    """The 202 response body for a newly queued job."""
+    return {"job_id": str(job.pk), "status": job.status, "status_url": reverse('analysis-job-detail', args=[job.pk])}
+
+
+def claim_next_job():
+    """Mark the oldest queued job running and return it, or None if there is none."""
+    queued = AnalysisJob.objects.filter(status=AnalysisJob.QUEUED)
+    for pk in queued.order_by('created_at').values_list('pk', flat=True)[:10]:
+        claimed = queued.filter(pk=pk).update(
+            status=AnalysisJob.RUNNING, started_at=timezone.now(), attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return AnalysisJob.objects.get(pk=pk)
+    return None
+
+
+def requeue_stale_jobs():
+    """Queue again jobs whose worker went away, failing those out of attempts."""
+    options = _job_settings()
+    stale = AnalysisJob.objects.filter(
+        status=AnalysisJob.RUNNING,
+        started_at__lt=timezone.now() - timedelta(seconds=options.get('STALE_SECONDS', 600)),
+    )
+    max_attempts = options.get('MAX_ATTEMPTS', 3)
+    stale.filter(attempts__gte=max_attempts).update(
+        status=AnalysisJob.FAILED, payload=None, finished_at=timezone.now(),
+        error=f"Abandoned by its worker {max_attempts} times",
+    )
+    return stale.update(status=AnalysisJob.QUEUED, started_at=None)
+
+
+def _run_create(payload):
+    value = payload['value']
+    try:
+        instance = create_analyzed_string(value, describe(value))
+    except IntegrityError:
+        return {"data-conflict": ["the provided string already exists"]}, 409
+    return StringSerializer(instance).data, 201
+
+
+def _run_bulk(payload):
+    results = [{"index": index} for index in range(payload['size'])]
+    counts = {"created": 0, "conflict": 0, "invalid": 0}
+    for index, error in payload['invalid']:
+        results[index].update(status="invalid", error=error)
+        counts["invalid"] += 1
+    indexes, values, batch_size = payload['indexes'], payload['values'], payload['batch_size']
+    for start in range(0, len(values), batch_size):
+        batch = ingest_batch(values[start:start + batch_size])
+        for index, result in zip(indexes[start:start + batch_size], batch):
+            results[index].update(result)
+            counts[result['status']] += 1
+    return {"results": results, **counts}, 200
+
+
+RUNNERS = {
+    AnalysisJob.CREATE: _run_create,
+    AnalysisJob.BULK: _run_bulk,
+}
+
+
+def run_job(job):
+    """Run a claimed job and record its outcome."""
+    try:
+        job.result, job.status_code = RUNNERS[job.kind](job.payload)
+        job.status = AnalysisJob.DONE
+    except Exception as e:
+        logger.exception("Analysis job %s failed", job.pk)
+        job.status = AnalysisJob.FAILED
+        job.error = str(e) or e.__class__.__name__
+    job.payload = None
+    job.finished_at = timezone.now()
+    job.save(update_fields=['result', 'status_code', 'status', 'error', 'payload', 'finished_at'])
+
+
+def work(stop=None, wakeup=None, poll_seconds=None):
+    """Claim and run jobs until ``stop`` is set, waiting on ``wakeup`` when idle.
+
+    Without a wakeup the loop polls every POLL_SECONDS, which is also how it
+    notices jobs queued by other processes.
+    """
+    stop = stop or threading.Event()
+    wakeup = wakeup or threading.Event()
+    if poll_seconds is None:
+        poll_seconds = _job_settings().get('POLL_SECONDS', 1)
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                wakeup.wait(poll_seconds)
+                wakeup.clear()
+                continue
+            run_job(job)
+    finally:
+        close_old_connections()
+
+
+class WorkerPool:
+    """Threads running ``work`` in this process, started on first use."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+    def start(self):
+        workers = _job_settings().get('WORKERS', 0)
+        with self._lock:
+            # Threads do not survive a fork; a forked worker starts its own.
+            if self._pid == os.getpid() or workers <= 0:
+                return
+            self._pid = os.getpid()
+            requeue_stale_jobs()
+            self._threads = [
+                threading.Thread(target=work, args=(self._stop, self._wakeup),
+                                 name=f'analysis-job-{n}', daemon=True)
+                for n in range(workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def notify(self):
+        self.start()
+        self._wakeup.set()
+
+
+worker_pool = WorkerPool()
@@ -0,0 +1,36 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from analyzer.benchmarks import SCENARIOS, benchmark_database, run_metadata
+
+
+class Command(BaseCommand):
+    help = "Run performance benchmark scenarios against a throwaway database and write their results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenarios', nargs='+', choices=sorted(SCENARIOS), metavar='scenario',
+                            help=f"One or more of: {', '.join(sorted(SCENARIOS))}.")
+        parser.add_argument('--rows', type=int, default=100_000,
+                            help="Number of synthetic rows to seed (default: 100000).")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Timed repetitions per measurement (default: 5).")
+        parser.add_argument('--output', help="Write the results to this file instead of stdout.")
+
+    def handle(self, *args, **options):
+        scenario_options = {'rows': options['rows'], 'repeat': options['repeat']}
+        with benchmark_database():
+            report = {
+                'metadata': run_metadata({'scenarios': options['scenarios'], **scenario_options}),
+                'results': {},
+            }
+            for scenario in options['scenarios']:
+                report['results'][scenario] = SCENARIOS[scenario](**scenario_options)
+
+        document = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(document + '\n')
+            self.stdout.write(f"Wrote {', '.join(options['scenarios'])} results to {options['output']}.")
+        else:
+            self.stdout.write(document)
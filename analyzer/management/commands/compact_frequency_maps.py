@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from analyzer.models import AnalyzedString
+from analyzer.utils import encode_frequency_map
+
+
+class Command(BaseCommand):
+    help = "Convert JSON character frequency maps to the compact binary encoding."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pending = AnalyzedString.objects.filter(character_frequency_map__isnull=False)
+        converted = 0
+        while True:
+            # Converted rows drop out of the filter, so each batch is the next one.
+            batch = list(pending.only('id', 'character_frequency_map').order_by('pk')[:batch_size])
+            if not batch:
+                break
+            for string in batch:
+                string.character_frequency_blob = encode_frequency_map(string.character_frequency_map)
+                string.character_frequency_map = None
+            with transaction.atomic():
+                AnalyzedString.objects.bulk_update(
+                    batch, ['character_frequency_map', 'character_frequency_blob']
+                )
+            converted += len(batch)
+        self.stdout.write(f"Converted {converted} frequency map(s).")
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.db import read_only_transaction
+from analyzer.models import AnalyzedString
+from analyzer.snapshot import CHUNK_ROWS, write_snapshot
+
+
+class Command(BaseCommand):
+    help = "Write every stored string to a columnar snapshot file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Snapshot file to create.")
+        parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS,
+                            help=f"Rows per chunk (default: {CHUNK_ROWS}).")
+
+    def handle(self, *args, **options):
+        # Every chunk is read from the same snapshot of the table, without
+        # holding SQLite's write lock against concurrent inserts.
+        with read_only_transaction(), open(options['path'], 'wb') as output:
+            for part in write_snapshot(AnalyzedString.objects.all(), chunk_rows=options['chunk_rows']):
+                output.write(part)
+        self.stdout.write(f"Wrote {options['path']}.")
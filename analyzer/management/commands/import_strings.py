@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analyzer.snapshot import SnapshotError, load_snapshot
+
+
+class Command(BaseCommand):
+    help = "Load the strings of a columnar snapshot file, skipping those already stored."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Snapshot file written by export_strings or GET /strings/export.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            created, skipped = load_snapshot(options['path'], batch_size=options['batch_size'])
+        except (OSError, SnapshotError) as e:
+            raise CommandError(str(e))
+        self.stdout.write(f"Imported {created} string(s); skipped {skipped} already stored.")
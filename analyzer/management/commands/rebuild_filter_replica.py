@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.replica import filter_replica
+
+
+class Command(BaseCommand):
+    help = "Rewrite the filter replica file from the AnalyzedString table."
+
+    def handle(self, *args, **options):
+        count = filter_replica.rebuild()
+        self.stdout.write(f"Wrote {count} records to {filter_replica.path}.")
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.services import rebuild_statistics
+
+
+class Command(BaseCommand):
+    help = "Recompute the GET /strings/stats counters from every stored string."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        seen = rebuild_statistics(batch_size=options['batch_size'])
+        self.stdout.write(f"Rebuilt statistics from {seen} string(s).")
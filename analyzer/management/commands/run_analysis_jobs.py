@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from analyzer.jobs import requeue_stale_jobs, work
+
+
+class Command(BaseCommand):
+    help = "Run queued ?async=true analysis jobs until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-seconds', type=float,
+                            help="Seconds to wait between checks of an empty queue "
+                                 "(default: ANALYZER_JOBS['POLL_SECONDS']).")
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+        self.stdout.write("Waiting for analysis jobs; press CTRL-C to stop.")
+        try:
+            work(poll_seconds=options['poll_seconds'])
+        except KeyboardInterrupt:
+            pass
@@ -0,0 +1,214 @@
+"""Sampled request timing, exported in the Prometheus text format.
+
+RequestMetricsMiddleware counts every request and, for a sample of them
+(ANALYZER_METRICS_SAMPLE_RATE), records how long each phase took: parsing
+and validating the body, string analysis, database queries and rendering
+the response. Code that does a phase's work wraps it in ``timed(phase)``;
+database time is recorded by a wrapper installed on every connection. The
+timings of the request being sampled are held in a context variable, so
+when a request is not sampled each of those hooks costs a single lookup.
+
+The registry is per process; with several workers each reports its own.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from ipaddress import ip_address, ip_network
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_http_methods
+
+PHASES = ('parse', 'analysis', 'db', 'serialization')
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+_current = ContextVar('analyzer_request_timings', default=None)
+
+
+class RequestTimings:
+    """Seconds per phase and the query count of one sampled request."""
+
+    __slots__ = ('phases', 'queries')
+
+    def __init__(self):
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+
+    def add(self, phase, seconds):
+        self.phases[phase] += seconds
+
+
+def start_sample():
+    """Begin recording phases for the current request; returns a reset token."""
+    return _current.set(RequestTimings())
+
+
+def end_sample(token):
+    timings = _current.get()
+    _current.reset(token)
+    return timings
+
+
+@contextmanager
+def timed(phase):
+    """Add the time spent in the block to ``phase`` of a sampled request."""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - start)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper timing the queries of sampled requests."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add('db', time.perf_counter() - start)
+        timings.queries += 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Connected to ``connection_created``; adds ``record_query`` once per connection."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels):
+    def escape(value):
+        return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels)
+
+
+class Registry:
+    """Counters and histograms keyed by endpoint, method and phase."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self._requests = {}
+        self._phases = {}
+        self._totals = {}
+        self._queries = {}
+
+    def count_request(self, endpoint, method, status):
+        key = (endpoint, method, status)
+        with self._lock:
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+    def observe(self, endpoint, method, total, timings):
+        key = (endpoint, method)
+        with self._lock:
+            for phase, seconds in timings.phases.items():
+                histogram = self._phases.get(key + (phase,))
+                if histogram is None:
+                    histogram = self._phases[key + (phase,)] = Histogram(SECONDS_BUCKETS)
+                histogram.observe(seconds)
+            self._totals.setdefault(key, Histogram(SECONDS_BUCKETS)).observe(total)
+            self._queries.setdefault(key, Histogram(QUERY_BUCKETS)).observe(timings.queries)
+
+    def render(self, sample_rate):
+        lines = [
+            '# HELP analyzer_metrics_sample_rate Fraction of requests whose timings are recorded.',
+            '# TYPE analyzer_metrics_sample_rate gauge',
+            f'analyzer_metrics_sample_rate {sample_rate}',
+            '# HELP analyzer_requests_total Requests handled, sampled or not.',
+            '# TYPE analyzer_requests_total counter',
+        ]
+        with self._lock:
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                labels = _labels([('endpoint', endpoint), ('method', method), ('status', status)])
+                lines.append(f'analyzer_requests_total{{{labels}}} {count}')
+            self._render_histograms(
+                lines, 'analyzer_request_duration_seconds',
+                'Wall time of sampled requests.',
+                self._totals, ('endpoint', 'method'),
+            )
+            self._render_histograms(
+                lines, 'analyzer_request_phase_seconds',
+                'Time sampled requests spent in each phase.',
+                self._phases, ('endpoint', 'method', 'phase'),
+            )
+            self._render_histograms(
+                lines, 'analyzer_request_db_queries',
+                'Database queries run by sampled requests.',
+                self._queries, ('endpoint', 'method'),
+            )
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _render_histograms(lines, name, help_text, histograms, label_names):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for key, histogram in sorted(histograms.items()):
+            labels = list(zip(label_names, key))
+            cumulative = 0
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{_labels(labels + [("le", bound)])}}} {cumulative}')
+            lines.append(f'{name}_bucket{{{_labels(labels + [("le", "+Inf")])}}} {histogram.count}')
+            lines.append(f'{name}_sum{{{_labels(labels)}}} {histogram.sum}')
+            lines.append(f'{name}_count{{{_labels(labels)}}} {histogram.count}')
+
+
+registry = Registry()
+
+
+def metrics_allowed(request):
+    """Whether ``request`` may read /metrics: a staff user, or a client in ANALYZER_METRICS_ALLOWED_IPS."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_active and user.is_staff:
+        return True
+    try:
+        address = ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ip_network(network, strict=False) for network in settings.ANALYZER_METRICS_ALLOWED_IPS)
+
+
+@require_http_methods(['GET'])
+def metrics_view(request):
+    """GET /metrics: the registry in the Prometheus text exposition format.
+
+    Not found unless ANALYZER_METRICS_ENABLED; forbidden to other clients
+    than those metrics_allowed admits.
+    """
+    if not settings.ANALYZER_METRICS_ENABLED:
+        raise Http404
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        registry.render(settings.ANALYZER_METRICS_SAMPLE_RATE),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
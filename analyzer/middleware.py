@@ -0,0 +1,91 @@
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import end_sample, registry, start_sample, timed
+
+logger = logging.getLogger(__name__)
+
+
+class RequestMetricsMiddleware:
+    """Count every request and time the phases of a sample of them.
+
+    Sampled requests slower than ANALYZER_SLOW_REQUEST_SECONDS are also
+    logged with their breakdown. Rendering a DRF response happens after the
+    view returns, so it is timed from ``process_template_response``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            response = self.get_response(request)
+            self._count(request, response)
+            return response
+        token, start = start_sample(), time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            timings = end_sample(token)
+        self._record(request, response, time.perf_counter() - start, timings)
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            response = await self.get_response(request)
+            self._count(request, response)
+            return response
+        token, start = start_sample(), time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            timings = end_sample(token)
+        self._record(request, response, time.perf_counter() - start, timings)
+        return response
+
+    def process_template_response(self, request, response):
+        render = response.render
+
+        def timed_render():
+            with timed('serialization'):
+                return render()
+
+        response.render = timed_render
+        return response
+
+    @staticmethod
+    def _sampled():
+        rate = settings.ANALYZER_METRICS_SAMPLE_RATE
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    @staticmethod
+    def _endpoint(request):
+        # The route pattern rather than the path keeps the label set bounded.
+        match = getattr(request, 'resolver_match', None)
+        return match.route if match is not None else 'unmatched'
+
+    def _count(self, request, response):
+        registry.count_request(self._endpoint(request), request.method, response.status_code)
+
+    def _record(self, request, response, total, timings):
+        endpoint = self._endpoint(request)
+        registry.count_request(endpoint, request.method, response.status_code)
+        registry.observe(endpoint, request.method, total, timings)
+        if total >= settings.ANALYZER_SLOW_REQUEST_SECONDS:
+            logger.warning(
+                "Slow request %s %s: %.3fs (%s, %d queries)",
+                request.method, request.path, total,
+                ', '.join(f'{phase} {seconds:.3f}s' for phase, seconds in timings.phases.items()),
+                timings.queries,
+            )
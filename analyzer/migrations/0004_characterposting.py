@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analyzer", "0003_analyzedstring_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CharacterPosting",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("character", models.CharField(max_length=1)),
+                (
+                    "string",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="character_postings",
+                        to="analyzer.analyzedstring",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("character", "string"), name="unique_character_posting"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:31
+
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def backfill_character_postings(apps, schema_editor):
+    AnalyzedString = apps.get_model("analyzer", "AnalyzedString")
+    CharacterPosting = apps.get_model("analyzer", "CharacterPosting")
+
+    batch = []
+    strings = AnalyzedString.objects.only("id", "character_frequency_map")
+    for string in strings.iterator(chunk_size=BATCH_SIZE):
+        batch.extend(
+            CharacterPosting(character=character, string_id=string.pk)
+            for character in string.character_frequency_map
+        )
+        if len(batch) >= BATCH_SIZE:
+            CharacterPosting.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        CharacterPosting.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analyzer", "0004_characterposting"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            backfill_character_postings, reverse_code=migrations.RunPython.noop
+        ),
+    ]
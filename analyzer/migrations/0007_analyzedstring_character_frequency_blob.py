@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analyzer", "0006_analyzedstring_value_not_unique"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="analyzedstring",
+            name="character_frequency_blob",
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AlterField(
+            model_name="analyzedstring",
+            name="character_frequency_map",
+            field=models.JSONField(null=True),
+        ),
+    ]
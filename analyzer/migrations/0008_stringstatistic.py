@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analyzer", "0007_analyzedstring_character_frequency_blob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StringStatistic",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("kind", models.CharField(max_length=16)),
+                ("key", models.CharField(blank=True, default="", max_length=32)),
+                ("count", models.BigIntegerField(default=0)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("kind", "key"), name="unique_string_statistic"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-17 17:58
+
+from collections import Counter
+
+from django.db import migrations
+
+from analyzer.utils import decode_frequency_map
+
+BATCH_SIZE = 2000
+
+
+def bucket(n):
+    return 1 << (n.bit_length() - 1) if n else 0
+
+
+def backfill_string_statistics(apps, schema_editor):
+    AnalyzedString = apps.get_model("analyzer", "AnalyzedString")
+    StringStatistic = apps.get_model("analyzer", "StringStatistic")
+
+    counts = Counter()
+    strings = AnalyzedString.objects.only(
+        "id", "length", "is_palindrome", "word_count",
+        "character_frequency_map", "character_frequency_blob",
+    )
+    for string in strings.iterator(chunk_size=BATCH_SIZE):
+        counts["strings", ""] += 1
+        counts["palindromes", ""] += string.is_palindrome
+        counts["characters", ""] += string.length
+        counts["words", ""] += string.word_count
+        counts["length", str(bucket(string.length))] += 1
+        counts["word_count", str(bucket(string.word_count))] += 1
+        if string.character_frequency_blob is not None:
+            frequency_map = decode_frequency_map(string.character_frequency_blob)
+        else:
+            frequency_map = string.character_frequency_map
+        for character, count in frequency_map.items():
+            counts["character", character] += count
+
+    StringStatistic.objects.bulk_create(
+        [StringStatistic(kind=kind, key=key, count=count)
+         for (kind, key), count in counts.items() if count],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def clear_string_statistics(apps, schema_editor):
+    apps.get_model("analyzer", "StringStatistic").objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analyzer", "0008_stringstatistic"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_string_statistics, reverse_code=clear_string_statistics),
+    ]
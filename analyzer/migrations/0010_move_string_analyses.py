@@ -0,0 +1,112 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:06
+
+from collections import Counter
+
+from django.db import migrations, transaction
+
+from analyzer.utils import describe_string
+
+BATCH_SIZE = 1000
+
+
+def bucket(n):
+    return 1 << (n.bit_length() - 1) if n else 0
+
+
+def add_statistics(connection, table, strings):
+    counts = Counter()
+    for string in strings:
+        counts["strings", ""] += 1
+        counts["palindromes", ""] += string.is_palindrome
+        counts["characters", ""] += string.length
+        counts["words", ""] += string.word_count
+        counts["length", str(bucket(string.length))] += 1
+        counts["word_count", str(bucket(string.word_count))] += 1
+        for character, count in string.character_frequency_map.items():
+            counts["character", character] += count
+    rows = [(kind, key, count) for (kind, key), count in counts.items() if count]
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(table)
+    kind, key, count = quote("kind"), quote("key"), quote("count")
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} ({kind}, {key}, {count}) VALUES (%s, %s, %s) "
+            f"ON CONFLICT ({kind}, {key}) DO UPDATE SET {count} = {table}.{count} + excluded.{count}",
+            rows,
+        )
+
+
+def move_string_analyses(apps, schema_editor):
+    """Re-analyse every StringAnalysis row into AnalyzedString, a chunk at a time.
+
+    Each chunk commits on its own and deletes the legacy rows it moved, so
+    an interrupted run resumes where it stopped when migrate is run again.
+    Values already stored as an AnalyzedString (compared case-insensitively,
+    like the primary key) are dropped rather than moved.
+    """
+    StringAnalysis = apps.get_model("analyzer", "StringAnalysis")
+    AnalyzedString = apps.get_model("analyzer", "AnalyzedString")
+    CharacterPosting = apps.get_model("analyzer", "CharacterPosting")
+    StringStatistic = apps.get_model("analyzer", "StringStatistic")
+    while move_chunk(StringAnalysis, AnalyzedString, CharacterPosting, StringStatistic, schema_editor):
+        pass
+
+
+def move_chunk(StringAnalysis, AnalyzedString, CharacterPosting, StringStatistic, schema_editor):
+    """Move the next BATCH_SIZE legacy rows; returns False once none are left."""
+    db_alias = schema_editor.connection.alias
+    with transaction.atomic(using=db_alias):
+        legacy = list(
+            StringAnalysis.objects.using(db_alias)
+            .order_by("pk")
+            .only("id", "value", "created_at")[:BATCH_SIZE]
+        )
+        if not legacy:
+            return False
+        strings = {}
+        for row in legacy:
+            analysis = describe_string(row.value)
+            strings.setdefault(analysis["sha256_hash"], AnalyzedString(
+                id=analysis["sha256_hash"],
+                value=row.value,
+                length=analysis["length"],
+                is_palindrome=analysis["is_palindrome"],
+                unique_characters=analysis["unique_characters"],
+                word_count=analysis["word_count"],
+                character_frequency_map=analysis["character_frequency_map"],
+                created_at=row.created_at,
+            ))
+        existing = set(
+            AnalyzedString.objects.using(db_alias)
+            .filter(pk__in=list(strings)).values_list("pk", flat=True)
+        )
+        new_strings = [string for pk, string in strings.items() if pk not in existing]
+        # bulk_create stamps the current time; put the legacy creation times back.
+        created_at = [string.created_at for string in new_strings]
+        AnalyzedString.objects.using(db_alias).bulk_create(new_strings)
+        for string, when in zip(new_strings, created_at):
+            string.created_at = when
+        AnalyzedString.objects.using(db_alias).bulk_update(new_strings, ["created_at"])
+        CharacterPosting.objects.using(db_alias).bulk_create(
+            [CharacterPosting(character=character, string_id=string.pk)
+             for string in new_strings for character in string.character_frequency_map],
+            ignore_conflicts=True,
+        )
+        add_statistics(schema_editor.connection, StringStatistic._meta.db_table, new_strings)
+        StringAnalysis.objects.using(db_alias).filter(pk__in=[row.pk for row in legacy]).delete()
+    return True
+
+
+class Migration(migrations.Migration):
+    # Each chunk commits separately so the move can be resumed.
+    atomic = False
+
+    dependencies = [
+        ("analyzer", "0009_backfill_string_statistics"),
+    ]
+
+    operations = [
+        migrations.RunPython(move_string_analyses, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,16 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:07
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analyzer", "0010_move_string_analyses"),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name="StringAnalysis",
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-17 18:30
+
+from django.db import migrations
+
+from analyzer.search import create_search_index, drop_search_index
+
+
+def create_index(apps, schema_editor):
+    create_search_index(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    drop_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analyzer", "0011_delete_stringanalysis"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, reverse_code=drop_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.7 on 2026-10-17 19:46
+
+from uuid import uuid4
+
+from django.db import migrations, models
+
+from analyzer.changes import drop_change_triggers, install_change_triggers
+
+
+def install_change_log(apps, schema_editor):
+    apps.get_model("analyzer", "DataVersion").objects.using(schema_editor.connection.alias).create(
+        pk=1, epoch=uuid4().hex
+    )
+    install_change_triggers(schema_editor.connection)
+
+
+def drop_change_log(apps, schema_editor):
+    drop_change_triggers(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analyzer", "0013_analysisjob"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DataVersion",
+            fields=[
+                (
+                    "id",
+                    models.PositiveSmallIntegerField(
+                        default=1, primary_key=True, serialize=False
+                    ),
+                ),
+                ("epoch", models.CharField(max_length=32)),
+                ("changes", models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="StringChange",
+            fields=[
+                ("seq", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("string_id", models.CharField(max_length=64)),
+            ],
+        ),
+        migrations.RunPython(install_change_log, reverse_code=drop_change_log),
+    ]
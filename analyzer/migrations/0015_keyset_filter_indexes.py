@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-17 20:07
+
+from django.db import migrations, models
+
+
+def analyze(apps, schema_editor):
+    # Without statistics SQLite guesses selectivities and sorts a whole
+    # filtered range rather than walk the new (filter, created_at, id) index.
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("ANALYZE analyzer_analyzedstring")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("analyzer", "0014_change_log"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="analyzedstring",
+            index=models.Index(
+                fields=["is_palindrome", "created_at", "id"],
+                name="analyzed_palindrome_page_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="analyzedstring",
+            index=models.Index(
+                fields=["word_count", "created_at", "id"],
+                name="analyzed_words_page_idx",
+            ),
+        ),
+        migrations.RunPython(analyze, reverse_code=migrations.RunPython.noop),
+    ]
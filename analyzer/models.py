@@ -1,26 +1,143 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
 
+from .utils import decode_frequency_map, encode_frequency_map
+
 # Create your models here.
 
 class AnalyzedString(models.Model):
-    id = models.CharField(max_length=64, primary_key=True)  # sha256
-    value = models.TextField(unique=True)
+    id = models.CharField(max_length=64, primary_key=True)  # sha256 of the lowercased value
+    # Uniqueness already follows from the primary key; values are looked up by hash.
+    value = models.TextField()
     length = models.IntegerField()
     is_palindrome = models.BooleanField()
     unique_characters = models.IntegerField()
     word_count = models.IntegerField()
-    character_frequency_map = models.JSONField()
+    # Exactly one of these holds the frequency map; see frequency_map_fields().
+    character_frequency_map = models.JSONField(null=True)
+    character_frequency_blob = models.BinaryField(null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
-class StringAnalysis(models.Model):
-    id = models.CharField(max_length=64, primary_key=True)  # SHA-256 hash
-    value = models.TextField(unique=True)
-    properties = models.JSONField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    @staticmethod
+    def frequency_map_fields(frequency_map):
+        """Field values storing ``frequency_map`` in the configured encoding."""
+        if settings.ANALYZER_COMPACT_FREQUENCY_MAP:
+            return {'character_frequency_map': None,
+                    'character_frequency_blob': encode_frequency_map(frequency_map)}
+        return {'character_frequency_map': frequency_map, 'character_frequency_blob': None}
+
+    @property
+    def frequency_map(self):
+        """The character frequency map, decoded from the compact blob if needed."""
+        if self.character_frequency_blob is not None:
+            return decode_frequency_map(self.character_frequency_blob)
+        return self.character_frequency_map
+
+    class Meta:
+        indexes = [
+            # Counts for AnalyzedStringFilter and the natural language filter, from the index alone.
+            models.Index(fields=['is_palindrome', 'length'], name='analyzed_palindrome_len_idx'),
+            models.Index(fields=['word_count', 'length'], name='analyzed_words_len_idx'),
+            models.Index(fields=['length'], name='analyzed_length_idx'),
+            # Keyset pagination order, unfiltered and after an equality filter.
+            models.Index(fields=['created_at', 'id'], name='analyzed_created_id_idx'),
+            models.Index(fields=['is_palindrome', 'created_at', 'id'], name='analyzed_palindrome_page_idx'),
+            models.Index(fields=['word_count', 'created_at', 'id'], name='analyzed_words_page_idx'),
+        ]
+
+class CharacterPosting(models.Model):
+    """One row per distinct (lowercased) character present in an AnalyzedString.
+
+    Lets character containment filters run as index lookups instead of
+    ``LIKE '%x%'`` scans over every stored value.
+    """
+    character = models.CharField(max_length=1)
+    string = models.ForeignKey(AnalyzedString, on_delete=models.CASCADE, related_name='character_postings')
 
     class Meta:
-        db_table = 'string_analyses'
-        ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['character', 'string'], name='unique_character_posting'),
+        ]
+
+class StringStatistic(models.Model):
+    """A running total behind ``GET /strings/stats``.
+
+    Each row is one counter: corpus totals have an empty key, histogram
+    buckets are keyed by their lower bound and character frequencies by the
+    character. services.strings_created / strings_deleted adjust the
+    counters in the same transaction as the write.
+
+    The ``changes`` counter adds one for every string counted in or out.
+    While it equals DataVersion.changes, no write has bypassed the services.
+    """
+    STRINGS = 'strings'
+    PALINDROMES = 'palindromes'
+    CHARACTERS = 'characters'
+    WORDS = 'words'
+    LENGTH = 'length'
+    WORD_COUNT = 'word_count'
+    CHARACTER = 'character'
+    CHANGES = 'changes'
+
+    kind = models.CharField(max_length=16)
+    key = models.CharField(max_length=32, blank=True, default='')
+    count = models.BigIntegerField(default=0)
 
-    def __str__(self):
-        return f"{self.value[:50]}..."
\ No newline at end of file
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='unique_string_statistic'),
+        ]
+
+class DataVersion(models.Model):
+    """The single row counting writes to AnalyzedString.
+
+    Database triggers (see analyzer.changes) add one to ``changes`` for every
+    row inserted, deleted or updated, whoever writes it. ``epoch`` is set
+    when the row is created, so a recreated database never repeats a version.
+    """
+    id = models.PositiveSmallIntegerField(primary_key=True, default=1)
+    epoch = models.CharField(max_length=32)
+    changes = models.BigIntegerField(default=0)
+
+class StringChange(models.Model):
+    """The primary key of the AnalyzedString row written by change number ``seq``."""
+    seq = models.BigIntegerField(primary_key=True)
+    string_id = models.CharField(max_length=64)
+
+class AnalysisJob(models.Model):
+    """A create or bulk request accepted with ``?async=true``.
+
+    The validated input waits in ``payload`` until a worker in analyzer.jobs
+    claims the job. Once it has run, ``result`` and ``status_code`` hold the
+    body and status the synchronous endpoint would have returned, and the
+    payload is cleared.
+    """
+    CREATE = 'create'
+    BULK = 'bulk'
+    KIND_CHOICES = [(CREATE, 'Create'), (BULK, 'Bulk')]
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES)
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=QUEUED)
+    payload = models.JSONField(null=True)
+    result = models.JSONField(null=True)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    error = models.TextField(blank=True, default='')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            # Claiming the oldest queued job, counting the queue, finding stale running jobs.
+            models.Index(fields=['status', 'created_at'], name='analysis_job_status_idx'),
+        ]
@@ -0,0 +1,91 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+
+
+class KeysetPagination:
+    """Cursor pagination over a stable ``(created_at, id)`` ordering.
+
+    Each page is fetched with a ``WHERE (created_at, id) > cursor`` predicate
+    instead of an OFFSET, so the cost of a page does not grow with its
+    position in the table.
+    """
+    ordering = ('created_at', 'id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 100
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.GET[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, position=None):
+        """Return ``(rows, next_cursor)`` for the requested page.
+
+        ``position`` maps a row to its ``(created_at, id)`` pair; by default
+        rows are model instances.
+        """
+        page, page_size = self._page(queryset, request)
+        return self._split(list(page), page_size, position)
+
+    async def apaginate_queryset(self, queryset, request, position=None):
+        """Async version of ``paginate_queryset``."""
+        page, page_size = self._page(queryset, request)
+        return self._split([row async for row in page], page_size, position)
+
+    def paginate_rows(self, fetch, request, position=None):
+        """``paginate_queryset`` for rows that do not come from a queryset.
+
+        ``fetch(after, limit)`` returns the first ``limit`` rows past the
+        decoded cursor position ``after`` (None on the first page).
+        """
+        page_size = self.get_page_size(request)
+        encoded = request.GET.get(self.cursor_query_param)
+        after = self.decode_cursor(encoded) if encoded else None
+        return self._split(fetch(after, page_size + 1), page_size, position)
+
+    def _page(self, queryset, request):
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        encoded = request.GET.get(self.cursor_query_param)
+        if encoded:
+            created_at, pk = self.decode_cursor(encoded)
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            )
+
+        # Fetch one extra row to know whether another page follows.
+        return queryset[:page_size + 1], page_size
+
+    def _split(self, rows, page_size, position):
+        position = position or (lambda instance: (instance.created_at, instance.pk))
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = self.encode_cursor(*position(rows[-1]))
+        return rows, next_cursor
+
+    def encode_cursor(self, created_at, pk):
+        position = [created_at.isoformat(), pk]
+        return base64.urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, encoded):
+        try:
+            created_at, pk = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            created_at = parse_datetime(created_at)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if created_at is None or not isinstance(pk, str):
+            raise NotFound(self.invalid_cursor_message)
+        return created_at, pk
@@ -0,0 +1,226 @@
+"""Natural language query planner.
+
+Turns phrasings such as "single word palindromes longer than 5 characters"
+into a typed filter plan. All patterns are compiled once into a single
+alternation that is scanned over the query in one pass, and plans are
+memoized per normalized query since the same phrasings recur constantly.
+"""
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+
+from .filters import filter_palindromes
+from .search import filter_contains_characters, filter_substring, filter_words
+
+PLAN_CACHE_SIZE = 1024
+
+
+@dataclass(frozen=True)
+class IsPalindrome:
+    key = 'is_palindrome'
+    value: bool = True
+
+    def apply(self, queryset):
+        return filter_palindromes(queryset, self.value)
+
+    def mask(self, records):
+        return records['is_palindrome'] == self.value
+
+
+@dataclass(frozen=True)
+class WordCount:
+    key = 'word_count'
+    value: int
+
+    def apply(self, queryset):
+        return queryset.filter(word_count=self.value)
+
+    def mask(self, records):
+        return records['word_count'] == self.value
+
+
+@dataclass(frozen=True)
+class MinLength:
+    key = 'min_length'
+    value: int
+
+    def apply(self, queryset):
+        return queryset.filter(length__gte=self.value)
+
+    def mask(self, records):
+        return records['length'] >= self.value
+
+
+@dataclass(frozen=True)
+class MaxLength:
+    key = 'max_length'
+    value: int
+
+    def apply(self, queryset):
+        return queryset.filter(length__lte=self.value)
+
+    def mask(self, records):
+        return records['length'] <= self.value
+
+
+@dataclass(frozen=True)
+class ContainsCharacter:
+    key = 'contains_character'
+    value: str
+
+    def apply(self, queryset):
+        return filter_contains_characters(queryset, self.value)
+
+
+@dataclass(frozen=True)
+class ContainsSubstring:
+    key = 'contains_substring'
+    value: str
+
+    def apply(self, queryset):
+        return filter_substring(queryset, self.value)
+
+
+@dataclass(frozen=True)
+class ContainsWord:
+    key = 'contains_word'
+    value: str
+
+    def apply(self, queryset):
+        return filter_words(queryset, self.value)
+
+
+PREDICATES = {predicate.key: predicate for predicate in (
+    IsPalindrome, WordCount, MinLength, MaxLength, ContainsCharacter, ContainsSubstring, ContainsWord,
+)}
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    predicates: tuple
+
+    @classmethod
+    def from_filters(cls, filters):
+        return cls(tuple(PREDICATES[key](value) for key, value in filters.items()))
+
+    def as_filters(self) -> dict:
+        return {predicate.key: predicate.value for predicate in self.predicates}
+
+    def apply(self, queryset):
+        for predicate in self.predicates:
+            queryset = predicate.apply(queryset)
+        return queryset
+
+    def mask(self, records):
+        """Which live rows of the filter replica's ``records`` match, as a boolean array.
+
+        Returns None when a predicate can only be answered by the database.
+        """
+        if not all(hasattr(predicate, 'mask') for predicate in self.predicates):
+            return None
+        mask = ~records['deleted']
+        for predicate in self.predicates:
+            mask &= predicate.mask(records)
+        return mask
+
+
+# Each named pattern is wrapped in a lookahead so that the scan tests every
+# pattern at every position, like a separate re.search per pattern would,
+# without consuming text another pattern needs. The first match of each
+# group is kept, which is the leftmost match re.search would return.
+_PATTERNS = {
+    'palindrome': r'\bpalindrom(?:e|ic)\b',
+    'single_word': r'single word|one word',
+    'word_count': r'(?P<word_count_n>\d+)\s*word',
+    'longer_than': r'longer than (?P<longer_than_n>\d+)',
+    'at_least': r'at least (?P<at_least_n>\d+) characters?',
+    'minimum': r'minimum (?:length|of) (?P<minimum_n>\d+)',
+    'shorter_than': r'shorter than (?P<shorter_than_n>\d+)',
+    'at_most': r'at most (?P<at_most_n>\d+) characters?',
+    'maximum': r'maximum (?:length|of) (?P<maximum_n>\d+)',
+    'contains': r'contain(?:s|ing)?(?: the letter)? (?P<contains_c>[a-z])\b',
+    'quoted': r'contain(?:s|ing)?(?: the (?:substring|text))? [\'"](?P<quoted_s>[^\'"]+)[\'"]',
+    'substring': r'(?:\bsubstring|contain(?:s|ing)? (?:the )?text) (?P<substring_s>[^\s\'"]+)',
+    'word': r'(?:\b(?:the|with) word [\'"]?|\bword [\'"])(?P<word_w>\w+)',
+    'first_vowel': r'first vowel',
+    'letter': r'letter (?P<letter_c>[a-z])\b',
+}
+_SCANNER = re.compile('(?=' + '|'.join(
+    f'(?P<{name}>{pattern})' for name, pattern in _PATTERNS.items()
+) + ')')
+
+
+def _scan(query):
+    """Return the first match of every pattern as ``{name: captured value}``."""
+    found = {}
+    for match in _SCANNER.finditer(query):
+        for name, value in match.groupdict().items():
+            if value is not None and name not in found:
+                found[name] = value
+    return found
+
+
+def normalize(query: str) -> str:
+    return ' '.join(query.lower().split())
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _plan(normalized_query):
+    found = _scan(normalized_query)
+    predicates = []
+
+    if 'palindrome' in found:
+        predicates.append(IsPalindrome())
+
+    if 'single_word' in found:
+        predicates.append(WordCount(1))
+    elif 'word_count' in found:
+        predicates.append(WordCount(int(found['word_count_n'])))
+
+    if 'longer_than' in found:
+        predicates.append(MinLength(int(found['longer_than_n']) + 1))
+    elif 'at_least' in found:
+        predicates.append(MinLength(int(found['at_least_n'])))
+    elif 'minimum' in found:
+        predicates.append(MinLength(int(found['minimum_n'])))
+
+    if 'shorter_than' in found:
+        predicates.append(MaxLength(int(found['shorter_than_n']) - 1))
+    elif 'at_most' in found:
+        predicates.append(MaxLength(int(found['at_most_n'])))
+    elif 'maximum' in found:
+        predicates.append(MaxLength(int(found['maximum_n'])))
+
+    if 'quoted' in found:
+        predicates.append(ContainsSubstring(found['quoted_s']))
+    elif 'substring' in found:
+        predicates.append(ContainsSubstring(found['substring_s']))
+
+    if 'word' in found:
+        predicates.append(ContainsWord(found['word_w']))
+
+    if 'contains' in found:
+        predicates.append(ContainsCharacter(found['contains_c']))
+    elif 'first_vowel' in found:
+        predicates.append(ContainsCharacter('a'))
+    elif 'letter' in found:
+        predicates.append(ContainsCharacter(found['letter_c']))
+
+    return QueryPlan(tuple(predicates))
+
+
+def plan_query(query: str) -> QueryPlan:
+    """Plan a natural language query, raising ValueError if nothing matched."""
+    plan = _plan(normalize(query))
+    if not plan.predicates:
+        raise ValueError("Unable to parse natural language query")
+    return plan
+
+
+def plan_cache_info():
+    """Hit/miss counters of the memoized planner."""
+    return _plan.cache_info()
+
+
+def clear_plan_cache():
+    _plan.cache_clear()
@@ -0,0 +1,386 @@
+"""Memory-mapped replica of the columns behind the scalar filters.
+
+With ANALYZER_FILTER_REPLICA on, every stored string has a fixed-size
+RECORD (id, created_at, length, word_count, unique_characters,
+is_palindrome) in the file at ANALYZER_FILTER_REPLICA_PATH. Each process maps
+the file read-only, so all workers on a host share one copy in the page
+cache. GET /strings evaluates ``is_palindrome``, ``min_length``,
+``max_length`` and ``word_count`` as NumPy masks over it, counts the matches
+there and reads from the database only the rows of the page. Lists with any
+other filter, or none, go to the database as before. So does the natural
+language filter: it returns every match, and reading those by primary key
+costs more than the database's own indexed scan.
+
+The file header holds the data version (analyzer.changes) the records
+reflect. Before answering, a query compares it with the database's. When
+at most CATCH_UP_INLINE changes are missing, the query replays them from
+the change log: records of changed strings are flagged deleted and the rows
+that still exist are appended again. Anything more, a missing file or a log
+that no longer reaches back far enough, is left to a background thread, and
+the database answers until it has finished. The replica therefore follows
+every write, including ones made from the admin, a shell or SQL.
+
+A rebuild writes the live rows in primary key order, which lets a replay
+find the records of a string by binary search. Records appended since stay
+unsorted at the end of the file. Once a quarter of the records are deleted,
+or the unsorted tail grows past COMPACT_TAIL, the next query starts a
+rebuild in the background, which drops the deleted records.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from django.conf import settings
+
+from .changes import changed_strings, current_version
+from .db import read_only_transaction
+from .models import AnalyzedString
+from .query_planner import PREDICATES, QueryPlan
+
+try:
+    import fcntl
+except ImportError:  # Windows: no other process shares the file in development.
+    fcntl = None
+
+MAGIC = b'ANALYZER-REPLICA 2\n'
+HEADER_SIZE = 128
+
+HEADER = np.dtype([
+    ('magic', 'S24'),
+    # The data version the records reflect.
+    ('epoch', 'S32'),
+    ('changes', '<i8'),
+    # Records [0, sorted) are in primary key order.
+    ('sorted', '<i8'),
+    # Records flagged deleted.
+    ('deleted', '<i8'),
+])
+
+RECORD = np.dtype([
+    ('id', 'S64'),
+    # Microseconds since the Unix epoch.
+    ('created_at', '<i8'),
+    ('length', '<i8'),
+    ('word_count', '<i8'),
+    ('unique_characters', '<i8'),
+    ('is_palindrome', '?'),
+    ('deleted', '?'),
+])
+
+FIELDS = ('id', 'created_at', 'length', 'word_count', 'unique_characters', 'is_palindrome')
+
+# Rows fetched from the database per query; SQLite allows 999 parameters.
+FETCH_BATCH = 500
+# Changes a query replays itself before answering; more are left to a background thread.
+CATCH_UP_INLINE = 1000
+# Unsorted records a replay may scan before the file is compacted.
+COMPACT_TAIL = 50_000
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class ReplicaUnavailable(Exception):
+    """The replica cannot answer this query; use the database instead."""
+
+
+def _microseconds(when):
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return (when - EPOCH) // _MICROSECOND
+
+
+def to_records(strings):
+    records = np.zeros(len(strings), dtype=RECORD)
+    records['id'] = [string.pk for string in strings]
+    records['created_at'] = [_microseconds(string.created_at) for string in strings]
+    records['length'] = [string.length for string in strings]
+    records['word_count'] = [string.word_count for string in strings]
+    records['unique_characters'] = [string.unique_characters for string in strings]
+    records['is_palindrome'] = [string.is_palindrome for string in strings]
+    return records
+
+
+def _header(epoch, changes, sorted_count=0, deleted=0):
+    header = np.zeros(1, dtype=HEADER)
+    header[0] = (MAGIC, epoch.encode('ascii'), changes, sorted_count, deleted)
+    return header.tobytes().ljust(HEADER_SIZE, b'\0')
+
+
+def _split(data):
+    """The header and the records of a mapped file."""
+    count = (len(data) - HEADER_SIZE) // RECORD.itemsize
+    header = data[:HEADER.itemsize].view(HEADER)
+    return header, data[HEADER_SIZE:HEADER_SIZE + count * RECORD.itemsize].view(RECORD)
+
+
+def _search(column, keys):
+    """``np.searchsorted(column, keys)`` for a strided, mapped ``column``.
+
+    np.searchsorted would first copy the whole column; this bisects for all
+    keys at once and reads about log2(len(column)) entries per key.
+    """
+    low = np.zeros(len(keys), dtype=np.int64)
+    high = np.full(len(keys), len(column), dtype=np.int64)
+    while (active := low < high).any():
+        middle = (low + high) // 2
+        below = active & (column[np.minimum(middle, len(column) - 1)] < keys)
+        low = np.where(below, middle + 1, low)
+        high = np.where(active & ~below, middle, high)
+    return low
+
+
+def _locate(records, sorted_count, pks):
+    """Indexes of the live records of the strings ``pks``."""
+    keys = np.array(sorted(pks), dtype='S64')
+    main = records['id'][:sorted_count]
+    found = _search(main, keys) if sorted_count else np.zeros(0, dtype=np.int64)
+    found = found[found < sorted_count]
+    found = found[np.isin(main[found], keys)]
+    tail = sorted_count + np.flatnonzero(np.isin(records['id'][sorted_count:], keys))
+    indexes = np.concatenate([found, tail])
+    return indexes[~records['deleted'][indexes]]
+
+
+def _compaction_due(header, count):
+    return header['deleted'] * 4 > count or count - header['sorted'] > COMPACT_TAIL
+
+
+class FilterReplica:
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._mapped = None
+        self._header = None
+        self._records = None
+        self._refreshing = False
+
+    @property
+    def enabled(self):
+        return getattr(settings, 'ANALYZER_FILTER_REPLICA', False)
+
+    @property
+    def path(self):
+        return str(self._path or settings.ANALYZER_FILTER_REPLICA_PATH)
+
+    @contextmanager
+    def _write_lock(self, wait=True):
+        """Serialise writers across processes; readers never wait.
+
+        With ``wait=False`` a held lock raises ReplicaUnavailable instead.
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    raise ReplicaUnavailable("Replica is being written") from None
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def rebuild(self, chunk_size=50_000):
+        """Write a fresh file from the database and swap it in; returns the record count."""
+        with self._write_lock():
+            return self._rebuild(chunk_size)
+
+    def _rebuild(self, chunk_size=50_000):
+        count = sorted_count = 0
+        last = b''
+        temporary = f'{self.path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        # The version and the rows from one snapshot, so they agree.
+        with open(temporary, 'wb') as output, read_only_transaction():
+            epoch, changes = current_version()
+            output.write(b'\0' * HEADER_SIZE)
+            rows = AnalyzedString.objects.order_by('pk').values_list(*FIELDS).iterator(chunk_size=chunk_size)
+            while chunk := [AnalyzedString(**dict(zip(FIELDS, row))) for _, row in zip(range(chunk_size), rows)]:
+                records = to_records(chunk)
+                # The database's collation decides the order; count on it only as far as it is bytewise.
+                if sorted_count == count and last <= records['id'][0] and (records['id'][:-1] <= records['id'][1:]).all():
+                    sorted_count += len(chunk)
+                    last = records['id'][-1]
+                output.write(records.tobytes())
+                count += len(chunk)
+            output.seek(0)
+            output.write(_header(epoch, changes, sorted_count))
+        os.replace(temporary, self.path)
+        return count
+
+    def _catch_up(self):
+        """Replay the logged changes the file is missing; False when only a rebuild can bring it up to date."""
+        try:
+            file = open(self.path, 'r+b')
+        except FileNotFoundError:
+            return False
+        with file, read_only_transaction():
+            if os.fstat(file.fileno()).st_size < HEADER_SIZE:
+                return False
+            data = np.memmap(file, dtype='|u1', mode='r+')
+            header, records = _split(data)
+            if header['magic'][0] != MAGIC or _compaction_due(header[0], len(records)):
+                return False
+            epoch, changes = current_version()
+            if header['epoch'][0] != epoch.encode('ascii') or header['changes'][0] > changes:
+                return False
+            pks = changed_strings(int(header['changes'][0]), changes)
+            if pks is None:
+                return False
+            if pks:
+                stale = _locate(records, int(header['sorted'][0]), pks)
+                records['deleted'][stale] = True
+                header['deleted'] += len(stale)
+                data.flush()
+                pks = list(pks)
+                strings = []
+                for start in range(0, len(pks), FETCH_BATCH):
+                    strings += AnalyzedString.objects.filter(pk__in=pks[start:start + FETCH_BATCH]).only(*FIELDS)
+                # A replay cut short leaves a partial record behind; the next one
+                # flags the same strings deleted and appends them again.
+                file.truncate(HEADER_SIZE + len(records) * RECORD.itemsize)
+                file.seek(0, os.SEEK_END)
+                file.write(to_records(strings).tobytes())
+                file.flush()
+            # Last, so readers take the file as current only once it is.
+            os.pwrite(file.fileno(), np.int64(changes).astype('<i8').tobytes(), HEADER.fields['changes'][1])
+        return True
+
+    def refresh(self):
+        """Bring the file up to date: replay the change log, or rebuild when that cannot."""
+        with self._write_lock():
+            if not self._catch_up():
+                self._rebuild()
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self):
+        from django.db import close_old_connections
+        try:
+            self.refresh()
+        finally:
+            self._refreshing = False
+            close_old_connections()
+
+    def _map(self):
+        """The file's header and records, remapped after appends or a rebuild.
+
+        None when there is no file, or only one of another format.
+        """
+        try:
+            file = open(self.path, 'rb')
+        except FileNotFoundError:
+            return None
+        with file, self._lock:
+            stat = os.fstat(file.fileno())
+            if self._mapped != (stat.st_ino, stat.st_size):
+                if stat.st_size < HEADER_SIZE:
+                    return None
+                data = np.memmap(file, dtype='|u1', mode='r', shape=(stat.st_size,))
+                header, records = _split(data)
+                if header['magic'][0] != MAGIC:
+                    return None
+                self._header, self._records = header, records
+                self._mapped = (stat.st_ino, stat.st_size)
+            return self._header, self._records
+
+    def records(self):
+        """The records, up to date with the database.
+
+        Raises ReplicaUnavailable while the file is missing or too far
+        behind; a background thread is then bringing it up to date.
+        """
+        mapped = self._map()
+        if mapped is None:
+            self._refresh_in_background()
+            raise ReplicaUnavailable("Replica is being built")
+        header, records = mapped
+        epoch, changes = current_version()
+        written = int(header['changes'][0])
+        if header['epoch'][0] != epoch.encode('ascii'):
+            self._refresh_in_background()
+            raise ReplicaUnavailable("Replica is from another database")
+        if written < changes:
+            if changes - written > CATCH_UP_INLINE:
+                self._refresh_in_background()
+                raise ReplicaUnavailable("Replica is behind the database")
+            with self._write_lock(wait=False):
+                if not self._catch_up():
+                    self._refresh_in_background()
+                    raise ReplicaUnavailable("Replica needs a rebuild")
+            header, records = self._map()
+        elif written > changes and current_version()[1] < written:
+            # Another process may have replayed a commit made since the first
+            # look. Still ahead, the database went back, e.g. to a backup.
+            self._refresh_in_background()
+            raise ReplicaUnavailable("Replica is ahead of the database")
+        if _compaction_due(header[0], len(records)):
+            self._refresh_in_background()
+        return records
+
+    def select(self, filters):
+        """The records and the indexes of those matching ``filters``."""
+        if not self.enabled:
+            raise ReplicaUnavailable("Replica is disabled")
+        # Without filters the (created_at, id) index already serves the page.
+        if not filters or not filters.keys() <= PREDICATES.keys():
+            raise ReplicaUnavailable("Filters need the database")
+        plan = QueryPlan.from_filters(filters)
+        if any(not hasattr(predicate, 'mask') for predicate in plan.predicates):
+            raise ReplicaUnavailable("Filters need the database")
+        records = self.records()
+        return records, np.flatnonzero(plan.mask(records))
+
+
+def _ordered(records, indexes, limit=None):
+    """``indexes`` sorted by ``(created_at, id)``, the first ``limit`` of them."""
+    created = records['created_at'][indexes]
+    if limit is not None and len(indexes) > limit:
+        # Only rows up to the limit-th earliest creation time can make the page.
+        keep = created <= np.partition(created, limit - 1)[limit - 1]
+        indexes, created = indexes[keep], created[keep]
+    order = np.lexsort((records['id'][indexes], created))
+    return indexes[order[:limit]]
+
+
+def _fetch(records, indexes, row_serializer):
+    """Database rows for ``indexes``, in their order."""
+    pks = [pk.decode('ascii') for pk in records['id'][indexes].tolist()]
+    rows = {}
+    for start in range(0, len(pks), FETCH_BATCH):
+        batch = row_serializer.rows(AnalyzedString.objects.filter(pk__in=pks[start:start + FETCH_BATCH]))
+        rows.update((row[0], row) for row in batch)
+    if len(rows) != len(pks):
+        # Deleted since the replica was read.
+        raise ReplicaUnavailable("Rows are missing from the database")
+    return [rows[pk] for pk in pks]
+
+
+def replica_page(filters, request, pagination, row_serializer):
+    """``(rows, next_cursor, count)`` for a GET /strings page, with the keyset ``pagination``.
+
+    Raises ReplicaUnavailable when the database has to answer instead.
+    """
+    records, indexes = filter_replica.select(filters)
+
+    def fetch(after, limit):
+        page = indexes
+        if after is not None:
+            created_at, pk = _microseconds(after[0]), after[1].encode('utf-8')
+            created = records['created_at'][page]
+            page = page[(created > created_at) | ((created == created_at) & (records['id'][page] > pk))]
+        return _fetch(records, _ordered(records, page, limit), row_serializer)
+
+    rows, next_cursor = pagination.paginate_rows(fetch, request, position=row_serializer.position)
+    return rows, next_cursor, len(indexes)
+
+
+filter_replica = FilterReplica()
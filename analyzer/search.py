@@ -0,0 +1,211 @@
+"""Substring and word search over stored values.
+
+On SQLite, two FTS5 indexes cover ``AnalyzedString.value``: a trigram
+index that answers substring queries of three or more characters, and a
+unicode61 index of words. Both are contentless, so values are not stored
+twice. Their integer rowids come from ``analyzer_search_document``, which
+maps each rowid to a string's primary key. Triggers on the string table keep
+all three in step with every insert, update and delete, including bulk
+inserts and raw SQL.
+
+SQLite rebuilds a table to alter it, which drops its triggers. After every
+``migrate`` (and ``flush``), ``repair_search_index`` reinstalls them and
+indexes any strings written while they were missing.
+
+On PostgreSQL the same filters are served by a pg_trgm GIN index on
+``UPPER(value)``, which Django's ``icontains`` compares against, and a GIN
+index on the value's ``simple`` text search vector. Other backends fall
+back to scanning.
+"""
+import re
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models.expressions import RawSQL
+
+# Shortest substring the trigram index can answer.
+TRIGRAM_MIN_CHARS = 3
+
+DOCUMENT_TABLE = 'analyzer_search_document'
+TRIGRAM_TABLE = 'analyzer_value_trigrams'
+WORD_TABLE = 'analyzer_value_words'
+
+_WORD = re.compile(r'\w+')
+
+_TRIGGERS = {
+    'analyzer_search_insert': f"""
+        CREATE TRIGGER analyzer_search_insert AFTER INSERT ON analyzer_analyzedstring BEGIN
+            INSERT INTO {DOCUMENT_TABLE} (string_id) VALUES (new.id);
+            INSERT INTO {TRIGRAM_TABLE} (rowid, value)
+                SELECT id, new.value FROM {DOCUMENT_TABLE} WHERE string_id = new.id;
+            INSERT INTO {WORD_TABLE} (rowid, value)
+                SELECT id, new.value FROM {DOCUMENT_TABLE} WHERE string_id = new.id;
+        END""",
+    # Contentless FTS5 tables forget a row when given its original values.
+    'analyzer_search_delete': f"""
+        CREATE TRIGGER analyzer_search_delete AFTER DELETE ON analyzer_analyzedstring BEGIN
+            INSERT INTO {TRIGRAM_TABLE} ({TRIGRAM_TABLE}, rowid, value)
+                SELECT 'delete', id, old.value FROM {DOCUMENT_TABLE} WHERE string_id = old.id;
+            INSERT INTO {WORD_TABLE} ({WORD_TABLE}, rowid, value)
+                SELECT 'delete', id, old.value FROM {DOCUMENT_TABLE} WHERE string_id = old.id;
+            DELETE FROM {DOCUMENT_TABLE} WHERE string_id = old.id;
+        END""",
+    'analyzer_search_update': f"""
+        CREATE TRIGGER analyzer_search_update AFTER UPDATE OF value ON analyzer_analyzedstring BEGIN
+            INSERT INTO {TRIGRAM_TABLE} ({TRIGRAM_TABLE}, rowid, value)
+                SELECT 'delete', id, old.value FROM {DOCUMENT_TABLE} WHERE string_id = old.id;
+            INSERT INTO {WORD_TABLE} ({WORD_TABLE}, rowid, value)
+                SELECT 'delete', id, old.value FROM {DOCUMENT_TABLE} WHERE string_id = old.id;
+            INSERT INTO {TRIGRAM_TABLE} (rowid, value)
+                SELECT id, new.value FROM {DOCUMENT_TABLE} WHERE string_id = new.id;
+            INSERT INTO {WORD_TABLE} (rowid, value)
+                SELECT id, new.value FROM {DOCUMENT_TABLE} WHERE string_id = new.id;
+        END""",
+}
+
+_fts5_support = {}
+
+
+def has_fts5_index(connection):
+    """Whether ``connection`` is SQLite with FTS5 and its trigram tokenizer (3.34+).
+
+    The SQLite library is probed through a throwaway in-memory connection
+    rather than ``connection`` itself, so that building a filtered queryset
+    never runs a query: the async views build them on the event loop.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    if connection.alias not in _fts5_support:
+        probe = connection.Database.connect(':memory:')
+        try:
+            enabled = bool(probe.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')").fetchone()[0])
+        finally:
+            probe.close()
+        _fts5_support[connection.alias] = enabled and connection.Database.sqlite_version_info >= (3, 34, 0)
+    return _fts5_support[connection.alias]
+
+
+def install_search_triggers(connection):
+    with connection.cursor() as cursor:
+        for name, sql in _TRIGGERS.items():
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(sql)
+
+
+def _index_new_strings(cursor):
+    """Index the strings that have no search document yet."""
+    cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {DOCUMENT_TABLE}")
+    last_id = cursor.fetchone()[0]
+    cursor.execute(f"INSERT INTO {DOCUMENT_TABLE} (string_id) SELECT id FROM analyzer_analyzedstring "
+                   f"WHERE id NOT IN (SELECT string_id FROM {DOCUMENT_TABLE})")
+    for table in (TRIGRAM_TABLE, WORD_TABLE):
+        cursor.execute(
+            f"INSERT INTO {table} (rowid, value) SELECT d.id, s.value "
+            f"FROM {DOCUMENT_TABLE} d JOIN analyzer_analyzedstring s ON s.id = d.string_id "
+            f"WHERE d.id > %s",
+            [last_id],
+        )
+
+
+def repair_search_index(sender=None, using=DEFAULT_DB_ALIAS, **kwargs):
+    """Reinstall the SQLite search triggers and catch up on missed writes.
+
+    Connected to ``post_migrate``. Documents of strings deleted meanwhile are
+    dropped; their stale FTS5 entries no longer map to a string, so they
+    never match.
+    """
+    connection = connections[using]
+    if not has_fts5_index(connection) or DOCUMENT_TABLE not in connection.introspection.table_names():
+        return
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        install_search_triggers(connection)
+        _index_new_strings(cursor)
+        cursor.execute(f"DELETE FROM {DOCUMENT_TABLE} "
+                       f"WHERE string_id NOT IN (SELECT id FROM analyzer_analyzedstring)")
+
+
+def create_search_index(connection):
+    """Create the search indexes for ``connection``'s backend and fill them."""
+    with connection.cursor() as cursor:
+        if has_fts5_index(connection):
+            cursor.execute(f"CREATE TABLE {DOCUMENT_TABLE} "
+                           f"(id INTEGER PRIMARY KEY, string_id varchar(64) NOT NULL UNIQUE)")
+            cursor.execute(f"CREATE VIRTUAL TABLE {TRIGRAM_TABLE} USING fts5("
+                           f"value, content='', tokenize='trigram case_sensitive 0')")
+            cursor.execute(f"CREATE VIRTUAL TABLE {WORD_TABLE} USING fts5("
+                           f"value, content='', tokenize='unicode61 remove_diacritics 0')")
+            _index_new_strings(cursor)
+            install_search_triggers(connection)
+        elif connection.vendor == 'postgresql':
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            cursor.execute("CREATE INDEX IF NOT EXISTS analyzed_value_trgm_idx "
+                           "ON analyzer_analyzedstring USING gin (UPPER(value) gin_trgm_ops)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS analyzed_value_words_idx "
+                           "ON analyzer_analyzedstring USING gin (to_tsvector('simple', value))")
+
+
+def drop_search_index(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in _TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            for table in (TRIGRAM_TABLE, WORD_TABLE, DOCUMENT_TABLE):
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute("DROP INDEX IF EXISTS analyzed_value_trgm_idx")
+            cursor.execute("DROP INDEX IF EXISTS analyzed_value_words_idx")
+
+
+def filter_contains_characters(queryset, characters):
+    """Keep strings that contain every character in ``characters``.
+
+    Each character is resolved through the CharacterPosting index, so the
+    cost depends on how many strings hold the character rather than on the
+    size of the stored values.
+    """
+    for character in set(characters.lower()):
+        queryset = queryset.filter(character_postings__character=character)
+    return queryset
+
+
+def _phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def _matching(table, query):
+    return RawSQL(
+        f"SELECT string_id FROM {DOCUMENT_TABLE} WHERE id IN "
+        f"(SELECT rowid FROM {table} WHERE {table} MATCH %s)",
+        [query],
+    )
+
+
+def filter_substring(queryset, text):
+    """Keep strings containing ``text``, ignoring case."""
+    connection = connections[queryset.db]
+    if len(text) >= TRIGRAM_MIN_CHARS and has_fts5_index(connection):
+        return queryset.filter(pk__in=_matching(TRIGRAM_TABLE, _phrase(text)))
+    if len(text) < TRIGRAM_MIN_CHARS:
+        # Too short for trigrams: narrow down through the character postings first.
+        queryset = filter_contains_characters(queryset, text)
+        if len(text) == 1:
+            return queryset
+    return queryset.filter(value__icontains=text)
+
+
+def filter_words(queryset, words):
+    """Keep strings containing every word in ``words`` as a whole word, ignoring case."""
+    words = _WORD.findall(words.lower())
+    if not words:
+        return queryset.none()
+    connection = connections[queryset.db]
+    if has_fts5_index(connection):
+        return queryset.filter(pk__in=_matching(WORD_TABLE, ' '.join(map(_phrase, words))))
+    if connection.vendor == 'postgresql':
+        return queryset.filter(pk__in=RawSQL(
+            "SELECT id FROM analyzer_analyzedstring "
+            "WHERE to_tsvector('simple', value) @@ plainto_tsquery('simple', %s)",
+            [' '.join(words)],
+        ))
+    for word in words:
+        queryset = queryset.filter(value__iregex=rf'(^|\W){re.escape(word)}(\W|$)')
+    return queryset
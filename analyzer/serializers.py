@@ -1,9 +1,131 @@
+import re
+from operator import itemgetter
+
+from django.db import IntegrityError
 from rest_framework import serializers
-from .models import AnalyzedString, StringAnalysis
-from .utils import describe_string, hash_string
+from rest_framework.validators import ProhibitSurrogateCharactersValidator
+from .models import AnalysisJob, AnalyzedString
+from .services import create_analyzed_string
+from .engine import describe
+from .utils import decode_frequency_map
+
+
+PROPERTY_FIELDS = [
+    'length', 'is_palindrome', 'unique_characters',
+    'word_count', 'sha256_hash', 'character_frequency_map'
+]
+
+OUTPUT_FIELDS = ['id', 'value', 'created_at', *PROPERTY_FIELDS]
+
+
+def _parse_field_names(param, raw):
+    names = {name.strip() for name in raw.split(',') if name.strip()}
+    if 'properties' in names:
+        names.discard('properties')
+        names.update(PROPERTY_FIELDS)
+    unknown = names - set(OUTPUT_FIELDS)
+    if unknown:
+        raise serializers.ValidationError(
+            {param: [f"Unknown field(s): {', '.join(sorted(unknown))}. "
+                     f"Choose from: {', '.join(['properties', *OUTPUT_FIELDS])}"]}
+        )
+    return names
+
+
+def parse_projection(query_params):
+    """Resolve the ``fields`` and ``exclude`` query parameters.
+
+    Both take comma-separated output names: ``id``, ``value``, ``created_at``,
+    ``properties`` or a single property name. Returns the set of output
+    fields to include.
+    """
+    fields = query_params.get('fields')
+    selected = _parse_field_names('fields', fields) if fields else set(OUTPUT_FIELDS)
+    exclude = query_params.get('exclude')
+    if exclude:
+        selected -= _parse_field_names('exclude', exclude)
+    return selected
+
+
+class StringRowSerializer:
+    """Builds StringSerializer's output straight from ``values_list()`` rows.
+
+    Only the columns behind the requested fields are selected, so ``value``
+    and the frequency map are never fetched unless asked for, and rows skip
+    model instantiation and per-field DRF machinery altogether.
+    """
+    datetime_field = serializers.DateTimeField()
+
+    def __init__(self, fields=None):
+        self.fields = set(OUTPUT_FIELDS) if fields is None else set(fields)
+        # id and created_at are always selected: they make up the page cursor.
+        self.columns = ['id', 'created_at']
+        if 'value' in self.fields:
+            self.columns.append('value')
+        self._properties = []
+        for name in PROPERTY_FIELDS:
+            if name not in self.fields:
+                continue
+            if name == 'sha256_hash':
+                self._properties.append((name, itemgetter(0)))
+            elif name == 'character_frequency_map':
+                self.columns += ['character_frequency_map', 'character_frequency_blob']
+                self._properties.append((name, self._frequency_map_getter(len(self.columns) - 2)))
+            else:
+                self.columns.append(name)
+                self._properties.append((name, itemgetter(len(self.columns) - 1)))
+
+    @staticmethod
+    def _frequency_map_getter(index):
+        def get(row):
+            if row[index + 1] is not None:
+                return decode_frequency_map(row[index + 1])
+            return row[index]
+        return get
+
+    def rows(self, queryset):
+        return queryset.values_list(*self.columns)
+
+    def instance_row(self, instance):
+        """The ``rows()`` tuple for an instance that is already loaded."""
+        return tuple(getattr(instance, column) for column in self.columns)
+
+    @staticmethod
+    def position(row):
+        """The ``(created_at, id)`` keyset position of a row."""
+        return row[1], row[0]
+
+    def to_representation(self, row):
+        representation = {}
+        if 'id' in self.fields:
+            representation['id'] = row[0]
+        if 'value' in self.fields:
+            representation['value'] = row[2]
+        if self._properties:
+            representation['properties'] = {name: get(row) for name, get in self._properties}
+        if 'created_at' in self.fields:
+            representation['created_at'] = self.datetime_field.to_representation(row[1])
+        return representation
+
+
+class SurrogateCharactersValidator(ProhibitSurrogateCharactersValidator):
+    """DRF's surrogate check as one regex search rather than a Python loop per character."""
+    pattern = re.compile('[\ud800-\udfff]')
+
+    def __call__(self, value):
+        match = self.pattern.search(str(value))
+        if match:
+            raise serializers.ValidationError(self.message.format(code_point=ord(match.group())), code=self.code)
 
 
 class StrictCharField(serializers.CharField):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.validators = [
+            SurrogateCharactersValidator() if isinstance(validator, ProhibitSurrogateCharactersValidator) else validator
+            for validator in self.validators
+        ]
+
     def to_internal_value(self, data):
         # 'data' is the raw value coming from the JSON parser (int, bool, etc.)
         if not isinstance(data, str):
@@ -18,7 +140,7 @@ class StringSerializer(serializers.ModelSerializer):
     is_palindrome = serializers.BooleanField(read_only=True)
     unique_characters = serializers.IntegerField(read_only=True)
     word_count = serializers.IntegerField(read_only=True)
-    character_frequency_map = serializers.JSONField(read_only=True)
+    character_frequency_map = serializers.JSONField(source='frequency_map', read_only=True)
 
     def validate_value(self, value):
         if not isinstance(value, str):
@@ -34,33 +156,21 @@ class StringSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
 
         input_string = validated_data.get('value')
-        if AnalyzedString.objects.filter(pk=hash_string(input_string)):
+        # A single INSERT: the primary key constraint detects duplicates,
+        # which stays correct with concurrent creators.
+        try:
+            return create_analyzed_string(input_string, describe(input_string))
+        except IntegrityError:
             raise serializers.ValidationError(
                 {"detail": "String already exists in the system."},
                 code="conflict" # Custom code helps identify the error later
             )
 
-        analysis_results = describe_string(input_string)
-
-        validated_data['id'] = analysis_results['sha256_hash']
-        validated_data['length'] = analysis_results['length']
-        validated_data['is_palindrome'] = analysis_results['is_palindrome']
-        validated_data['unique_characters'] = analysis_results['unique_characters']
-        validated_data['word_count'] = analysis_results['word_count']
-        validated_data['character_frequency_map'] = analysis_results['character_frequency_map']
-
-        return AnalyzedString.objects.create(**validated_data)
-
     def to_representation(self, instance):
         representation = super().to_representation(instance)
 
-        properties_fields = [
-            'length', 'is_palindrome', 'unique_characters',
-            'word_count', 'sha256_hash', 'character_frequency_map'
-        ]
-
         properties = dict()
-        for field in properties_fields:
+        for field in PROPERTY_FIELDS:
             if field == 'sha256_hash':
                 properties[field] = representation['id']
                 continue
@@ -72,36 +182,12 @@ class StringSerializer(serializers.ModelSerializer):
 
         return representation
 
-class StringAnalysisSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = StringAnalysis
-        fields = ['id', 'value', 'properties', 'created_at']
-        read_only_fields = ['id', 'properties', 'created_at']
-
-class StringCreateSerializer(serializers.Serializer):
-    value = serializers.CharField(required=True, max_length=10000)
 
-    def validate_value(self, value):
-        if not isinstance(value, str):
-            raise serializers.ValidationError("Value must be a string")
-        if not value.strip():
-            raise serializers.ValidationError("Value cannot be empty")
-        return value
+class AnalysisJobSerializer(serializers.ModelSerializer):
+    """Progress of an ``?async=true`` request and, once it has run, its outcome."""
 
-class StringListResponseSerializer(serializers.Serializer):
-    data = StringAnalysisSerializer(many=True)
-    count = serializers.IntegerField()
-    filters_applied = serializers.DictField(required=False)
-
-class NaturalLanguageFilterSerializer(serializers.Serializer):
-    query = serializers.CharField(required=True, max_length=500)
-
-    def validate_query(self, value):
-        if not value.strip():
-            raise serializers.ValidationError("Query cannot be empty")
-        return value
-
-class NaturalLanguageResponseSerializer(serializers.Serializer):
-    data = StringAnalysisSerializer(many=True)
-    count = serializers.IntegerField()
-    interpreted_query = serializers.DictField()
+    class Meta:
+        model = AnalysisJob
+        fields = ['id', 'kind', 'status', 'attempts', 'created_at', 'started_at', 'finished_at',
+                  'status_code', 'result', 'error']
+        read_only_fields = fields
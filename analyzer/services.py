@@ -0,0 +1,280 @@
+from collections import Counter
+
+from django.db import connection, transaction
+
+from .models import AnalyzedString, CharacterPosting, DataVersion, StringStatistic
+from .cache import invalidate_analyses
+from .changes import current_version
+from .db import read_only_transaction
+from .engine import describe_many
+
+
+def build_analyzed_string(value, analysis):
+    """Build an unsaved AnalyzedString from a ``describe_string`` result."""
+    return AnalyzedString(
+        id=analysis['sha256_hash'],
+        value=value,
+        length=analysis['length'],
+        is_palindrome=analysis['is_palindrome'],
+        unique_characters=analysis['unique_characters'],
+        word_count=analysis['word_count'],
+        **AnalyzedString.frequency_map_fields(analysis['character_frequency_map']),
+    )
+
+
+def create_analyzed_string(value, analysis):
+    """Insert one analysed string together with its bookkeeping."""
+    with transaction.atomic():
+        instance = build_analyzed_string(value, analysis)
+        instance.save(force_insert=True)
+        strings_created([instance])
+    return instance
+
+
+def index_characters(strings):
+    """Record a CharacterPosting for every character in each string's frequency map.
+
+    There are dozens of postings per string, so they are written with one
+    ``executemany`` rather than built and prepared as model instances.
+    """
+    rows = [(character, string.pk) for string in strings for character in string.frequency_map]
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(CharacterPosting._meta.db_table)
+    character, string = quote('character'), quote('string_id')
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} ({character}, {string}) VALUES (%s, %s) ON CONFLICT DO NOTHING",
+            rows,
+        )
+
+
+def histogram_bucket(n):
+    """Lower bound of the power-of-two bucket holding ``n`` (0, 1, 2, 4, 8, ...)."""
+    return 1 << (n.bit_length() - 1) if n else 0
+
+
+def statistic_deltas(strings, sign=1):
+    """Counter changes for adding (``sign=1``) or removing (``-1``) ``strings``."""
+    deltas = Counter()
+    for string in strings:
+        # Each insert or delete is one change either way.
+        deltas[StringStatistic.CHANGES, ''] += 1
+        deltas[StringStatistic.STRINGS, ''] += sign
+        deltas[StringStatistic.PALINDROMES, ''] += sign * string.is_palindrome
+        deltas[StringStatistic.CHARACTERS, ''] += sign * string.length
+        deltas[StringStatistic.WORDS, ''] += sign * string.word_count
+        deltas[StringStatistic.LENGTH, str(histogram_bucket(string.length))] += sign
+        deltas[StringStatistic.WORD_COUNT, str(histogram_bucket(string.word_count))] += sign
+        for character, count in string.frequency_map.items():
+            deltas[StringStatistic.CHARACTER, character] += sign * count
+    return deltas
+
+
+def apply_statistic_deltas(deltas):
+    """Add ``deltas`` to the counters with one upsert per counter.
+
+    ``INSERT ... ON CONFLICT DO UPDATE`` increments in place on SQLite and
+    PostgreSQL alike, so concurrent writers never lose an update.
+    """
+    rows = [(kind, key, count) for (kind, key), count in deltas.items() if count]
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(StringStatistic._meta.db_table)
+    kind, key, count = quote('kind'), quote('key'), quote('count')
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {table} ({kind}, {key}, {count}) VALUES (%s, %s, %s) "
+            f"ON CONFLICT ({kind}, {key}) DO UPDATE SET {count} = {table}.{count} + excluded.{count}",
+            rows,
+        )
+
+
+def rebuild_statistics(batch_size=2000):
+    """Recompute every counter with a chunked pass over AnalyzedString.
+
+    Runs in one transaction, so the counters are replaced atomically and
+    writers wait until the pass is done. Returns the number of strings seen.
+    """
+    fields = ['id', 'length', 'is_palindrome', 'word_count',
+              'character_frequency_map', 'character_frequency_blob']
+    deltas = Counter()
+    seen = 0
+    with transaction.atomic():
+        # Locking the counter row holds off writers on PostgreSQL as the
+        # IMMEDIATE transaction does on SQLite, so the pass sees this version.
+        changes = DataVersion.objects.select_for_update().filter(pk=1).values_list('changes', flat=True).first()
+        strings = AnalyzedString.objects.only(*fields).order_by('pk')
+        batch = list(strings[:batch_size])
+        while batch:
+            deltas.update(statistic_deltas(batch))
+            seen += len(batch)
+            batch = list(strings.filter(pk__gt=batch[-1].pk)[:batch_size])
+        deltas[StringStatistic.CHANGES, ''] = changes or 0
+        StringStatistic.objects.all().delete()
+        StringStatistic.objects.bulk_create(
+            [StringStatistic(kind=kind, key=key, count=count)
+             for (kind, key), count in deltas.items() if count],
+            batch_size=batch_size,
+        )
+    return seen
+
+
+def _histogram(counts):
+    return [
+        {"min": low, "max": 2 * low - 1 if low else 0, "count": count}
+        for low, count in sorted((int(key), count) for key, count in counts.items())
+    ]
+
+
+def _read_counters():
+    """The counters by kind and key, and the number of changes they should account for."""
+    counters = {}
+    with read_only_transaction():
+        for kind, key, count in StringStatistic.objects.filter(count__gt=0).values_list('kind', 'key', 'count'):
+            counters.setdefault(kind, {})[key] = count
+        return counters, current_version()[1]
+
+
+def statistics_summary():
+    """The corpus statistics served by ``GET /strings/stats``.
+
+    Reads only the counter rows, whose number depends on the distinct
+    characters and histogram buckets rather than on the number of strings.
+    When a write has bypassed the counters (the admin, ``QuerySet.delete()``,
+    SQL), they are rebuilt first.
+    """
+    counters, changes = _read_counters()
+    if counters.get(StringStatistic.CHANGES, {}).get('', 0) != changes:
+        rebuild_statistics()
+        counters, _ = _read_counters()
+
+    def total(kind):
+        return counters.get(kind, {}).get('', 0)
+
+    strings = total(StringStatistic.STRINGS)
+    characters = counters.get(StringStatistic.CHARACTER, {})
+    return {
+        "total_strings": strings,
+        "palindromes": total(StringStatistic.PALINDROMES),
+        "total_characters": total(StringStatistic.CHARACTERS),
+        "total_words": total(StringStatistic.WORDS),
+        "average_length": round(total(StringStatistic.CHARACTERS) / strings, 2) if strings else 0,
+        "length_histogram": _histogram(counters.get(StringStatistic.LENGTH, {})),
+        "word_count_histogram": _histogram(counters.get(StringStatistic.WORD_COUNT, {})),
+        "character_frequency": dict(sorted(characters.items(), key=lambda item: (-item[1], item[0]))),
+    }
+
+
+def strings_created(strings):
+    """Bookkeeping that must follow every insert of AnalyzedString rows."""
+    index_characters(strings)
+    apply_statistic_deltas(statistic_deltas(strings))
+    # After commit: a reader in between would otherwise cache the old state
+    # again. The data version moves by itself, with the commit.
+    transaction.on_commit(lambda: invalidate_analyses([string.pk for string in strings]))
+
+
+def strings_deleted(strings):
+    """Bookkeeping that must follow every delete of AnalyzedString rows.
+
+    ``strings`` are the deleted instances as loaded before the delete.
+    """
+    apply_statistic_deltas(statistic_deltas(strings, sign=-1))
+    StringStatistic.objects.filter(count=0).delete()
+    transaction.on_commit(lambda: invalidate_analyses([string.pk for string in strings]))
+
+
+def delete_strings(pks):
+    """Delete the strings with primary keys ``pks``; returns how many existed.
+
+    The rows are read and deleted in one transaction so the statistics are
+    decremented only for rows this call actually removed.
+    """
+    with transaction.atomic():
+        strings = list(AnalyzedString.objects.select_for_update().filter(pk__in=pks))
+        AnalyzedString.objects.filter(pk__in=[string.pk for string in strings]).delete()
+        strings_deleted(strings)
+    return len(strings)
+
+
+def _insert_value(field, string):
+    """The value to INSERT for ``field``: ``pre_save``'s, but an explicit creation time is kept."""
+    if getattr(field, 'auto_now_add', False) and getattr(string, field.attname) is not None:
+        return getattr(string, field.attname)
+    return field.pre_save(string, add=True)
+
+
+def insert_new_strings(strings):
+    """INSERT ``strings``, skipping stored primary keys; return the pks actually inserted.
+
+    ``bulk_create(ignore_conflicts=True)`` cannot tell which rows it skipped,
+    so this issues ``INSERT ... ON CONFLICT DO NOTHING RETURNING id`` itself.
+    Where the backend cannot return rows from a bulk insert, existing keys
+    are looked up first instead, which is only exact while the transaction
+    holds the write lock (SQLite). Strings that already have a ``created_at``
+    (imported ones) keep it.
+    """
+    if not strings:
+        return set()
+    if not connection.features.can_return_rows_from_bulk_insert:
+        existing = set(AnalyzedString.objects.filter(pk__in=[string.pk for string in strings])
+                       .values_list('pk', flat=True))
+        created = {string.pk: string.created_at for string in strings if string.created_at is not None}
+        AnalyzedString.objects.bulk_create(strings, ignore_conflicts=True)
+        inserted = {string.pk for string in strings} - existing
+        # bulk_create stamped the current time over imported creation times.
+        restored = [string for string in strings if string.pk in created and string.pk in inserted]
+        for string in restored:
+            string.created_at = created[string.pk]
+        AnalyzedString.objects.bulk_update(restored, ['created_at'])
+        return inserted
+
+    fields = AnalyzedString._meta.concrete_fields
+    quote = connection.ops.quote_name
+    table = quote(AnalyzedString._meta.db_table)
+    columns = ', '.join(quote(field.column) for field in fields)
+    row = f"({', '.join(['%s'] * len(fields))})"
+    batch_size = max(connection.ops.bulk_batch_size(fields, strings), 1)
+    inserted = set()
+    with connection.cursor() as cursor:
+        for start in range(0, len(strings), batch_size):
+            batch = strings[start:start + batch_size]
+            params = [field.get_db_prep_save(_insert_value(field, string), connection)
+                      for string in batch for field in fields]
+            cursor.execute(
+                f"INSERT INTO {table} ({columns}) VALUES {', '.join([row] * len(batch))} "
+                f"ON CONFLICT DO NOTHING RETURNING {quote('id')}",
+                params,
+            )
+            inserted.update(pk for pk, in cursor.fetchall())
+    return inserted
+
+
+def ingest_batch(values):
+    """Analyse and store a batch of strings with a constant number of queries.
+
+    Returns one ``{"id", "status"}`` entry per value, in order, where status is
+    ``"created"`` or ``"conflict"`` (already stored, or repeated in the batch).
+    Only the rows the INSERT reports back count as created, so a concurrent
+    writer storing the same string never gets counted twice.
+    """
+    analyses = describe_many(values)
+    candidates = {}
+    for value, analysis in zip(values, analyses):
+        if analysis['sha256_hash'] not in candidates:
+            candidates[analysis['sha256_hash']] = build_analyzed_string(value, analysis)
+
+    with transaction.atomic():
+        inserted = insert_new_strings(list(candidates.values()))
+        strings_created([string for pk, string in candidates.items() if pk in inserted])
+
+    results = []
+    for analysis in analyses:
+        pk = analysis['sha256_hash']
+        results.append({"id": pk, "status": "created" if pk in inserted else "conflict"})
+        # Repeats within the batch are conflicts with the first occurrence.
+        inserted.discard(pk)
+    return results
@@ -0,0 +1,223 @@
+"""Nearest neighbours of stored strings by character-frequency cosine similarity.
+
+Each string's frequency map is a sparse vector over characters. The index
+hashes it with random hyperplanes (SimHash): the signs of BANDS * ROWS
+projections form a signature, and two vectors agree on any one sign with
+probability ``1 - angle / pi``. Each band of ROWS signs is a bucket key;
+strings sharing a bucket in some band are the candidates for a query. The
+candidates that share the most bands are ordered by how many signature bits
+they share, and only the best few per requested result are loaded and ranked
+by exact cosine similarity, so a query reads a handful of rows rather than
+every row.
+
+Every projection of a character comes from a generator seeded with its
+code point, so there is no vocabulary, and all processes hash alike.
+
+The index remembers the data version (analyzer.changes) it reflects. The
+first query starts a build in a background thread and gets IndexNotReady,
+as do queries until it is done. Afterwards each query compares the version
+with the database's and replays the changes it is missing from the change
+log: it drops the strings they name and indexes those that still exist.
+Up to SYNC_INLINE changes are replayed before answering; a longer backlog is
+replayed in the background while queries use the index as it stands. When
+the log no longer reaches back far enough, the index is rebuilt the same
+way. Writes from any process, the admin or SQL are picked up alike.
+"""
+import math
+import threading
+from collections import Counter
+
+import numpy as np
+
+from .changes import changed_strings, current_version
+from .db import read_only_transaction
+from .models import AnalyzedString
+from .utils import decode_frequency_map
+
+BANDS = 32
+ROWS = 8
+# Candidates compared by signature per query.
+MAX_CANDIDATES = 1000
+# Candidates loaded and ranked by exact cosine per requested result.
+RERANK_FACTOR = 20
+# Changes a query replays before answering; more are left to a background thread.
+SYNC_INLINE = 1000
+# Rows read per query when replaying changes.
+FETCH_BATCH = 500
+
+_FIELDS = ('id', 'character_frequency_map', 'character_frequency_blob')
+
+
+class IndexNotReady(Exception):
+    """The index is still being built; retry later."""
+
+
+def cosine(a, b):
+    """Cosine similarity of two frequency maps."""
+    if len(a) > len(b):
+        a, b = b, a
+    dot = sum(count * b.get(character, 0) for character, count in a.items())
+    if not dot:
+        return 0.0
+    norm = math.sqrt(sum(c * c for c in a.values())) * math.sqrt(sum(c * c for c in b.values()))
+    return dot / norm
+
+
+class SimilarityIndex:
+    def __init__(self, bands=BANDS, rows=ROWS, seed=0):
+        self.bands = bands
+        self.rows = rows
+        self.seed = seed
+        self._mask = (1 << rows) - 1
+        self._hyperplanes = {}
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+        self._lock = threading.RLock()
+        # (epoch, changes) the index reflects; None until it is built.
+        self._version = None
+        self._updating = False
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def _hyperplane(self, character):
+        plane = self._hyperplanes.get(character)
+        if plane is None:
+            rng = np.random.default_rng([self.seed, ord(character)])
+            plane = self._hyperplanes[character] = rng.standard_normal(self.bands * self.rows)
+        return plane
+
+    def signature(self, frequency_map):
+        """The BANDS * ROWS projection signs of ``frequency_map`` as an int."""
+        projection = np.zeros(self.bands * self.rows)
+        for character, count in frequency_map.items():
+            projection += count * self._hyperplane(character)
+        return int.from_bytes(np.packbits(projection > 0, bitorder='little').tobytes(), 'little')
+
+    def band_keys(self, signature):
+        """The bucket key of each band of ``signature``."""
+        return [(signature >> (band * self.rows)) & self._mask for band in range(self.bands)]
+
+    def _add(self, pk, frequency_map):
+        if pk in self._signatures:
+            return
+        signature = self._signatures[pk] = self.signature(frequency_map)
+        for buckets, key in zip(self._buckets, self.band_keys(signature)):
+            buckets.setdefault(key, []).append(pk)
+
+    def _remove(self, pk):
+        signature = self._signatures.pop(pk, None)
+        if signature is None:
+            return
+        for buckets, key in zip(self._buckets, self.band_keys(signature)):
+            bucket = buckets[key]
+            bucket.remove(pk)
+            if not bucket:
+                del buckets[key]
+
+    def _load(self, queryset):
+        for pk, frequency_map, blob in queryset.values_list(*_FIELDS).iterator(chunk_size=5000):
+            if blob is not None:
+                frequency_map = decode_frequency_map(blob)
+            self._add(pk, frequency_map)
+
+    def _replay(self):
+        """Apply the logged changes the index is missing; False when only a rebuild can."""
+        version = self._version
+        with read_only_transaction():
+            epoch, changes = current_version()
+            if version is None or version[0] != epoch or version[1] > changes:
+                return False
+            pks = changed_strings(version[1], changes)
+            if pks is None:
+                return False
+            pks = list(pks)
+            rows = []
+            for start in range(0, len(pks), FETCH_BATCH):
+                rows += AnalyzedString.objects.filter(pk__in=pks[start:start + FETCH_BATCH]).values_list(*_FIELDS)
+        with self._lock:
+            # Another thread got further meanwhile; these rows may be older than its.
+            if self._version != version:
+                return True
+            for pk in pks:
+                self._remove(pk)
+            for pk, frequency_map, blob in rows:
+                self._add(pk, decode_frequency_map(blob) if blob is not None else frequency_map)
+            self._version = (epoch, changes)
+        return True
+
+    def rebuild(self):
+        """Index every stored string, then swap the result in."""
+        fresh = SimilarityIndex(self.bands, self.rows, self.seed)
+        fresh._hyperplanes = self._hyperplanes
+        with read_only_transaction():
+            version = current_version()
+            fresh._load(AnalyzedString.objects.all())
+        with self._lock:
+            self._buckets, self._signatures, self._version = fresh._buckets, fresh._signatures, version
+
+    def _update_in_background(self):
+        with self._lock:
+            if self._updating:
+                return
+            self._updating = True
+        threading.Thread(target=self._background_update, daemon=True).start()
+
+    def _background_update(self):
+        from django.db import close_old_connections
+        try:
+            if not self._replay():
+                self.rebuild()
+        finally:
+            self._updating = False
+            close_old_connections()
+
+    def sync(self):
+        """Catch up with the database; raises IndexNotReady until the index is first built."""
+        epoch, changes = current_version()
+        version = self._version
+        if version is None:
+            self._update_in_background()
+            raise IndexNotReady("The similarity index is being built")
+        if version[0] == epoch and 0 <= changes - version[1] <= SYNC_INLINE and self._replay():
+            return
+        # Far behind or from another database: answer from the index as it
+        # stands while a background thread brings it up to date.
+        self._update_in_background()
+
+    def candidates(self, signature, exclude=None, limit=MAX_CANDIDATES):
+        """Primary keys sharing a bucket with ``signature``, fewest differing bits first."""
+        shared = Counter()
+        with self._lock:
+            for buckets, key in zip(self._buckets, self.band_keys(signature)):
+                shared.update(buckets.get(key, ()))
+            shared.pop(exclude, None)
+            distances = [
+                ((signature ^ self._signatures[pk]).bit_count(), pk)
+                for pk, _ in shared.most_common(limit) if pk in self._signatures
+            ]
+        return [pk for _, pk in sorted(distances)]
+
+    def most_similar(self, string, k):
+        """The ``k`` stored strings most similar to ``string`` as ``(instance, similarity)``."""
+        self.sync()
+        frequency_map = string.frequency_map
+        pks = self.candidates(self.signature(frequency_map), exclude=string.pk)[:k * RERANK_FACTOR]
+        # Only the frequency maps are read to rank; values can be large.
+        # Candidates deleted since the sync are simply missing here.
+        found = AnalyzedString.objects.only(*_FIELDS).in_bulk(pks)
+        ranked = sorted(
+            ((cosine(frequency_map, candidate.frequency_map), pk) for pk, candidate in found.items()),
+            key=lambda pair: (-pair[0], pair[1]),
+        )[:k]
+        instances = AnalyzedString.objects.in_bulk([pk for _, pk in ranked])
+        return [(instances[pk], similarity) for similarity, pk in ranked if pk in instances]
+
+    def clear(self):
+        with self._lock:
+            self._buckets = [{} for _ in range(self.bands)]
+            self._signatures = {}
+            self._version = None
+
+
+similarity_index = SimilarityIndex()
@@ -0,0 +1,210 @@
+"""Columnar snapshots of the AnalyzedString table.
+
+A snapshot is the line MAGIC followed by chunks of up to CHUNK_ROWS rows. A
+chunk is one array per entry of COLUMNS, in that order, each written in the
+NumPy ``.npy`` format so it carries its own dtype and shape; a chunk of zero
+rows ends the snapshot. Values and frequency maps vary in length, so each is
+a column of per-row sizes followed by one flat buffer holding every row's
+data back to back: values as UTF-8, frequency maps as the (code point,
+count) uint32 pairs of ``utils.encode_frequency_map``.
+
+``write_snapshot`` produces a snapshot piece by piece, for a file or a
+streaming response. ``read_snapshot`` memory-maps a file and returns views
+of it rather than copies, and ``load_snapshot`` bulk-inserts its rows
+without analysing them again.
+"""
+import itertools
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import AnalyzedString
+from .services import insert_new_strings, strings_created
+from .utils import decode_frequency_map, encode_frequency_map
+
+MAGIC = b'ANALYZER-SNAPSHOT 1\n'
+CHUNK_ROWS = 50_000
+
+COLUMNS = (
+    ('id', 'S64'),
+    ('length', '<i8'),
+    ('is_palindrome', '|b1'),
+    ('unique_characters', '<i8'),
+    ('word_count', '<i8'),
+    # Microseconds since the Unix epoch.
+    ('created_at', '<i8'),
+    # UTF-8 bytes in each value.
+    ('value_size', '<i8'),
+    ('value_data', '|u1'),
+    # (code point, count) pairs in each frequency map.
+    ('frequency_size', '<i8'),
+    ('frequency_data', '<u4'),
+)
+
+_FIELDS = ('id', 'length', 'is_palindrome', 'unique_characters', 'word_count', 'created_at',
+           'value', 'character_frequency_map', 'character_frequency_blob')
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+
+
+class SnapshotError(ValueError):
+    """The file is not a snapshot, or is truncated or inconsistent."""
+
+
+def _npy(array):
+    buffer = BytesIO()
+    np.lib.format.write_array(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def chunk_arrays(rows):
+    """The COLUMNS arrays of ``rows``, tuples of ``_FIELDS``."""
+    ids, lengths, palindromes, uniques, words, created, values, maps, blobs = zip(*rows) if rows else ((),) * 9
+    values = [value.encode('utf-8') for value in values]
+    frequencies = [
+        bytes(blob) if blob is not None else encode_frequency_map(frequency_map)
+        for frequency_map, blob in zip(maps, blobs)
+    ]
+    return {
+        'id': np.array(ids, dtype='S64'),
+        'length': np.array(lengths, dtype='<i8'),
+        'is_palindrome': np.array(palindromes, dtype='|b1'),
+        'unique_characters': np.array(uniques, dtype='<i8'),
+        'word_count': np.array(words, dtype='<i8'),
+        'created_at': np.array([(when - EPOCH) // _MICROSECOND for when in created], dtype='<i8'),
+        'value_size': np.array([len(value) for value in values], dtype='<i8'),
+        'value_data': np.frombuffer(b''.join(values), dtype='|u1'),
+        'frequency_size': np.array([len(frequency) // 8 for frequency in frequencies], dtype='<i8'),
+        'frequency_data': np.frombuffer(b''.join(frequencies), dtype='<u4'),
+    }
+
+
+def write_snapshot(queryset, chunk_rows=CHUNK_ROWS):
+    """Yield the snapshot of ``queryset`` as byte strings, one array at a time.
+
+    Rows are read in primary key order, a keyset page of ``chunk_rows`` at a
+    time, so each page costs the same however far into the table it is.
+    """
+    yield MAGIC
+    rows = queryset.order_by('pk').values_list(*_FIELDS)
+    last = None
+    while True:
+        page = list((rows if last is None else rows.filter(pk__gt=last))[:chunk_rows])
+        arrays = chunk_arrays(page)
+        for name, _ in COLUMNS:
+            yield _npy(arrays[name])
+        if not page:
+            return
+        last = page[-1][0]
+
+
+def _read_array(file, data, expected_dtype):
+    try:
+        version = np.lib.format.read_magic(file)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+    except ValueError as e:
+        raise SnapshotError(f"Invalid array header: {e}") from e
+    if dtype != expected_dtype or len(shape) != 1:
+        raise SnapshotError(f"Expected a one-dimensional {expected_dtype} array, found {dtype} {shape}")
+    start = file.tell()
+    end = start + shape[0] * dtype.itemsize
+    if end > len(data):
+        raise SnapshotError("Snapshot is truncated")
+    file.seek(end)
+    return data[start:end].view(dtype)
+
+
+def read_snapshot(path):
+    """Yield each chunk of the snapshot at ``path`` as a dict of COLUMNS arrays.
+
+    The arrays are views of a memory map of the file, so pages are only
+    read as the caller touches them.
+    """
+    data = np.memmap(path, dtype='|u1', mode='r')
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise SnapshotError(f"{path} is not a string snapshot")
+        while True:
+            chunk = {name: _read_array(file, data, np.dtype(dtype)) for name, dtype in COLUMNS}
+            rows = len(chunk['id'])
+            if any(len(chunk[name]) != rows for name in ('length', 'is_palindrome', 'unique_characters',
+                                                          'word_count', 'created_at', 'value_size',
+                                                          'frequency_size')):
+                raise SnapshotError("Columns of a chunk differ in length")
+            if chunk['value_size'].sum() != len(chunk['value_data']) or \
+                    2 * chunk['frequency_size'].sum() != len(chunk['frequency_data']):
+                raise SnapshotError("Sizes do not match the data of a chunk")
+            if not rows:
+                return
+            yield chunk
+
+
+def _offsets(sizes):
+    offsets = np.zeros(len(sizes) + 1, dtype='<i8')
+    np.cumsum(sizes, out=offsets[1:])
+    return offsets.tolist()
+
+
+def chunk_strings(chunk, start, stop):
+    """Unsaved AnalyzedStrings for rows ``start:stop`` of a snapshot chunk."""
+    compact = settings.ANALYZER_COMPACT_FREQUENCY_MAP
+    value_offsets = _offsets(chunk['value_size'][start:stop])
+    frequency_offsets = [2 * offset for offset in _offsets(chunk['frequency_size'][start:stop])]
+    value_start = int(chunk['value_size'][:start].sum())
+    frequency_start = 2 * int(chunk['frequency_size'][:start].sum())
+    values = chunk['value_data'][value_start:value_start + value_offsets[-1]].tobytes()
+    frequencies = chunk['frequency_data'][frequency_start:frequency_start + frequency_offsets[-1]]
+
+    strings = []
+    columns = zip(
+        chunk['id'][start:stop].tolist(),
+        chunk['length'][start:stop].tolist(),
+        chunk['is_palindrome'][start:stop].tolist(),
+        chunk['unique_characters'][start:stop].tolist(),
+        chunk['word_count'][start:stop].tolist(),
+        chunk['created_at'][start:stop].tolist(),
+        itertools.pairwise(value_offsets),
+        itertools.pairwise(frequency_offsets),
+    )
+    for pk, length, palindrome, unique, words, micros, (v0, v1), (f0, f1) in columns:
+        blob = frequencies[f0:f1].tobytes()
+        strings.append(AnalyzedString(
+            id=pk.decode('ascii'),
+            value=values[v0:v1].decode('utf-8'),
+            length=length,
+            is_palindrome=palindrome,
+            unique_characters=unique,
+            word_count=words,
+            character_frequency_map=None if compact else decode_frequency_map(blob),
+            character_frequency_blob=blob if compact else None,
+            created_at=EPOCH + micros * _MICROSECOND,
+        ))
+    return strings
+
+
+def load_snapshot(path, batch_size=5000):
+    """Insert the rows of the snapshot at ``path``; returns ``(created, skipped)``.
+
+    Rows whose primary key is already stored, including ones a concurrent
+    writer inserts meanwhile, are skipped. Each batch is inserted in one
+    transaction with the usual bookkeeping (postings, statistics, search
+    index), and keeps its snapshot ``created_at``.
+    """
+    created = skipped = 0
+    for chunk in read_snapshot(path):
+        for start in range(0, len(chunk['id']), batch_size):
+            batch = chunk_strings(chunk, start, start + batch_size)
+            strings = {string.pk: string for string in batch}
+            with transaction.atomic():
+                inserted = insert_new_strings(list(strings.values()))
+                strings_created([strings[pk] for pk in inserted])
+            created += len(inserted)
+            skipped += len(batch) - len(inserted)
+    return created, skipped
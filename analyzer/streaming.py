@@ -0,0 +1,79 @@
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+STREAM_CHUNK_SIZE = 2000
+
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+def _encode(row):
+    return json.dumps(row, cls=JSONEncoder, ensure_ascii=False)
+
+
+def _iter_rows(queryset, to_representation, chunk_size):
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield to_representation(row)
+
+
+def _ndjson(rows):
+    for row in rows:
+        yield _encode(row) + '\n'
+
+
+def _json_array(rows):
+    yield '['
+    separator = ''
+    for row in rows:
+        yield separator + _encode(row)
+        separator = ','
+    yield ']'
+
+
+async def _aiter_rows(queryset, to_representation, chunk_size):
+    # QuerySet.aiterator() runs the query of a values_list() on the event
+    # loop, so the server-side cursor is opened and read in chunks through
+    # sync_to_async directly; its shared thread keeps one connection.
+    rows = await sync_to_async(lambda: iter(queryset.iterator(chunk_size=chunk_size)))()
+    while chunk := await sync_to_async(lambda: list(islice(rows, chunk_size)))():
+        for row in chunk:
+            yield to_representation(row)
+
+
+async def _andjson(rows):
+    async for row in rows:
+        yield _encode(row) + '\n'
+
+
+async def _ajson_array(rows):
+    yield '['
+    separator = ''
+    async for row in rows:
+        yield separator + _encode(row)
+        separator = ','
+    yield ']'
+
+
+def stream_queryset(queryset, to_representation, stream_format, chunk_size=STREAM_CHUNK_SIZE):
+    """Stream every row of ``queryset`` without materialising it in memory.
+
+    Rows are pulled from the database ``chunk_size`` at a time with
+    ``QuerySet.iterator()``, passed through ``to_representation`` and written
+    out one by one, either as newline-delimited JSON or as a single JSON array.
+    """
+    rows = _iter_rows(queryset, to_representation, chunk_size)
+    body = _ndjson(rows) if stream_format == 'ndjson' else _json_array(rows)
+    return StreamingHttpResponse(body, content_type=STREAM_FORMATS[stream_format])
+
+
+def astream_queryset(queryset, to_representation, stream_format, chunk_size=STREAM_CHUNK_SIZE):
+    """Async version of ``stream_queryset`` for ASGI views."""
+    rows = _aiter_rows(queryset, to_representation, chunk_size)
+    body = _andjson(rows) if stream_format == 'ndjson' else _ajson_array(rows)
+    return StreamingHttpResponse(body, content_type=STREAM_FORMATS[stream_format])
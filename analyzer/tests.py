@@ -1,3 +1,976 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.throttling import AnonRateThrottle
+
+from . import search
+from .cache import (ANALYSIS_CACHE_ALIAS, QUERY_CACHE_ALIAS, BoundedLRUCache, analysis_cache,
+                    data_version, get_cached_analysis, query_cache)
+from .changes import changed_strings, current_version
+from .engine import describe, describe_many
+from .incremental import StreamingAnalysis
+from .jobs import claim_next_job, requeue_stale_jobs, run_job
+from .models import AnalysisJob, AnalyzedString, StringChange, StringStatistic
+from .query_planner import QueryPlan, clear_plan_cache, plan_cache_info, plan_query
+from .replica import ReplicaUnavailable, filter_replica, replica_page
+from .services import delete_strings, ingest_batch, rebuild_statistics, statistics_summary
+from .similarity import similarity_index
+from .snapshot import load_snapshot, read_snapshot
+from .utils import (NUMPY_MIN_LENGTH, StringAnalyzer, decode_frequency_map, describe_string, encode_frequency_map,
+                    hash_string)
+from .views import StringAnalyzerViewSet
+
+NO_THROTTLE = {
+    'DATETIME_FORMAT': '%Y-%m-%dT%H:%M:%SZ',
+    'DEFAULT_FILTER_BACKENDS': ('django_filters.rest_framework.DjangoFilterBackend',),
+    'DEFAULT_THROTTLE_CLASSES': [],
+    'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer'],
+}
+
+
+def clear_caches():
+    for alias in ('default', ANALYSIS_CACHE_ALIAS, QUERY_CACHE_ALIAS):
+        caches[alias].clear()
+
+
+@override_settings(REST_FRAMEWORK=NO_THROTTLE)
+class APITestCase(TestCase):
+    """Runs against the URL conf in ROOT_URLCONF, without throttling or stale caches."""
+
+    def setUp(self):
+        clear_caches()
+
+
+class BoundedLRUCacheTests(SimpleTestCase):
+    def setUp(self):
+        clear_caches()
+
+    def make_cache(self, name, **options):
+        return BoundedLRUCache(name, {'OPTIONS': options})
+
+    def test_evicts_least_recently_used_by_entries(self):
+        cache = self.make_cache('test-entries', MAX_ENTRIES=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+
+    def test_evicts_by_bytes_and_tracks_them(self):
+        cache = self.make_cache('test-bytes', MAX_BYTES=1000)
+        for n in range(20):
+            cache.set(n, 'x' * 100)
+        self.assertLessEqual(cache.total_bytes, 1000)
+        self.assertEqual(cache.total_bytes, sum(len(value) for value in cache._cache.values()))
+        cache.clear()
+        self.assertEqual(cache.total_bytes, 0)
+
+    def test_incr_keeps_byte_count(self):
+        cache = self.make_cache('test-incr')
+        cache.set('n', 1)
+        cache.incr('n', 10 ** 30)
+        self.assertEqual(cache.total_bytes, len(cache._cache[cache.make_key('n')]))
+
+    def test_aliases_do_not_share_storage(self):
+        analysis_cache().set('analysis:a', {'value': 'a'})
+        caches['default'].set('throttle', 1)
+        query_cache().clear()
+        caches['default'].clear()
+        self.assertEqual(analysis_cache().get('analysis:a'), {'value': 'a'})
+        self.assertEqual(analysis_cache().total_bytes, len(analysis_cache()._cache[analysis_cache().make_key('analysis:a')]))
+
+
+class StringEndpointTests(APITestCase):
+    """Create, retrieve, delete, list and bulk through the synchronous DRF routes."""
+
+    def post(self, value):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/strings', {'value': value}, content_type='application/json')
+
+    def stats(self):
+        response = self.client.get('/strings/stats')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_create_returns_analysis(self):
+        response = self.post('Never odd or even')
+        self.assertEqual(response.status_code, 201, response.content)
+        body = response.json()
+        self.assertEqual(body['id'], hash_string('never odd or even'))
+        self.assertEqual(body['value'], 'Never odd or even')
+        self.assertEqual(body['properties']['length'], 17)
+        self.assertEqual(body['properties']['word_count'], 4)
+        self.assertEqual(body['properties']['sha256_hash'], body['id'])
+        self.assertEqual(body['properties']['character_frequency_map']['e'], 4)
+
+    def test_create_conflicts_ignoring_case(self):
+        self.assertEqual(self.post('Level').status_code, 201)
+        response = self.post('LEVEL')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {'data-conflict': ['the provided string already exists']})
+        self.assertEqual(AnalyzedString.objects.count(), 1)
+
+    def test_create_rejects_non_string(self):
+        self.assertEqual(self.post(42).status_code, 422)
+        response = self.client.post('/strings', {}, content_type='application/json')
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(AnalyzedString.objects.exists())
+
+    def test_retrieve_and_delete(self):
+        self.post('Level')
+        response = self.client.get('/strings/Level')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['value'], 'Level')
+        # Same primary key, but lookups compare the stored value exactly.
+        self.assertEqual(self.client.get('/strings/LEVEL').status_code, 404)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete('/strings/Level').status_code, 204)
+        self.assertEqual(self.client.get('/strings/Level').status_code, 404)
+        self.assertEqual(self.client.delete('/strings/Level').status_code, 404)
+
+    def test_by_hash_ignores_case_of_the_value(self):
+        self.post('Hello World')
+        url = f"/strings/by-hash/{hash_string('hello world')}"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['value'], 'Hello World')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.delete(url).status_code, 404)
+        self.assertEqual(self.client.get('/strings/by-hash/not-a-hash').status_code, 404)
+
+    def test_keyset_pagination_walks_every_row_once(self):
+        values = [f'string {n}' for n in range(7)]
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_batch(values)
+        seen, cursor, pages = [], None, 0
+        while True:
+            params = {'page_size': 3, **({'cursor': cursor} if cursor else {})}
+            response = self.client.get('/strings', params)
+            self.assertEqual(response.status_code, 200, response.content)
+            body = response.json()
+            seen += [item['value'] for item in body['data']]
+            pages += 1
+            cursor = body['next']
+            if cursor is None:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(sorted(seen), sorted(values))
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/strings', {'cursor': 'not-a-cursor'}).status_code, 404)
+
+    def test_bulk_reports_each_item(self):
+        self.post('kept')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/strings/bulk', ['one', {'value': 'two'}, 3, 'ONE', 'Kept'],
+                                        content_type='application/json')
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertEqual([item['status'] for item in body['results']],
+                         ['created', 'created', 'invalid', 'conflict', 'conflict'])
+        self.assertEqual((body['created'], body['conflict'], body['invalid']), (2, 2, 1))
+        self.assertEqual(AnalyzedString.objects.count(), 3)
+
+    def test_bulk_rejects_non_array(self):
+        response = self.client.post('/strings/bulk', {'value': 'one'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_stream_upload_omits_value(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/strings/stream', 'Step on no pets'.encode(), content_type='text/plain')
+        self.assertEqual(response.status_code, 201, response.content)
+        body = response.json()
+        self.assertNotIn('value', body)
+        self.assertEqual(body['id'], hash_string('step on no pets'))
+        self.assertEqual(body['properties']['length'], 15)
+        self.assertTrue(body['properties']['is_palindrome'])
+        self.assertEqual(AnalyzedString.objects.get().value, 'Step on no pets')
+
+    @override_settings(ANALYZER_STREAM_MAX_BYTES=10)
+    def test_stream_upload_rejects_oversized_body(self):
+        response = self.client.post('/strings/stream', b'x' * 11, content_type='text/plain')
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(AnalyzedString.objects.exists())
+
+    @override_settings(ANALYZER_STREAM_MAX_BYTES=10)
+    def test_stream_upload_never_loads_an_oversized_value(self):
+        with mock.patch.object(StreamingAnalysis, 'value') as value:
+            response = self.client.post('/strings/stream', b'x ' * 20, content_type='text/plain')
+            self.assertEqual(response.status_code, 413)
+        value.assert_not_called()
+
+    def test_stats_follow_creates_and_deletes(self):
+        self.assertEqual(self.stats()['total_strings'], 0)
+        self.post('Level')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/strings/bulk', ['ab ba', 'xyz'], content_type='application/json')
+        stats = self.stats()
+        self.assertEqual(stats['total_strings'], 3)
+        self.assertEqual(stats['palindromes'], 2)
+        self.assertEqual(stats['total_characters'], 13)
+        self.assertEqual(stats['total_words'], 4)
+        self.assertEqual(stats['character_frequency']['l'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete('/strings/Level')
+        stats = self.stats()
+        self.assertEqual(stats['total_strings'], 2)
+        self.assertEqual(stats['palindromes'], 1)
+        self.assertEqual(stats['total_characters'], 8)
+        self.assertNotIn('l', stats['character_frequency'])
+
+    def test_stats_rebuild_after_writes_that_skip_the_counters(self):
+        with mock.patch('analyzer.services.rebuild_statistics', wraps=rebuild_statistics) as rebuild:
+            self.post('Level')
+            self.assertEqual(self.stats()['total_strings'], 1)
+            self.assertEqual(rebuild.call_count, 0)
+            AnalyzedString.objects.filter(value='Level').delete()
+            clear_caches()
+            self.assertEqual(self.stats()['total_strings'], 0)
+            self.assertEqual(rebuild.call_count, 1)
+        self.post('xyz')
+        AnalyzedString.objects.filter(value='xyz').update(length=30)
+        clear_caches()
+        self.assertEqual(self.stats()['total_characters'], 30)
+
+    @mock.patch.object(StringAnalyzerViewSet, 'permission_classes', [IsAuthenticated])
+    def test_viewset_permissions_apply(self):
+        ingest_batch(['Level'])
+        responses = {
+            'list': self.client.get('/strings'),
+            'create': self.client.post('/strings', {'value': 'new'}, content_type='application/json'),
+            'retrieve': self.client.get('/strings/Level'),
+            'natural language': self.client.get('/strings/filter-by-natural-language', {'query': 'palindromes'}),
+            'destroy': self.client.delete('/strings/Level'),
+        }
+        for action, response in responses.items():
+            with self.subTest(action):
+                self.assertEqual(response.status_code, 403)
+        self.assertTrue(AnalyzedString.objects.filter(value='Level').exists())
+
+        self.client.force_login(User.objects.create_user('reader'))
+        self.assertEqual(self.client.get('/strings/Level').status_code, 200)
+        self.assertEqual(self.post('new').status_code, 201)
+
+    @mock.patch.object(StringAnalyzerViewSet, 'throttle_classes', [AnonRateThrottle])
+    @mock.patch.object(AnonRateThrottle, 'THROTTLE_RATES', {'anon': '2/minute'})
+    def test_viewset_throttles_apply(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get('/strings').status_code, 200)
+        response = self.client.get('/strings/Level')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+
+
+@override_settings(ROOT_URLCONF='analyzer.async_urls')
+class AsyncStringEndpointTests(StringEndpointTests):
+    """The same requests with the async views taking over the routes they implement."""
+
+
+class QueryPlannerTests(TestCase):
+    def setUp(self):
+        clear_plan_cache()
+
+    def test_phrasings(self):
+        cases = {
+            'all single word palindromic strings': {'is_palindrome': True, 'word_count': 1},
+            'strings with 3 words longer than 10 characters': {'word_count': 3, 'min_length': 11},
+            'at least 4 characters and at most 9 characters': {'min_length': 4, 'max_length': 9},
+            'minimum length 2, maximum of 7': {'min_length': 2, 'max_length': 7},
+            'shorter than 20 containing the letter z': {'max_length': 19, 'contains_character': 'z'},
+            'strings that contain the first vowel': {'contains_character': 'a'},
+            'strings containing "hello"': {'contains_substring': 'hello'},
+            'substring abc with the word Cat': {'contains_substring': 'abc', 'contains_word': 'cat'},
+        }
+        for query, filters in cases.items():
+            with self.subTest(query):
+                self.assertEqual(plan_query(query).as_filters(), filters)
+
+    def test_unparseable(self):
+        with self.assertRaises(ValueError):
+            plan_query('tell me something nice')
+
+    def test_plans_are_cached_by_normalized_query(self):
+        first = plan_query('Single word  palindromes')
+        self.assertIs(plan_query('  single WORD palindromes'), first)
+        info = plan_cache_info()
+        self.assertEqual((info.hits, info.misses), (1, 1))
+
+    def test_plan_applies_every_predicate(self):
+        ingest_batch(['level', 'noon noon', 'racecar', 'hello world', 'a cat sat'])
+        plan = QueryPlan.from_filters({'is_palindrome': True, 'word_count': 1, 'min_length': 5})
+        values = plan.apply(AnalyzedString.objects.all()).values_list('value', flat=True)
+        self.assertEqual(sorted(values), ['level', 'racecar'])
+        plan = plan_query("strings with the word cat containing the letter s")
+        self.assertEqual(list(plan.apply(AnalyzedString.objects.all()).values_list('value', flat=True)), ['a cat sat'])
+
+
+class VectorizedKernelTests(SimpleTestCase):
+    """The NumPy kernels give the same answers as the pure-Python path they replace."""
+
+    def samples(self):
+        half = 'Ab1 ,é😀' * NUMPY_MIN_LENGTH
+        return {
+            'ascii': 'The quick brown fox. ' * NUMPY_MIN_LENGTH,
+            'ascii palindrome': 'Never odd or even' * NUMPY_MIN_LENGTH + 'X' + 'neve ro ddo reveN' * NUMPY_MIN_LENGTH,
+            'unicode palindrome': half + half[::-1],
+            'unicode': 'Ωμέγα ΣΊΣΥΦΟΣ 😀 ' * NUMPY_MIN_LENGTH,
+            'one code point off': 'a' * NUMPY_MIN_LENGTH + 'b' + 'a' * (NUMPY_MIN_LENGTH - 1) + 'c',
+        }
+
+    def test_describe_string(self):
+        for name, value in self.samples().items():
+            with self.subTest(name):
+                vectorized = describe_string(value)
+                with mock.patch('analyzer.utils.np', None):
+                    self.assertEqual(describe_string(value), vectorized)
+
+    def test_alphanumeric_palindrome(self):
+        for name, value in self.samples().items():
+            with self.subTest(name):
+                vectorized = StringAnalyzer._is_palindrome(value)
+                with mock.patch('analyzer.utils.np', None):
+                    self.assertEqual(StringAnalyzer._is_palindrome(value), vectorized)
+        self.assertTrue(StringAnalyzer._is_palindrome('A man, a plan, a canal: Panama! ' * NUMPY_MIN_LENGTH))
+
+    def test_short_strings_skip_numpy(self):
+        with mock.patch('analyzer.utils.code_points') as code_points:
+            describe_string('x' * (NUMPY_MIN_LENGTH - 1))
+        code_points.assert_not_called()
+
+
+@override_settings(ANALYZER_PROCESS_POOL={'WORKERS': 2, 'MIN_CHARS': 1})
+class ProcessPoolTests(SimpleTestCase):
+    def test_short_strings_stay_in_process(self):
+        with mock.patch('analyzer.engine.get_executor') as get_executor:
+            self.assertEqual(describe('level')['is_palindrome'], True)
+            self.assertEqual(describe_many(['ab', 'cd'])[1]['length'], 2)
+            get_executor.assert_not_called()
+
+    def test_long_strings_go_to_the_pool(self):
+        value = 'ab' * NUMPY_MIN_LENGTH
+        with mock.patch('analyzer.engine.get_executor') as get_executor:
+            get_executor.return_value.submit.return_value.result.return_value = describe_string(value)
+            self.assertEqual(describe(value)['length'], len(value))
+            get_executor.return_value.submit.assert_called_once_with(describe_string, value)
+
+
+@override_settings(ANALYZER_METRICS_ENABLED=True, ANALYZER_METRICS_SAMPLE_RATE=1.0)
+class MetricsTests(APITestCase):
+    def test_disabled_by_default(self):
+        with override_settings(ANALYZER_METRICS_ENABLED=False):
+            self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+    def test_reports_sampled_phases(self):
+        ingest_batch(['Level'])
+        self.assertEqual(self.client.get('/strings/Level').status_code, 200)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('analyzer_metrics_sample_rate 1.0', body)
+        self.assertRegex(body, r'analyzer_requests_total\{[^}]*method="GET",status="200"\} \d+')
+        self.assertRegex(body, r'analyzer_request_phase_seconds_count\{[^}]*phase="db"\} \d+')
+        self.assertRegex(body, r'analyzer_request_db_queries_count\{[^}]*\} \d+')
+
+    @override_settings(ANALYZER_METRICS_ALLOWED_IPS=['10.0.0.0/8'])
+    def test_only_allowed_addresses_and_staff(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, 200)
+        self.client.force_login(User.objects.create_user('viewer'))
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.force_login(User.objects.create_user('operator', is_staff=True))
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+
+@override_settings(ANALYZER_JOBS={'WORKERS': 0, 'MAX_QUEUED': 2, 'STALE_SECONDS': 60, 'MAX_ATTEMPTS': 2})
+class AnalysisJobTests(APITestCase):
+    """``?async=true`` requests, run here by claiming the jobs instead of by worker threads."""
+
+    def run_queued_jobs(self):
+        while (job := claim_next_job()) is not None:
+            run_job(job)
+
+    def test_create_is_queued_then_run(self):
+        response = self.client.post('/strings?async=true', {'value': 'Racecar'}, content_type='application/json')
+        self.assertEqual(response.status_code, 202, response.content)
+        body = response.json()
+        self.assertEqual(body['status'], AnalysisJob.QUEUED)
+        self.assertEqual(response['Location'], body['status_url'])
+        self.assertFalse(AnalyzedString.objects.exists())
+
+        self.run_queued_jobs()
+        job = self.client.get(body['status_url']).json()
+        self.assertEqual(job['status'], AnalysisJob.DONE)
+        self.assertEqual(job['status_code'], 201)
+        self.assertEqual(job['result']['id'], hash_string('racecar'))
+        self.assertTrue(job['result']['properties']['is_palindrome'])
+        self.assertIsNone(AnalysisJob.objects.get().payload)
+
+        self.client.post('/strings?async=true', {'value': 'RACECAR'}, content_type='application/json')
+        self.run_queued_jobs()
+        self.assertEqual(AnalysisJob.objects.latest('created_at').status_code, 409)
+
+    def test_bulk_reports_each_item(self):
+        response = self.client.post('/strings/bulk?async=true', ['abba', 7, 'xyz', 'ABBA'],
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 202, response.content)
+        self.run_queued_jobs()
+        job = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(job['status_code'], 200)
+        self.assertEqual([item['status'] for item in job['result']['results']],
+                         ['created', 'invalid', 'created', 'conflict'])
+        self.assertEqual((job['result']['created'], job['result']['conflict'], job['result']['invalid']), (2, 1, 1))
+
+    def test_full_queue_refuses_new_jobs(self):
+        for value in ('a', 'b'):
+            self.client.post('/strings?async=true', {'value': value}, content_type='application/json')
+        response = self.client.post('/strings?async=true', {'value': 'c'}, content_type='application/json')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(AnalysisJob.objects.count(), 2)
+
+    def test_stale_jobs_are_queued_again_until_out_of_attempts(self):
+        job = AnalysisJob.objects.create(kind=AnalysisJob.CREATE, payload={'value': 'stale'})
+        for attempt in (1, 2):
+            self.assertEqual(claim_next_job().pk, job.pk)
+            AnalysisJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(minutes=5))
+            requeue_stale_jobs()
+            job.refresh_from_db()
+            self.assertEqual(job.attempts, attempt)
+        self.assertEqual(job.status, AnalysisJob.FAILED)
+        self.assertIsNone(job.payload)
+        self.assertIsNone(claim_next_job())
+
+    def test_unknown_job(self):
+        response = self.client.get('/jobs/00000000-0000-0000-0000-000000000000')
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(ROOT_URLCONF='analyzer.async_urls')
+class AsyncAnalysisJobTests(AnalysisJobTests):
+    pass
+
+
+class IngestBatchTests(TestCase):
+    def test_counts_only_rows_it_inserted(self):
+        ingest_batch(['abc', 'Level'])
+        results = ingest_batch(['ABC', 'new', 'NEW', 'level'])
+        self.assertEqual([result['status'] for result in results], ['conflict', 'created', 'conflict', 'conflict'])
+        self.assertEqual(results[1]['id'], hash_string('new'))
+        summary = statistics_summary()
+        self.assertEqual(summary['total_strings'], 3)
+        self.assertEqual(summary['palindromes'], 1)
+        self.assertEqual(StringStatistic.objects.get(kind=StringStatistic.CHARACTER, key='n').count, 1)
+
+    @override_settings(ANALYZER_COMPACT_FREQUENCY_MAP=True)
+    def test_stores_every_column(self):
+        ingest_batch(['Hello'])
+        string = AnalyzedString.objects.get()
+        self.assertEqual((string.value, string.length, string.word_count, string.is_palindrome), ('Hello', 5, 1, False))
+        self.assertIsNone(string.character_frequency_map)
+        self.assertEqual(string.frequency_map, {'h': 1, 'e': 1, 'l': 2, 'o': 1})
+        self.assertIsNotNone(string.created_at)
+
+
+class FrequencyMapEncodingTests(APITestCase):
+    def test_round_trip(self):
+        frequencies = {'a': 3, 'é': 1, '😀': 2, ' ': 70000}
+        blob = encode_frequency_map(frequencies)
+        self.assertEqual(len(blob), 8 * len(frequencies))
+        self.assertEqual(decode_frequency_map(blob), frequencies)
+        self.assertEqual(decode_frequency_map(encode_frequency_map({})), {})
+
+    def test_api_reads_either_encoding(self):
+        self.client.post('/strings', {'value': 'json map'}, content_type='application/json')
+        with self.settings(ANALYZER_COMPACT_FREQUENCY_MAP=True):
+            self.client.post('/strings', {'value': 'blob map'}, content_type='application/json')
+        compact = AnalyzedString.objects.get(pk=hash_string('blob map'))
+        self.assertIsNone(compact.character_frequency_map)
+        self.assertIsNotNone(compact.character_frequency_blob)
+
+        expected = {value: describe_string(value)['character_frequency_map'] for value in ('json map', 'blob map')}
+        for value, frequencies in expected.items():
+            response = self.client.get(f'/strings/{value}')
+            self.assertEqual(response.json()['properties']['character_frequency_map'], frequencies)
+        listed = self.client.get('/strings').json()['data']
+        self.assertEqual({row['value']: row['properties']['character_frequency_map'] for row in listed}, expected)
+
+    def test_compact_command_converts_json_maps(self):
+        ingest_batch(['abc', 'hello there'])
+        before = {string.pk: string.frequency_map for string in AnalyzedString.objects.all()}
+        out = StringIO()
+        call_command('compact_frequency_maps', batch_size=1, stdout=out)
+        self.assertIn('Converted 2', out.getvalue())
+        self.assertFalse(AnalyzedString.objects.filter(character_frequency_map__isnull=False).exists())
+        self.assertEqual({string.pk: string.frequency_map for string in AnalyzedString.objects.all()}, before)
+
+
+SEARCH_VALUES = ['Hello World', 'say hello', 'worldly goods', 'racecar', 'abc def']
+
+
+class SearchFilterTests(APITestCase):
+    """The search filters on the synchronous DRF routes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        ingest_batch(SEARCH_VALUES)
+
+    def values(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(item['value'] for item in response.json()['data'])
+
+    def test_contains_substring(self):
+        self.assertEqual(self.values(self.client.get('/strings', {'contains_substring': 'WORLD'})),
+                         ['Hello World', 'worldly goods'])
+
+    def test_short_substring(self):
+        self.assertEqual(self.values(self.client.get('/strings', {'contains_substring': 'ce'})), ['racecar'])
+
+    def test_contains_word(self):
+        self.assertEqual(self.values(self.client.get('/strings', {'contains_word': 'world'})), ['Hello World'])
+
+    def test_contains_character(self):
+        self.assertEqual(self.values(self.client.get('/strings', {'contains_character': 'z'})), [])
+        self.assertEqual(self.values(self.client.get('/strings', {'contains_characters': 'yh'})), ['say hello'])
+
+    def test_natural_language_substring(self):
+        response = self.client.get('/strings/filter-by-natural-language', {'query': "strings containing 'hello'"})
+        self.assertEqual(self.values(response), ['Hello World', 'say hello'])
+
+
+@override_settings(ROOT_URLCONF='analyzer.async_urls')
+class AsyncSearchFilterTests(SearchFilterTests):
+    """The same filters through the async views, which build querysets on the event loop."""
+
+    def setUp(self):
+        super().setUp()
+        # Migrating the test database already probed for FTS5; probe again on the loop.
+        search._fts5_support.clear()
+
+    async def test_async_client_contains_substring(self):
+        response = await self.async_client.get('/strings', {'contains_substring': 'world'})
+        self.assertEqual(self.values(response), ['Hello World', 'worldly goods'])
+
+    async def test_async_client_contains_word(self):
+        response = await self.async_client.get('/strings', {'contains_word': 'hello'})
+        self.assertEqual(self.values(response), ['Hello World', 'say hello'])
+
+    async def test_async_client_natural_language(self):
+        response = await self.async_client.get('/strings/filter-by-natural-language',
+                                                {'query': "strings containing 'world'"})
+        self.assertEqual(self.values(response), ['Hello World', 'worldly goods'])
+
+
+class ListProjectionTests(APITestCase):
+    """``fields`` and ``exclude`` on the list and natural language routes."""
+
+    def setUp(self):
+        super().setUp()
+        ingest_batch(['level', 'two words'])
+
+    def rows(self, path='/strings', **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['data']
+
+    def test_fields(self):
+        for row in self.rows(fields='id,length'):
+            self.assertEqual(set(row), {'id', 'properties'})
+            self.assertEqual(set(row['properties']), {'length'})
+        row = self.rows(fields='value,properties')[0]
+        self.assertEqual(set(row), {'value', 'properties'})
+        self.assertEqual(len(row['properties']), 6)
+
+    def test_exclude(self):
+        row = self.rows(exclude='value,character_frequency_map')[0]
+        self.assertEqual(set(row), {'id', 'properties', 'created_at'})
+        self.assertNotIn('character_frequency_map', row['properties'])
+        self.assertEqual(set(self.rows(fields='id,value', exclude='value')[0]), {'id'})
+
+    def test_natural_language(self):
+        rows = self.rows('/strings/filter-by-natural-language', query='all single word palindromic strings', fields='value')
+        self.assertEqual(rows, [{'value': 'level'}])
+
+    def test_projection_is_part_of_the_cache_key(self):
+        self.assertEqual(set(self.rows(fields='id')[0]), {'id'})
+        self.assertEqual(set(self.rows(fields='value')[0]), {'value'})
+
+    def test_unknown_field(self):
+        response = self.client.get('/strings', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['fields'][0])
+
+
+@override_settings(ROOT_URLCONF='analyzer.async_urls')
+class AsyncListProjectionTests(ListProjectionTests):
+    pass
+
+
+class ListStreamTests(APITestCase):
+    """``?stream=ndjson`` and ``?stream=json`` on the list route."""
+
+    def setUp(self):
+        super().setUp()
+        ingest_batch([f'string {n}' for n in range(5)] + ['noon'])
+
+    def streamed(self, **params):
+        response = self.client.get('/strings', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        if response.is_async:
+            body = async_to_sync(self.consume)(response.streaming_content)
+        else:
+            body = b''.join(response.streaming_content)
+        return response['Content-Type'], body.decode()
+
+    @staticmethod
+    async def consume(chunks):
+        return b''.join([chunk async for chunk in chunks])
+
+    def test_ndjson(self):
+        content_type, body = self.streamed(stream='ndjson', fields='value')
+        self.assertEqual(content_type, 'application/x-ndjson')
+        lines = body.splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertEqual({json.loads(line)['value'] for line in lines},
+                         set(AnalyzedString.objects.values_list('value', flat=True)))
+
+    def test_json_array_with_filters(self):
+        content_type, body = self.streamed(stream='json', is_palindrome='true')
+        self.assertEqual(content_type, 'application/json')
+        rows = json.loads(body)
+        self.assertEqual([row['value'] for row in rows], ['noon'])
+        self.assertEqual(rows[0]['properties']['length'], 4)
+
+    def test_streams_in_page_order(self):
+        _, body = self.streamed(stream='json', fields='id')
+        expected = list(AnalyzedString.objects.order_by('created_at', 'id').values_list('id', flat=True))
+        self.assertEqual([row['id'] for row in json.loads(body)], expected)
+        self.assertEqual(json.loads(self.streamed(stream='json', word_count=9)[1]), [])
+
+    def test_unknown_format(self):
+        response = self.client.get('/strings', {'stream': 'csv'})
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(ROOT_URLCONF='analyzer.async_urls')
+class AsyncListStreamTests(ListStreamTests):
+    pass
+
+
+class SearchTriggerRepairTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        if not search.has_fts5_index(connection):
+            self.skipTest('SQLite without FTS5 trigram support')
+
+    def test_migrate_reinstalls_dropped_triggers(self):
+        ingest_batch(['hello before', 'goodbye'])
+        # What SQLite does to the triggers when a migration rebuilds the table.
+        with connection.cursor() as cursor:
+            for name in search._TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {name}')
+        ingest_batch(['hello during'])
+        delete_strings([hash_string('goodbye')])
+
+        emit_post_migrate_signal(verbosity=0, interactive=False, db=connection.alias)
+        ingest_batch(['hello after'])
+
+        response = self.client.get('/strings', {'contains_substring': 'hello'})
+        self.assertEqual(sorted(item['value'] for item in response.json()['data']),
+                         ['hello after', 'hello before', 'hello during'])
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {search.DOCUMENT_TABLE}')
+            self.assertEqual(cursor.fetchone()[0], 3)
+
+
+class ChangeLogTests(TestCase):
+    def test_logs_every_write(self):
+        _, start = current_version()
+        ingest_batch(['one', 'two'])
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM analyzer_characterposting WHERE string_id = %s", [hash_string('one')])
+            cursor.execute("DELETE FROM analyzer_analyzedstring WHERE value = 'one'")
+        AnalyzedString.objects.filter(value='two').update(created_at=timezone.now())
+        _, now = current_version()
+        self.assertEqual(now, start + 4)
+        self.assertEqual(changed_strings(start, now), {hash_string('one'), hash_string('two')})
+        self.assertEqual(changed_strings(start + 2, now), {hash_string('one'), hash_string('two')})
+        self.assertEqual(changed_strings(now, now), set())
+
+    def test_reports_a_trimmed_log(self):
+        ingest_batch(['one', 'two'])
+        _, now = current_version()
+        StringChange.objects.filter(seq=now - 1).delete()
+        self.assertIsNone(changed_strings(now - 2, now))
+        self.assertEqual(changed_strings(now - 1, now), {hash_string('two')})
+
+    def test_compacting_frequency_maps_is_not_a_change(self):
+        ingest_batch(['one'])
+        version = data_version()
+        AnalyzedString.objects.update(character_frequency_map=None, character_frequency_blob=b'')
+        self.assertEqual(data_version(), version)
+
+
+class CacheInvalidationTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        ingest_batch(['Level'])
+
+    def test_retrieve_then_delete_drops_cached_analysis(self):
+        self.assertEqual(self.client.get('/strings/Level').status_code, 200)
+        self.assertIsNotNone(get_cached_analysis(hash_string('level')))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete('/strings/Level').status_code, 204)
+        self.assertIsNone(get_cached_analysis(hash_string('level')))
+        self.assertEqual(self.client.get('/strings/Level').status_code, 404)
+
+    def test_invalidation_waits_for_commit(self):
+        self.client.get('/strings/Level')
+        with self.captureOnCommitCallbacks() as callbacks:
+            delete_strings([hash_string('level')])
+            # Until commit, concurrent readers still see the row: nothing may be invalidated yet.
+            self.assertIsNotNone(analysis_cache().get(f"analysis:{hash_string('level')}"))
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(analysis_cache().get(f"analysis:{hash_string('level')}"))
+
+    def test_cached_analysis_of_a_string_deleted_elsewhere(self):
+        self.client.get('/strings/Level')
+        # Another worker's delete: its on_commit invalidation runs over there.
+        delete_strings([hash_string('level')])
+        self.assertIsNone(get_cached_analysis(hash_string('level')))
+        self.assertEqual(self.client.get('/strings/Level').status_code, 404)
+
+    def test_cached_analysis_of_a_string_created_again_elsewhere(self):
+        cached = self.client.get('/strings/Level').json()
+        delete_strings([hash_string('level')])
+        ingest_batch(['Level'])
+        AnalyzedString.objects.update(created_at=timezone.now() + timedelta(days=1))
+        self.assertNotEqual(self.client.get('/strings/Level').json()['created_at'], cached['created_at'])
+
+    def test_data_version_follows_writes_that_bypass_the_api(self):
+        version = data_version()
+        AnalyzedString.objects.filter(pk=hash_string('level')).delete()
+        self.assertNotEqual(data_version(), version)
+        self.assertEqual(self.client.get('/strings').json()['count'], 0)
+
+    def test_list_cache_follows_creates(self):
+        self.assertEqual(self.client.get('/strings').json()['count'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/strings', {'value': 'new one'}, content_type='application/json')
+        self.assertEqual(self.client.get('/strings').json()['count'], 2)
+
+
+class SimilarityIndexSyncTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        similarity_index.clear()
+        self.addCleanup(similarity_index.clear)
+        # The tests' transaction is invisible to other threads; build inline instead.
+        patcher = mock.patch.object(similarity_index, '_update_in_background')
+        self.background = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_first_query_waits_for_the_build(self):
+        ingest_batch(['listen', 'silent', 'enlist', 'xyz'])
+        response = self.client.get('/strings/listen/similar', {'k': 2})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        self.background.assert_called_once()
+
+        similarity_index.rebuild()
+        response = self.client.get('/strings/listen/similar', {'k': 2})
+        self.assertEqual(response.status_code, 200, response.content)
+        body = response.json()
+        self.assertEqual(sorted(item['value'] for item in body['data']), ['enlist', 'silent'])
+        self.assertEqual(body['data'][0]['similarity'], 1.0)
+
+    def test_replays_writes_from_anywhere(self):
+        ingest_batch(['abcd', 'abce'])
+        similarity_index.rebuild()
+        ingest_batch(['abcf'])
+        AnalyzedString.objects.filter(value='abce').delete()
+        similarity_index.sync()
+        self.assertEqual(len(similarity_index), 2)
+        self.background.assert_not_called()
+        string = AnalyzedString.objects.get(pk=hash_string('abcd'))
+        self.assertEqual([found.value for found, _ in similarity_index.most_similar(string, 5)], ['abcf'])
+
+    def test_long_backlog_is_replayed_in_the_background(self):
+        ingest_batch(['abcd'])
+        similarity_index.rebuild()
+        with mock.patch('analyzer.similarity.SYNC_INLINE', 1):
+            ingest_batch(['abce', 'abcf'])
+            similarity_index.sync()
+        self.background.assert_called_once()
+        self.assertEqual(len(similarity_index), 1)
+        similarity_index._background_update()
+        self.assertEqual(len(similarity_index), 3)
+
+    def test_rebuilds_when_the_log_is_trimmed(self):
+        ingest_batch(['abcd'])
+        similarity_index.rebuild()
+        ingest_batch(['abce'])
+        StringChange.objects.all().delete()
+        similarity_index._background_update()
+        self.assertEqual(len(similarity_index), 2)
+
+
+@override_settings(REST_FRAMEWORK=NO_THROTTLE)
+class SnapshotTests(TestCase):
+    VALUES = ['Hello World', 'Ünïcödé ✓', 'racecar', 'xy' * 2500]
+
+    def setUp(self):
+        ingest_batch(self.VALUES)
+        AnalyzedString.objects.update(created_at=timezone.now() - timedelta(days=400))
+        self.stored = {string.pk: string for string in AnalyzedString.objects.all()}
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'strings.snapshot')
+
+    def export(self, **params):
+        response = self.client.get('/strings/export', params)
+        self.assertEqual(response.status_code, 200)
+        with open(self.path, 'wb') as output:
+            output.write(b''.join(response.streaming_content))
+
+    def test_export_then_load_round_trip(self):
+        self.export()
+        delete_strings(list(self.stored))
+        self.assertEqual(load_snapshot(self.path, batch_size=3), (4, 0))
+        for string in AnalyzedString.objects.all():
+            original = self.stored[string.pk]
+            self.assertEqual((string.value, string.created_at, string.frequency_map, string.length),
+                             (original.value, original.created_at, original.frequency_map, original.length))
+        self.assertEqual(statistics_summary()['total_strings'], 4)
+
+    def test_export_applies_list_filters(self):
+        self.export(is_palindrome='true')
+        ids = [pk.decode() for chunk in read_snapshot(self.path) for pk in chunk['id'].tolist()]
+        self.assertEqual(ids, [hash_string('racecar')])
+
+    def test_load_skips_stored_rows(self):
+        self.export()
+        delete_strings([hash_string('racecar')])
+        self.assertEqual(load_snapshot(self.path), (1, 3))
+        self.assertEqual(statistics_summary()['total_strings'], 4)
+
+    def test_load_leaves_timestamps_of_other_writes_alone(self):
+        self.export()
+        delete_strings([hash_string('racecar')])
+        load_snapshot(self.path)
+        self.assertTrue(AnalyzedString._meta.get_field('created_at').auto_now_add)
+        ingest_batch(['fresh'])
+        fresh = AnalyzedString.objects.get(pk=hash_string('fresh'))
+        self.assertGreater(fresh.created_at, timezone.now() - timedelta(minutes=1))
+
+
+class FilterReplicaTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(ANALYZER_FILTER_REPLICA=True,
+                                     ANALYZER_FILTER_REPLICA_PATH=os.path.join(directory.name, 'replica'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # The tests' transaction is invisible to other threads; refresh inline instead.
+        patcher = mock.patch.object(filter_replica, '_refresh_in_background')
+        self.background = patcher.start()
+        self.addCleanup(patcher.stop)
+        ingest_batch([f'word {n}' for n in range(20)] + ['racecar', 'level', 'one two three'])
+
+    def select(self, **filters):
+        records, indexes = filter_replica.select(filters)
+        return sorted(pk.decode() for pk in records['id'][indexes].tolist())
+
+    def expected(self, **filters):
+        return sorted(AnalyzedString.objects.filter(**filters).values_list('pk', flat=True))
+
+    def test_builds_in_the_background(self):
+        with self.assertRaises(ReplicaUnavailable):
+            filter_replica.select({'word_count': 2})
+        self.background.assert_called_once()
+        filter_replica.refresh()
+        self.assertEqual(self.select(word_count=2), self.expected(word_count=2))
+
+    def test_replays_writes_made_outside_the_services(self):
+        filter_replica.refresh()
+        AnalyzedString.objects.filter(value__in=['word 1', 'racecar']).delete()
+        AnalyzedString.objects.filter(value='word 2').update(word_count=3)
+        ingest_batch(['noon', 'four words in here'])
+        self.assertEqual(self.select(word_count=2), self.expected(word_count=2))
+        self.assertEqual(self.select(word_count=3), self.expected(word_count=3))
+        self.assertEqual(self.select(is_palindrome=True), [hash_string('level'), hash_string('noon')])
+        self.background.assert_not_called()
+
+    def test_leaves_a_long_replay_to_the_background(self):
+        filter_replica.refresh()
+        with mock.patch('analyzer.replica.CATCH_UP_INLINE', 1):
+            ingest_batch(['noon', 'four words in here'])
+            with self.assertRaises(ReplicaUnavailable):
+                filter_replica.select({'word_count': 2})
+        self.background.assert_called_once()
+        filter_replica.refresh()
+        self.assertEqual(self.select(is_palindrome=True), self.expected(is_palindrome=True))
+
+    def test_compacts_deleted_records(self):
+        filter_replica.refresh()
+        AnalyzedString.objects.filter(value__startswith='word 1').delete()
+        self.select(word_count=2)
+        self.background.assert_called_once()
+        filter_replica.refresh()
+        records = filter_replica.records()
+        self.assertFalse(records['deleted'].any())
+        self.assertEqual(len(records), AnalyzedString.objects.count())
+
+    def test_rebuilds_when_the_log_is_trimmed(self):
+        filter_replica.refresh()
+        ingest_batch(['noon'])
+        StringChange.objects.all().delete()
+        with self.assertRaises(ReplicaUnavailable):
+            filter_replica.select({'is_palindrome': True})
+        filter_replica.refresh()
+        self.assertEqual(self.select(is_palindrome=True), self.expected(is_palindrome=True))
+
+    def test_list_pages_from_the_replica(self):
+        filter_replica.refresh()
+        with mock.patch('analyzer.views.replica_page', wraps=replica_page) as page:
+            response = self.client.get('/strings', {'word_count': 2, 'page_size': 5})
+        self.assertEqual(page.call_count, 1)
+        body = response.json()
+        self.assertEqual(body['count'], 20)
+        self.assertEqual(len(body['data']), 5)
+        expected = AnalyzedString.objects.filter(word_count=2).order_by('created_at', 'id')[:5]
+        self.assertEqual([item['id'] for item in body['data']], [string.pk for string in expected])
+
+
+class ExportStringsCommandTests(TransactionTestCase):
+    def test_exports_outside_a_write_transaction(self):
+        ingest_batch(['first', 'second', 'third'])
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'strings.snapshot')
+            call_command('export_strings', path, chunk_rows=2, stdout=StringIO())
+            self.assertFalse(connection.in_atomic_block)
+            ids = [pk.decode() for chunk in read_snapshot(path) for pk in chunk['id'].tolist()]
+        self.assertEqual(sorted(ids), sorted(AnalyzedString.objects.values_list('pk', flat=True)))
+        # The read transaction is over: writes go through.
+        ingest_batch(['fourth'])
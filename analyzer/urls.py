@@ -1,13 +1,16 @@
 from django.urls import path, include
 
 from . import  views
+from .metrics import metrics_view
 from rest_framework.routers import  DefaultRouter
 
 router = DefaultRouter(trailing_slash=False)
 router.register(r'strings', views.StringAnalyzerViewSet, basename='strings')
+router.register(r'jobs', views.AnalysisJobViewSet, basename='analysis-job')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('metrics', metrics_view, name='metrics'),
     # path('strings', views.create_analyze_string, name='create-analyze-string'),
     # path('strings', views.list_strings, name='list-strings'),
     # path('strings/filter-by-natural-language', views.filter_by_natural_language, name='natural-language-filter'),
@@ -1,26 +1,66 @@
 import hashlib
 import re
+import sys
+from array import array
 from collections import Counter
 from typing import Dict, Any
 
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+# Below this many characters the pure-Python kernels are faster than paying
+# for the NumPy buffer conversion.
+NUMPY_MIN_LENGTH = 512
+
+
+def use_numpy(input_string: str) -> bool:
+    return np is not None and len(input_string) >= NUMPY_MIN_LENGTH
+
+
+def code_points(input_string: str):
+    """Return the string as a NumPy array of code points.
+
+    ASCII strings map onto one byte per character; anything else is encoded
+    as UCS-4 so that every element is exactly one code point.
+    """
+    if input_string.isascii():
+        return np.frombuffer(input_string.encode('ascii'), dtype=np.uint8)
+    return np.frombuffer(input_string.encode('utf-32-le'), dtype=np.uint32)
+
+
+def vectorized_character_frequency(codes) -> dict:
+    if codes.dtype == np.uint8:
+        counts = np.bincount(codes)
+        present = np.flatnonzero(counts)
+        return dict(zip(map(chr, present.tolist()), counts[present].tolist()))
+    characters, counts = np.unique(codes, return_counts=True)
+    return dict(zip(map(chr, characters.tolist()), counts.tolist()))
+
+
+def vectorized_is_palindrome(codes) -> bool:
+    # codes[::-1] is a view, so only the comparison result is allocated.
+    return bool(np.array_equal(codes, codes[::-1]))
+
 
 def describe_string(input_string: str) -> dict:
+    # Lowercase once and derive everything else from that single copy.
     normalized_string = input_string.lower()
-
-    length = len(input_string)
-    is_palindrome = (normalized_string.lower() == normalized_string.lower()[::-1])
-    # is_palindrome = (normalized_string == normalized_string[::-1])
-    unique_characters = len(set(input_string.lower()))
-    word_count = len(input_string.split())
-    char_frequency_map = generate_character_freq_map(input_string.lower())
-    sha256_hash = hash_string(input_string.lower())
+    if use_numpy(normalized_string):
+        codes = code_points(normalized_string)
+        char_frequency_map = vectorized_character_frequency(codes)
+        is_palindrome = vectorized_is_palindrome(codes)
+    else:
+        char_frequency_map = dict(Counter(normalized_string))
+        is_palindrome = normalized_string == normalized_string[::-1]
 
     return {
-        "length": length,
+        "length": len(input_string),
         "is_palindrome": is_palindrome,
-        "unique_characters": unique_characters,
-        "word_count": word_count,
-        "sha256_hash": sha256_hash,
+        "unique_characters": len(char_frequency_map),
+        "word_count": len(input_string.split()),
+        "sha256_hash": hash_string(normalized_string),
         "character_frequency_map": char_frequency_map
     }
 
@@ -28,9 +68,34 @@ def hash_string(input_string: str) -> str:
     return hashlib.sha256(input_string.encode('utf-8')).hexdigest()
 
 def generate_character_freq_map(input_string: str) -> dict:
+    if use_numpy(input_string):
+        return vectorized_character_frequency(code_points(input_string))
     return dict(Counter(input_string))
 
 
+def encode_frequency_map(frequency_map: dict) -> bytes:
+    """Pack a character frequency map into a little-endian uint32 blob.
+
+    The blob holds ``(code point, count)`` pairs sorted by code point, which
+    takes 8 bytes per distinct character instead of a JSON object entry.
+    """
+    packed = array('I')
+    for character, count in sorted(frequency_map.items()):
+        packed.append(ord(character))
+        packed.append(count)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def decode_frequency_map(blob) -> dict:
+    packed = array('I')
+    packed.frombytes(blob)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return dict(zip(map(chr, packed[0::2]), packed[1::2]))
+
+
 class StringAnalyzer:
     @staticmethod
     def analyze_string(value: str) -> Dict[str, Any]:
@@ -38,15 +103,14 @@ class StringAnalyzer:
 
         # Clean and prepare string for analysis
         cleaned_value = value.strip()
-        lower_value = cleaned_value.lower()
 
         # Compute properties
         length = len(cleaned_value)
         is_palindrome = StringAnalyzer._is_palindrome(cleaned_value)
-        unique_characters = len(set(cleaned_value))
+        character_frequency_map = StringAnalyzer._compute_character_frequency(cleaned_value)
+        unique_characters = len(character_frequency_map)
         word_count = StringAnalyzer._count_words(cleaned_value)
         sha256_hash = StringAnalyzer._compute_sha256(cleaned_value)
-        character_frequency_map = StringAnalyzer._compute_character_frequency(cleaned_value)
 
         return {
             "length": length,
@@ -60,6 +124,16 @@ class StringAnalyzer:
     @staticmethod
     def _is_palindrome(value: str) -> bool:
         """Check if string is palindrome (case-insensitive, ignore non-alphanumeric)"""
+        if use_numpy(value):
+            codes = code_points(value)
+            alphanumeric = (
+                ((codes >= ord('0')) & (codes <= ord('9')))
+                | ((codes >= ord('A')) & (codes <= ord('Z')))
+                | ((codes >= ord('a')) & (codes <= ord('z')))
+            )
+            # Setting bit 0x20 lowercases ASCII letters and leaves digits alone.
+            return vectorized_is_palindrome(codes[alphanumeric] | 0x20)
+
         # Remove non-alphanumeric characters and convert to lowercase
         cleaned = re.sub(r'[^a-zA-Z0-9]', '', value).lower()
         return cleaned == cleaned[::-1]
@@ -78,7 +152,7 @@ class StringAnalyzer:
     @staticmethod
     def _compute_character_frequency(value: str) -> Dict[str, int]:
         """Compute frequency of each character in the string"""
-        return dict(Counter(value))
+        return generate_character_freq_map(value)
 
     @staticmethod
     def parse_natural_language_query(query: str) -> Dict[str, Any]:
@@ -99,7 +173,6 @@ class StringAnalyzer:
             filters["is_palindrome"] = True
 
         # Parse length filters
-        import re
         longer_match = re.search(r'longer than (\d+)', query_lower)
         if longer_match:
             filters["min_length"] = int(longer_match.group(1)) + 1
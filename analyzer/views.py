@@ -1,23 +1,39 @@
+from django.conf import settings
+from django.db import IntegrityError
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view
+from rest_framework import mixins, viewsets, status
+from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
-from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework.status import HTTP_200_OK
 
-from .models import AnalyzedString, StringAnalysis
-from .filters import AnalyzedStringFilter
+from .models import AnalysisJob, AnalyzedString
+from .db import read_only_transaction
+from .cache import cache_analysis, cached_query_result, get_cached_analysis
+from .filters import AnalyzedStringFilter, applied_filters
+from .pagination import KeysetPagination
+from .parsers import NDJSONParser
 from .serializers import  (StringSerializer,
-    StringAnalysisSerializer,
-    StringCreateSerializer,
-    StringListResponseSerializer,
-    NaturalLanguageFilterSerializer,
-    NaturalLanguageResponseSerializer
+    OUTPUT_FIELDS,
+    AnalysisJobSerializer,
+    StrictCharField,
+    StringRowSerializer,
+    parse_projection,
 )
-from .utils import StringAnalyzer
-
-import re
+from .incremental import CHUNK_SIZE, StreamingAnalysis
+from .jobs import RETRY_AFTER_SECONDS, QueueFull, accepted_body, enqueue, wants_async, worker_pool
+from .metrics import timed
+from .similarity import IndexNotReady, similarity_index
+from .snapshot import write_snapshot
+from .services import create_analyzed_string, delete_strings, ingest_batch, statistics_summary
+from .query_planner import QueryPlan, plan_query
+from .replica import ReplicaUnavailable, replica_page
+from .streaming import STREAM_FORMATS, stream_queryset
+from .utils import hash_string
+
+from types import GeneratorType
 import logging 
 
 logger = logging.getLogger(__name__)
@@ -29,12 +45,16 @@ class StringAnalyzerViewSet(viewsets.ModelViewSet):
     lookup_field = 'value'
     filter_backends = [DjangoFilterBackend]
     filterset_class = AnalyzedStringFilter
+    pagination = KeysetPagination()
+    bulk_batch_size = 500
+    similar_default_k = 10
+    similar_max_k = 100
 
     def create(self, request, *args, **kwargs):
-        serializer = self.get_serializer(data=request.data)
-
         try:
-            serializer.is_valid(raise_exception=True)
+            with timed('parse'):
+                serializer = self.get_serializer(data=request.data)
+                serializer.is_valid(raise_exception=True)
         except ValidationError as e:
             if 'value' in e.detail:# and 'Not a valid string' in e.detail['value'][0]:
                 return Response(
@@ -43,10 +63,12 @@ class StringAnalyzerViewSet(viewsets.ModelViewSet):
                 )
             else:
                 raise e
+        if wants_async(request.query_params):
+            return self._enqueue(AnalysisJob.CREATE, {"value": serializer.validated_data['value']})
         try:
             self.perform_create(serializer)
         except ValidationError as e:
-            print(e.get_codes()['detail'])
+            logger.info("String creation rejected: %s", e.get_codes())
             if e.get_codes()['detail'] == "conflict":
                 return Response(
                     {"data-conflict": ["the provided string already exists"]},
@@ -59,340 +81,362 @@ class StringAnalyzerViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
     def retrieve(self, request, **kwargs):
-        # try:
-        string= self.get_object()
-        # except
-        if not string:
+        lookup_value = kwargs[self.lookup_field]
+        data = self._cached_representation(hash_string(lookup_value.lower()), lookup_value)
+        if data is None:
             return Response({'error' : 'String does not exist in the system'}, status=status.HTTP_404_NOT_FOUND)
-        serializer = StringSerializer(string)
-        return Response(serializer.data, status=HTTP_200_OK)
+        return Response(data, status=HTTP_200_OK)
+
+    def _get_by_hash(self, sha256, value=None):
+        """Fetch a string by primary key, optionally requiring an exact value.
+
+        The primary key is the SHA-256 of the lowercased value, so lookups
+        never compare whole string bodies in the database; the value check
+        only keeps lookups case-sensitive.
+        """
+        instance = self.get_queryset().filter(pk=sha256).first()
+        if instance is None or (value is not None and instance.value != value):
+            return None
+        return instance
+
+    def _cached_representation(self, sha256, value=None):
+        data = get_cached_analysis(sha256)
+        if data is None:
+            instance = self._get_by_hash(sha256)
+            if instance is None:
+                return None
+            data = StringSerializer(instance).data
+            cache_analysis(instance, data)
+        if value is not None and data['value'] != value:
+            return None
+        return data
+
+    def _delete(self, instance):
+        delete_strings([instance.pk])
+
+    def _enqueue(self, kind, payload):
+        """Queue an ``?async=true`` request; 202 with the job, or 503 when the queue is full."""
+        try:
+            job = enqueue(kind, payload)
+        except QueueFull:
+            return Response(
+                {"error": "Too many analysis jobs are queued; retry later"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(RETRY_AFTER_SECONDS)}
+            )
+        body = accepted_body(job)
+        return Response(body, status=status.HTTP_202_ACCEPTED, headers={'Location': body['status_url']})
 
     def list(self, request, *args, **kwargs):
 
         queryset = self.filter_queryset(self.get_queryset())
+        filters_applied = applied_filters(request.query_params)
+        projection = parse_projection(request.query_params)
+        row_serializer = StringRowSerializer(projection)
 
-        is_palindrome = request.query_params.get('is_palindrome')
-        min_length = request.query_params.get('min_length')
-        max_length = request.query_params.get('max_length')
-        word_count = request.query_params.get('word_count')
-        contains_character = request.query_params.get('contains_character')
-
-        serializer = self.get_serializer(queryset, many=True)
-
-        response_data = {
-            "data": serializer.data,
-            "count": len(serializer.data),
-            "filters_applied": {
-           },
-        }
-
-        if bool(is_palindrome):
-            response_data['filters_applied']["is_palindrome"] = bool(is_palindrome)
-
-        if min_length:
-            response_data['filters_applied']["min_length"] = int(min_length)
-
-        if max_length:
-            response_data['filters_applied']["max_length"] = int(max_length)
-
-
-        if word_count:
-            response_data['filters_applied']["word_count"] = int(word_count)
-
-        if contains_character:
-            response_data['filters_applied']["contains_character"] = contains_character
+        stream_format = request.query_params.get('stream')
+        if stream_format:
+            if stream_format not in STREAM_FORMATS:
+                return Response(
+                    {"error": f"'stream' must be one of: {', '.join(STREAM_FORMATS)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            return stream_queryset(
+                row_serializer.rows(queryset.order_by(*self.pagination.ordering)),
+                row_serializer.to_representation,
+                stream_format,
+            )
 
+        def compute():
+            try:
+                rows, next_cursor, count = replica_page(filters_applied, request, self.pagination, row_serializer)
+            except ReplicaUnavailable:
+                rows, next_cursor = self.pagination.paginate_queryset(
+                    row_serializer.rows(queryset), request, position=row_serializer.position
+                )
+                count = queryset.count()
+            return {
+                "data": [row_serializer.to_representation(row) for row in rows],
+                "count": count,
+                "next": next_cursor,
+                "filters_applied": filters_applied,
+            }
+
+        response_data = cached_query_result('list', {
+            "filters": filters_applied,
+            "cursor": request.query_params.get(self.pagination.cursor_query_param),
+            "page_size": self.pagination.get_page_size(request),
+            "fields": sorted(projection),
+        }, compute)
         return Response(response_data, status=status.HTTP_200_OK)
 
     def destroy(self, request, *args, **kwargs):
         """Custom delete method to remove a string by its 'value' field"""
         lookup_value = kwargs.get(self.lookup_field)
 
-        try:
-            instance = self.get_queryset().get(value=lookup_value)
-        except AnalyzedString.DoesNotExist:
+        instance = self._get_by_hash(hash_string(lookup_value.lower()), lookup_value)
+        if instance is None:
             return Response(
                 {"error": f"String '{lookup_value}' not found."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
         # Perform the deletion
-        instance.delete()
+        self._delete(instance)
         return Response(
             status=status.HTTP_204_NO_CONTENT
         )
 
-    @action(detail=False, methods=['get'], url_path='filter-by-natural-language')
-    def natural_language_filter(self, request):
-        query = request.query_params.get('query', '').lower()
+    @action(detail=False, methods=['get', 'delete'], url_path=r'by-hash/(?P<sha256>[0-9a-f]{64})')
+    def by_hash(self, request, sha256):
+        """Retrieve or delete a string by its SHA-256 hash."""
+        if request.method == 'DELETE':
+            instance = self._get_by_hash(sha256)
+            if instance is None:
+                return Response(
+                    {"error": f"String with hash '{sha256}' not found."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            self._delete(instance)
+            return Response(status=status.HTTP_204_NO_CONTENT)
 
-        if not query:
+        data = self._cached_representation(sha256)
+        if data is None:
+            return Response({'error' : 'String does not exist in the system'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data, status=HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Analyse many strings from a JSON array or an NDJSON stream.
+
+        Items are either strings or ``{"value": "..."}`` objects. They are
+        analysed and stored ``bulk_batch_size`` at a time, and the response
+        reports a per-item status of created, conflict or invalid. With
+        ``?async=true`` the items are only validated and queued as a job.
+        """
+        with timed('parse'):
+            items = request.data
+        if not isinstance(items, (list, GeneratorType)):
             return Response(
-                {"error": "Query parameter 'query' is required"},
+                {"error": "Expected a JSON array or an NDJSON body"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+        if wants_async(request.query_params):
+            payload = {"size": 0, "indexes": [], "values": [], "invalid": [], "batch_size": self.bulk_batch_size}
+            for index, value, error in self._validate_items(items):
+                payload["size"] += 1
+                if error is not None:
+                    payload["invalid"].append((index, error))
+                    continue
+                payload["indexes"].append(index)
+                payload["values"].append(value)
+            return self._enqueue(AnalysisJob.BULK, payload)
+
+        results = []
+        counts = {"created": 0, "conflict": 0, "invalid": 0}
+        batch_indexes, batch_values = [], []
+
+        def flush():
+            for index, result in zip(batch_indexes, ingest_batch(batch_values)):
+                results[index].update(result)
+                counts[result['status']] += 1
+            batch_indexes.clear()
+            batch_values.clear()
+
+        for index, value, error in self._validate_items(items):
+            if error is not None:
+                results.append({"index": index, "status": "invalid", "error": error})
+                counts["invalid"] += 1
+                continue
+            results.append({"index": index})
+            batch_indexes.append(index)
+            batch_values.append(value)
+            if len(batch_values) >= self.bulk_batch_size:
+                flush()
+        if batch_values:
+            flush()
+
+        return Response({"results": results, **counts}, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _validate_items(items):
+        """Yield ``(index, value, error)`` per bulk item; ``error`` is None for valid ones."""
+        value_field = StrictCharField()
+        for index, item in enumerate(items):
+            if isinstance(item, dict):
+                item = item.get('value')
+            try:
+                yield index, value_field.run_validation(item), None
+            except ValidationError as e:
+                yield index, None, e.detail[0]
+
+    @action(detail=False, methods=['get'], url_path='stats')
+    def stats(self, request):
+        """Corpus-wide totals and distributions from the incremental counters."""
+        return Response(cached_query_result('stats', {}, statistics_summary), status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], url_path='similar')
+    def similar(self, request, value):
+        """The ``k`` stored strings with the most similar character frequencies."""
         try:
-            filters = self._parse_query(query)
-            queryset = self._apply_filters(self.get_queryset(), filters)
-            serializer = self.get_serializer(queryset, many=True)
-
-            return Response({
-                "data": serializer.data,
-                "count": len(serializer.data),
-                "interpreted_query": {
-                    "original": request.query_params.get('query'),
-                    "parsed_filters": filters
-                }
-            }, status=status.HTTP_200_OK)
-
-        except ValueError as e:
+            k = int(request.query_params.get('k', self.similar_default_k))
+        except ValueError:
+            k = 0
+        if not 1 <= k <= self.similar_max_k:
             return Response(
-                {"error": str(e)},
+                {"error": f"'k' must be an integer between 1 and {self.similar_max_k}"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-    def _parse_query(self, query: str) -> dict:
-        """Parse natural language into filters using regex patterns"""
-        filters = {}
-
-        # Palindrome detection
-        if re.search(r'\bpalindrom(e|ic)\b', query):
-            filters['is_palindrome'] = True
-
-        # Word count
-        if 'single word' in query or 'one word' in query:
-            filters['word_count'] = 1
-        elif match := re.search(r'(\d+)\s*word', query):
-            filters['word_count'] = int(match.group(1))
-
-        # Length filters
-        if match := re.search(r'longer than (\d+)', query):
-            filters['min_length'] = int(match.group(1)) + 1
-        elif match := re.search(r'at least (\d+) characters?', query):
-            filters['min_length'] = int(match.group(1))
-        elif match := re.search(r'minimum (?:length|of) (\d+)', query):
-            filters['min_length'] = int(match.group(1))
-
-        if match := re.search(r'shorter than (\d+)', query):
-            filters['max_length'] = int(match.group(1)) - 1
-        elif match := re.search(r'at most (\d+) characters?', query):
-            filters['max_length'] = int(match.group(1))
-        elif match := re.search(r'maximum (?:length|of) (\d+)', query):
-            filters['max_length'] = int(match.group(1))
-
-        # Character contains
-        if match := re.search(r'contain(?:s|ing)?(?: the letter)? ([a-z])\b', query):
-            filters['contains_character'] = match.group(1)
-        elif 'first vowel' in query:
-            filters['contains_character'] = 'a'
-        elif match := re.search(r'letter ([a-z])\b', query):
-            filters['contains_character'] = match.group(1)
-
-        if not filters:
-            raise ValueError("Unable to parse natural language query")
-
-        return filters
-
-    def _apply_filters(self, queryset, filters):
-        """Apply parsed filters to queryset"""
-        if 'is_palindrome' in filters:
-            queryset = queryset.filter(is_palindrome=filters['is_palindrome'])
-        if 'min_length' in filters:
-            queryset = queryset.filter(length__gte=filters['min_length'])
-        if 'max_length' in filters:
-            queryset = queryset.filter(length__lte=filters['max_length'])
-        if 'word_count' in filters:
-            queryset = queryset.filter(word_count=filters['word_count'])
-        if 'contains_character' in filters:
-            queryset = queryset.filter(value__icontains=filters['contains_character'])
-
-        return queryset
-
-@api_view(['GET', 'POST'])
-def create_analyze_string(request):
-
-    if request.method == 'GET':
-        return list_strings(request)
-
-    """Create/Analyze String - POST /strings"""
-    serializer = StringCreateSerializer(data=request.data)
-
-    if not serializer.is_valid():
-        errors = serializer.errors
-        if 'value' in errors:
-            if 'This field is required.' in str(errors['value']):
-                return Response(
-                    {'error': 'Missing "value" field'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            elif 'Value must be a string' in str(errors['value']):
-                return Response(
-                    {'error': 'Invalid data type for "value" (must be string)'},
-                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
-                )
-        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
-
-    value = serializer.validated_data['value']
-    properties = StringAnalyzer.analyze_string(value)
+        instance = self._get_by_hash(hash_string(value.lower()), value)
+        if instance is None:
+            return Response({'error' : 'String does not exist in the system'}, status=status.HTTP_404_NOT_FOUND)
 
-    # Check if string already exists
-    if StringAnalysis.objects.filter(id=properties['sha256_hash']).exists():
-        return Response(
-            {'error': 'String already exists in the system'},
-            status=status.HTTP_409_CONFLICT
-        )
+        def compute():
+            return [
+                {**StringSerializer(neighbour).data, "similarity": round(similarity, 4)}
+                for neighbour, similarity in similarity_index.most_similar(instance, k)
+            ]
 
-    # Create analysis
-    analysis = StringAnalysis.objects.create(
-        id=properties['sha256_hash'],
-        value=value,
-        properties=properties
-    )
-
-    return Response(
-        StringAnalysisSerializer(analysis).data,
-        status=status.HTTP_201_CREATED
-    )
-
-@api_view(['GET', 'DELETE'])
-def get_string(request, string_value):
-    """Get Specific String - GET /strings/{string_value}"""
-    analysis = get_object_or_404(
-        StringAnalysis,
-        value=string_value
-    )
-
-    # return Response(StringAnalysisSerializer(analysis).data)
-    if request.method == 'GET':
-        serializer = StringAnalysisSerializer(analysis)
-        return Response(serializer.data)
-
-    elif request.method == 'DELETE':
-        analysis.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
-
-
-# @api_view(['GET'])
-def list_strings(request):
-    """Get All Strings with Filtering - GET /strings"""
-    analyses = StringAnalysis.objects.all()
-
-    # Apply filters
-    filters_applied = {}
-
-    is_palindrome = request.GET.get('is_palindrome')
-    if is_palindrome is not None:
-        if is_palindrome.lower() in ['true', '1']:
-            analyses = analyses.filter(properties__is_palindrome=True)
-            filters_applied['is_palindrome'] = True
-        elif is_palindrome.lower() in ['false', '0']:
-            analyses = analyses.filter(properties__is_palindrome=False)
-            filters_applied['is_palindrome'] = False
-
-    min_length = request.GET.get('min_length')
-    if min_length:
         try:
-            min_length = int(min_length)
-            analyses = analyses.filter(properties__length__gte=min_length)
-            filters_applied['min_length'] = min_length
-        except ValueError:
+            data = cached_query_result('similar', {"id": instance.pk, "k": k}, compute)
+        except IndexNotReady:
             return Response(
-                {'error': 'Invalid min_length parameter'},
-                status=status.HTTP_400_BAD_REQUEST
+                {"error": "The similarity index is being built; retry later"},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': str(RETRY_AFTER_SECONDS)}
             )
+        return Response({"value": instance.value, "k": k, "data": data, "count": len(data)}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """Stream the strings matching the list filters as a columnar snapshot."""
+        queryset = self.filter_queryset(self.get_queryset())
 
-    max_length = request.GET.get('max_length')
-    if max_length:
+        def snapshot():
+            # One read transaction for every chunk, so the file is one consistent state.
+            with read_only_transaction():
+                yield from write_snapshot(queryset)
+
+        return StreamingHttpResponse(
+            snapshot(),
+            content_type='application/octet-stream',
+            headers={'Content-Disposition': 'attachment; filename="strings.snapshot"'},
+        )
+
+    @action(detail=False, methods=['post'], url_path='stream')
+    def upload_stream(self, request):
+        """Analyse a raw UTF-8 text body without buffering it in memory.
+
+        The body is read ``CHUNK_SIZE`` bytes at a time and analysed
+        incrementally. Only the analysis is streamed: the INSERT needs the
+        value whole, so ``value()`` reads it back into memory, which is why a
+        body over ANALYZER_STREAM_MAX_BYTES is refused before that point.
+        """
+        max_bytes = settings.ANALYZER_STREAM_MAX_BYTES
+        too_large = Response(
+            {"error": f"Body exceeds the {max_bytes} byte limit"},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
         try:
-            max_length = int(max_length)
-            analyses = analyses.filter(properties__length__lte=max_length)
-            filters_applied['max_length'] = max_length
+            declared = int(request.META.get('CONTENT_LENGTH') or 0)
         except ValueError:
+            declared = 0
+        if declared > max_bytes:
+            return too_large
+        stream = request.stream
+        try:
+            with StreamingAnalysis() as analysis:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b'') if stream else ():
+                    with timed('analysis'):
+                        analysis.feed(chunk)
+                    if analysis.size > max_bytes:
+                        return too_large
+                with timed('analysis'):
+                    result = analysis.finish()
+                if not result['word_count']:
+                    return Response(
+                        {"error": "Request body is empty or only whitespace"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                value = analysis.value()
+        except UnicodeDecodeError:
             return Response(
-                {'error': 'Invalid max_length parameter'},
+                {"error": "Request body must be UTF-8 text"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-    word_count = request.GET.get('word_count')
-    if word_count:
         try:
-            word_count = int(word_count)
-            analyses = analyses.filter(properties__word_count=word_count)
-            filters_applied['word_count'] = word_count
-        except ValueError:
+            instance = create_analyzed_string(value, result)
+        except IntegrityError:
             return Response(
-                {'error': 'Invalid word_count parameter'},
-                status=status.HTTP_400_BAD_REQUEST
+                {"data-conflict": ["the provided string already exists"]},
+                status=status.HTTP_409_CONFLICT
             )
+        # The client already has the value; echoing it would be one more full copy.
+        row_serializer = StringRowSerializer(set(OUTPUT_FIELDS) - {'value'})
+        return Response(row_serializer.to_representation(row_serializer.instance_row(instance)),
+                        status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path='filter-by-natural-language')
+    def natural_language_filter(self, request):
+        query = request.query_params.get('query', '').lower()
 
-    contains_character = request.GET.get('contains_character')
-    if contains_character:
-        if len(contains_character) != 1:
+        if not query:
             return Response(
-                {'error': 'contains_character must be a single character'},
+                {"error": "Query parameter 'query' is required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        # Filter by character presence in frequency map
-        analyses = analyses.filter(
-            properties__character_frequency_map__has_key=contains_character
-        )
-        filters_applied['contains_character'] = contains_character
 
-    data = StringAnalysisSerializer(analyses, many=True).data
-    response_data = {
-        'data': data,
-        'count': len(data),
-        'filters_applied': filters_applied
-    }
+        try:
+            filters = self._parse_query(query)
+            projection = parse_projection(request.query_params)
+            row_serializer = StringRowSerializer(projection)
 
-    return Response(StringListResponseSerializer(response_data).data)
+            def compute():
+                queryset = self._apply_filters(self.get_queryset(), filters)
+                return [row_serializer.to_representation(row) for row in row_serializer.rows(queryset)]
 
-@api_view(['GET'])
-def filter_by_natural_language(request):
-    """Natural Language Filtering - GET /strings/filter-by-natural-language"""
-    serializer = NaturalLanguageFilterSerializer(data=request.GET)
+            data = cached_query_result('natural-language', {
+                "filters": filters,
+                "fields": sorted(projection),
+            }, compute)
 
-    if not serializer.is_valid():
-        return Response(
-            {'error': 'Unable to parse natural language query'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+            return Response({
+                "data": data,
+                "count": len(data),
+                "interpreted_query": {
+                    "original": request.query_params.get('query'),
+                    "parsed_filters": filters
+                }
+            }, status=status.HTTP_200_OK)
 
-    query = serializer.validated_data['query']
-    interpreted_query = StringAnalyzer.parse_natural_language_query(query)
-
-    # Apply parsed filters
-    analyses = StringAnalysis.objects.all()
-    filters = interpreted_query['parsed_filters']
-
-    for key, value in filters.items():
-        if key == 'is_palindrome':
-            analyses = analyses.filter(properties__is_palindrome=value)
-        elif key == 'min_length':
-            analyses = analyses.filter(properties__length__gte=value)
-        elif key == 'max_length':
-            analyses = analyses.filter(properties__length__lte=value)
-        elif key == 'word_count':
-            analyses = analyses.filter(properties__word_count=value)
-        elif key == 'contains_character':
-            analyses = analyses.filter(
-                properties__character_frequency_map__has_key=value
+        except ValueError as e:
+            return Response(
+                {"error": str(e)},
+                status=status.HTTP_400_BAD_REQUEST
             )
 
-    data = StringAnalysisSerializer(analyses, many=True).data
-    response_data = {
-        'data': data,
-        'count': len(data),
-        'interpreted_query': interpreted_query
-    }
-
-    return Response(NaturalLanguageResponseSerializer(response_data).data)
-
-@api_view(['DELETE'])
-def delete_string(request, string_value):
-    """Delete String - DELETE /strings/{string_value}"""
-    analysis = get_object_or_404(StringAnalysis, value=string_value)
-    analysis.delete()
+    def _parse_query(self, query: str) -> dict:
+        """Parse natural language into filters using the memoized query planner"""
+        return plan_query(query).as_filters()
 
-    return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+    def _apply_filters(self, queryset, filters):
+        """Apply parsed filters to queryset"""
+        return QueryPlan.from_filters(filters).apply(queryset)
+
+
+class AnalysisJobViewSet(mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """GET /jobs/{id}: progress and outcome of a request made with ``?async=true``."""
+    queryset = AnalysisJob.objects.all()
+    serializer_class = AnalysisJobSerializer
+    lookup_value_regex = '[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
+
+    def retrieve(self, request, pk=None):
+        # Jobs queued before this process started are picked up once anyone polls.
+        worker_pool.start()
+        instance = self.get_queryset().filter(pk=pk).first()
+        if instance is None:
+            return Response({'error': 'Job does not exist'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self.get_serializer(instance).data, status=HTTP_200_OK)
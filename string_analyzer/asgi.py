@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'string_analyzer.settings')
+# Serve the async versions of the string endpoints under ASGI.
+os.environ.setdefault('ANALYZER_ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'analyzer.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -78,11 +79,98 @@ WSGI_APPLICATION = 'string_analyzer.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+#
+# SQLite is the default. Its connections are kept open for DB_CONN_MAX_AGE
+# seconds and tuned by analyzer/db.py with SQLITE_PRAGMAS when created: a WAL
+# journal lets readers run alongside the single writer, and IMMEDIATE
+# transactions take the write lock up front so that writers queue on the busy
+# timeout instead of failing with "database is locked" on lock upgrade.
+#
+# Set DB_ENGINE=postgresql for larger deployments; connections then come from
+# a psycopg pool (pip install "psycopg[binary,pool]"), which replaces
+# persistent connections.
+
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite3')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'string_analyzer'),
+            'USER': os.getenv('DB_USER', ''),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+                    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+                    'timeout': int(os.getenv('DB_POOL_TIMEOUT', '10')),
+                },
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '20')),
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
     }
+
+SQLITE_PRAGMAS = {
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', '20')) * 1000,
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+    'temp_store': 'memory',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+#
+# 'analyses' holds serialized string analyses keyed by SHA-256 and 'queries'
+# holds list / natural language results keyed by data version and filters.
+# Both are in-process LRUs bounded by entry count and size. Neither needs to
+# be shared between workers: analyses are checked against the database
+# before they are served, and the data version lives in the database.
+
+
+def bounded_cache(name, max_entries, max_bytes, timeout=None):
+    return {
+        'BACKEND': 'analyzer.cache.BoundedLRUCache',
+        # LocMemCache shares its storage between aliases with the same LOCATION.
+        'LOCATION': name,
+        'TIMEOUT': timeout,
+        'OPTIONS': {'MAX_ENTRIES': max_entries, 'MAX_BYTES': max_bytes},
+    }
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'analyses': bounded_cache(
+        'analyses',
+        max_entries=int(os.getenv('ANALYSIS_CACHE_MAX_ENTRIES', '10000')),
+        max_bytes=int(os.getenv('ANALYSIS_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+    ),
+    # Entries are keyed by the data version, which is kept in the database, so
+    # a write in any worker invalidates them everywhere. The timeout only
+    # frees entries of old versions.
+    'queries': bounded_cache(
+        'queries',
+        max_entries=int(os.getenv('QUERY_CACHE_MAX_ENTRIES', '1000')),
+        max_bytes=int(os.getenv('QUERY_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+        timeout=int(os.getenv('QUERY_CACHE_TIMEOUT', '300')),
+    ),
 }
 
 
@@ -146,6 +234,71 @@ REST_FRAMEWORK = {
     ],
 }
 
+# Optional process pool for CPU-bound string analysis (analyzer/engine.py).
+# With WORKERS=0 every analysis runs on the request thread; otherwise single
+# strings of at least MIN_CHARS characters, and batches adding up to that
+# many, are analysed in worker processes. Anything shorter than
+# analyzer.utils.NUMPY_MIN_LENGTH (512) always runs in-process.
+ANALYZER_PROCESS_POOL = {
+    'WORKERS': int(os.getenv('ANALYZER_PROCESS_WORKERS', '0')),
+    'MIN_CHARS': int(os.getenv('ANALYZER_PARALLEL_MIN_CHARS', '1000000')),
+}
+
+# Largest raw body accepted by POST /strings/stream. Only the analysis is
+# streamed: the INSERT reads the whole value back into memory (as bytes and as
+# text), so peak memory per upload is about twice this. Keep it well below the
+# worker's memory. Bodies over the limit are refused before the value is read.
+ANALYZER_STREAM_MAX_BYTES = int(os.getenv('ANALYZER_STREAM_MAX_BYTES', str(64 * 1024 * 1024)))
+
+# Route create/retrieve/list/natural language requests to the async views in
+# analyzer/async_views.py. string_analyzer/asgi.py turns this on by default.
+ANALYZER_ASYNC_VIEWS = os.getenv('ANALYZER_ASYNC_VIEWS', 'False').lower() == 'true'
+
+# Store new character frequency maps as packed (code point, count) uint32
+# pairs in a BinaryField instead of a JSON object. Existing rows are read in
+# either encoding; `manage.py compact_frequency_maps` converts them.
+ANALYZER_COMPACT_FREQUENCY_MAP = os.getenv('ANALYZER_COMPACT_FREQUENCY_MAP', 'False').lower() == 'true'
+
+# Background jobs for POST /strings?async=true and POST /strings/bulk?async=true
+# (analyzer/jobs.py). Each web process runs WORKERS threads that take jobs
+# from the database; with 0, only `manage.py run_analysis_jobs` runs them.
+# Requests are refused with 503 while MAX_QUEUED jobs are waiting. Jobs still
+# running after STALE_SECONDS when a worker starts are retried, MAX_ATTEMPTS
+# times at most.
+ANALYZER_JOBS = {
+    'WORKERS': int(os.getenv('ANALYZER_JOB_WORKERS', '2')),
+    'MAX_QUEUED': int(os.getenv('ANALYZER_JOB_MAX_QUEUED', '100')),
+    'POLL_SECONDS': float(os.getenv('ANALYZER_JOB_POLL_SECONDS', '1')),
+    'STALE_SECONDS': int(os.getenv('ANALYZER_JOB_STALE_SECONDS', '600')),
+    'MAX_ATTEMPTS': 3,
+}
+
+# Answer GET /strings from a memory-mapped file of the scalar columns
+# (analyzer/replica.py) when every filter is one of is_palindrome,
+# min_length, max_length and word_count. Processes on one
+# host share the file; `manage.py rebuild_filter_replica` rewrites it.
+ANALYZER_FILTER_REPLICA = os.getenv('ANALYZER_FILTER_REPLICA', 'False').lower() == 'true'
+ANALYZER_FILTER_REPLICA_PATH = Path(os.getenv('ANALYZER_FILTER_REPLICA_PATH', BASE_DIR / 'var' / 'filter_replica'))
+
+# Fraction of requests whose phases RequestMetricsMiddleware times for
+# GET /metrics; every request is counted regardless. Sampled requests slower
+# than ANALYZER_SLOW_REQUEST_SECONDS are logged with their breakdown. The
+# default of 0.05 times one request in twenty: at a few requests a second the
+# histograms still fill within minutes, while the other nineteen pay only for
+# a random draw and a counter increment.
+ANALYZER_METRICS_SAMPLE_RATE = float(os.getenv('ANALYZER_METRICS_SAMPLE_RATE', '0.05'))
+
+# GET /metrics answers 404 unless enabled, and then only staff users and
+# clients connecting from ANALYZER_METRICS_ALLOWED_IPS (comma-separated
+# addresses or networks) get it. The address checked is REMOTE_ADDR, i.e.
+# the proxy's when there is one in front.
+ANALYZER_METRICS_ENABLED = os.getenv('ANALYZER_METRICS_ENABLED', 'False').lower() == 'true'
+ANALYZER_METRICS_ALLOWED_IPS = [
+    network.strip() for network in os.getenv('ANALYZER_METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+    if network.strip()
+]
+ANALYZER_SLOW_REQUEST_SECONDS = float(os.getenv('ANALYZER_SLOW_REQUEST_SECONDS', '1'))
+
 CORS_ALLOWED_ORIGINS = [
 
 ]
@@ -14,10 +14,11 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('', include("analyzer.urls"))
+    path('', include("analyzer.async_urls" if settings.ANALYZER_ASYNC_VIEWS else "analyzer.urls"))
 ]